@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Local unlock agent for the Encrypted Notes Manager
+
+Like ssh-agent, the agent is a small background process holding unlocked
+vault data keys in memory, so later runs can unlock a vault without paying
+for key derivation again. It listens on a Unix domain socket only its owner
+can reach, forgets keys that have not been used for a while, and never
+writes a key to disk.
+
+    python agent.py start [--ttl SECONDS]   run the agent in the foreground
+    python agent.py status                  list vaults with a cached key
+    python agent.py forget VAULT            drop the key of one vault
+    python agent.py lock                    drop every cached key
+    python agent.py stop                    stop the agent
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import base64
+import socket
+import getpass
+import struct
+import argparse
+import tempfile
+import threading
+import socketserver
+from typing import Dict, List, Optional
+
+SOCKET_ENV = "NOTES_VAULT_AGENT_SOCK"
+DEFAULT_TTL = 15 * 60
+
+
+def default_socket_path() -> str:
+    """Socket path from the environment, else a per-user runtime directory."""
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return os.path.join(runtime_dir, f"notes-vault-agent-{user}", "agent.sock")
+
+
+def vault_id(vault_path: str) -> str:
+    """Key the agent's cache by the vault's resolved path."""
+    return os.path.realpath(vault_path)
+
+
+def peer_uid(connection: socket.socket) -> Optional[int]:
+    """User id of the process on the other end of a Unix socket, if the OS says."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                        struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid
+
+
+class AgentRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one JSON request per line on a client connection."""
+    
+    def handle(self):
+        uid = peer_uid(self.connection)
+        if uid is not None and uid != os.getuid():
+            return
+        
+        for line in self.rfile:
+            try:
+                response = self.server.agent.handle(json.loads(line))
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server owned by an UnlockAgent."""
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path: str, agent: 'UnlockAgent'):
+        self.agent = agent
+        super().__init__(socket_path, AgentRequestHandler)
+
+
+class UnlockAgent:
+    """Holds vault data keys in memory and hands them out over a Unix socket."""
+    
+    def __init__(self, socket_path: Optional[str] = None, ttl: float = DEFAULT_TTL):
+        self.socket_path = socket_path or default_socket_path()
+        # Keys unused for this many seconds are forgotten
+        self.ttl = ttl
+        # vault id -> (key, last use)
+        self.keys: Dict[str, List] = {}
+        self.lock = threading.Lock()
+        self.server: Optional[AgentServer] = None
+        self._stopped = threading.Event()
+    
+    def _prepare_socket_dir(self):
+        """Create the socket directory private to this user, clearing stale sockets."""
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        info = os.stat(socket_dir)
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"{socket_dir} is owned by another user")
+        os.chmod(socket_dir, 0o700)
+        
+        if os.path.exists(self.socket_path):
+            if AgentClient(self.socket_path).ping():
+                raise RuntimeError(f"An agent is already listening on {self.socket_path}")
+            os.remove(self.socket_path)
+    
+    def start(self):
+        """Bind the socket and serve requests on a background thread."""
+        self._prepare_socket_dir()
+        old_umask = os.umask(0o177)
+        try:
+            self.server = AgentServer(self.socket_path, self)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._expire_loop, daemon=True).start()
+    
+    def wait(self):
+        """Block until the agent is stopped."""
+        self._stopped.wait()
+    
+    def stop(self):
+        """Forget every key and stop serving."""
+        self.forget_all()
+        self._stopped.set()
+        if self.server:
+            # shutdown() waits for serve_forever, so never call it from a handler thread.
+            threading.Thread(target=self._shutdown_server, daemon=True).start()
+    
+    def _shutdown_server(self):
+        """Stop the server and remove its socket."""
+        self.server.shutdown()
+        self.server.server_close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+    
+    def _expire_loop(self):
+        """Periodically drop keys that outlived their idle TTL."""
+        while not self._stopped.wait(min(1.0, self.ttl)):
+            self.expire()
+    
+    def expire(self):
+        """Drop keys that have not been used within the TTL."""
+        now = time.monotonic()
+        with self.lock:
+            for vault in [vault for vault, (_, used) in self.keys.items() if now - used > self.ttl]:
+                self._wipe(vault)
+    
+    def _wipe(self, vault: str):
+        """Remove one key, overwriting the buffer that held it."""
+        key, _ = self.keys.pop(vault)
+        key[:] = bytes(len(key))
+    
+    def forget_all(self):
+        """Drop every cached key."""
+        with self.lock:
+            for vault in list(self.keys):
+                self._wipe(vault)
+    
+    def handle(self, request: Dict) -> Dict:
+        """Execute one client request."""
+        command = request.get('command')
+        vault = request.get('vault')
+        
+        if command == "ping":
+            return {'ok': True}
+        if command == "put":
+            with self.lock:
+                if vault in self.keys:
+                    self._wipe(vault)
+                self.keys[vault] = [bytearray(base64.b64decode(request['key'])), time.monotonic()]
+            return {'ok': True}
+        if command == "get":
+            self.expire()
+            with self.lock:
+                entry = self.keys.get(vault)
+                if entry is None:
+                    return {'ok': False, 'error': "No key cached for this vault"}
+                entry[1] = time.monotonic()
+                return {'ok': True, 'key': base64.b64encode(bytes(entry[0])).decode()}
+        if command == "forget":
+            with self.lock:
+                if vault in self.keys:
+                    self._wipe(vault)
+            return {'ok': True}
+        if command == "lock":
+            self.forget_all()
+            return {'ok': True}
+        if command == "status":
+            self.expire()
+            with self.lock:
+                return {'ok': True, 'vaults': sorted(self.keys), 'ttl': self.ttl}
+        if command == "stop":
+            self.stop()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Unknown command: {command}"}
+
+
+class AgentClient:
+    """Talks to a running UnlockAgent; every call fails soft if none is running."""
+    
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 2.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+    
+    def _socket_dir_is_private(self) -> bool:
+        """The socket must live in a real directory of ours that nobody else can enter."""
+        try:
+            info = os.lstat(os.path.dirname(self.socket_path))
+        except OSError:
+            return False
+        return (stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid()
+                and stat.S_IMODE(info.st_mode) == 0o700)
+    
+    def _request(self, request: Dict) -> Optional[Dict]:
+        """Send one request; None if the agent cannot be reached or is not ours."""
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(self.socket_path):
+            return None
+        if not self._socket_dir_is_private():
+            print(f"⚠️ Not using the unlock agent: {os.path.dirname(self.socket_path)} "
+                  f"is not a private directory of this user")
+            return None
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                # Keys only go to an agent run by this user.
+                if peer_uid(sock) != os.getuid():
+                    print("⚠️ Not using the unlock agent: cannot confirm it runs as this user")
+                    return None
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                with sock.makefile('rb') as reader:
+                    line = reader.readline()
+            return json.loads(line) if line else None
+        except (OSError, ValueError):
+            return None
+    
+    def ping(self) -> bool:
+        """Check whether an agent is listening."""
+        response = self._request({'command': "ping"})
+        return bool(response and response.get('ok'))
+    
+    def put_key(self, vault_path: str, key: bytes) -> bool:
+        """Cache the data key of an unlocked vault."""
+        response = self._request({
+            'command': "put", 'vault': vault_id(vault_path),
+            'key': base64.b64encode(key).decode()
+        })
+        return bool(response and response.get('ok'))
+    
+    def get_key(self, vault_path: str) -> Optional[bytes]:
+        """Fetch a cached data key, or None."""
+        response = self._request({'command': "get", 'vault': vault_id(vault_path)})
+        if not response or not response.get('ok'):
+            return None
+        return base64.b64decode(response['key'])
+    
+    def forget(self, vault_path: str) -> bool:
+        """Drop the cached key of one vault."""
+        response = self._request({'command': "forget", 'vault': vault_id(vault_path)})
+        return bool(response and response.get('ok'))
+    
+    def lock(self) -> bool:
+        """Drop every cached key."""
+        response = self._request({'command': "lock"})
+        return bool(response and response.get('ok'))
+    
+    def status(self) -> Optional[Dict]:
+        """Vaults with a cached key and the idle TTL, or None if no agent runs."""
+        response = self._request({'command': "status"})
+        return response if response and response.get('ok') else None
+    
+    def stop(self) -> bool:
+        """Ask the agent to exit."""
+        response = self._request({'command': "stop"})
+        return bool(response and response.get('ok'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encrypted Notes Manager unlock agent')
+    parser.add_argument('command', choices=['start', 'status', 'forget', 'lock', 'stop'])
+    parser.add_argument('vault', nargs='?', help='Vault file (for forget)')
+    parser.add_argument('--socket', help=f'Socket path (default: ${SOCKET_ENV} or a per-user runtime dir)')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL,
+                        help='Forget keys unused for this many seconds')
+    args = parser.parse_args()
+    
+    if not hasattr(socket, "AF_UNIX"):
+        print("❌ The unlock agent needs Unix domain sockets, which this platform lacks.")
+        return 1
+    
+    if args.command == "start":
+        agent = UnlockAgent(args.socket, args.ttl)
+        agent.start()
+        print(f"🔑 Unlock agent listening on {agent.socket_path} (TTL {args.ttl:g} s)")
+        print(f"   export {SOCKET_ENV}={agent.socket_path}")
+        try:
+            agent.wait()
+        except KeyboardInterrupt:
+            agent.stop()
+        return 0
+    
+    client = AgentClient(args.socket)
+    if args.command == "status":
+        status = client.status()
+        if status is None:
+            print("❌ No agent running.")
+            return 1
+        print(f"🔑 Agent running, TTL {status['ttl']:g} s, {len(status['vaults'])} cached key(s)")
+        for vault in status['vaults']:
+            print(f"   {vault}")
+        return 0
+    if args.command == "forget":
+        if not args.vault:
+            parser.error("forget needs a vault path")
+        ok = client.forget(args.vault)
+    elif args.command == "lock":
+        ok = client.lock()
+    else:
+        ok = client.stop()
+    print("✅ Done." if ok else "❌ No agent running.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Autosave timing for the notes editor.
+
+An Autosaver is told about every edit and decides when the edited note is
+written: once edits have paused for ``idle_ms``, or at the latest
+``max_latency_ms`` after the first unsaved edit, so that continuous typing
+still reaches the disk regularly but costs at most one write per
+``max_latency_ms``. What a save does (capturing the editor, writing the
+note on a worker thread) is up to the ``save`` callback.
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+IDLE_MS = 1000
+MAX_LATENCY_MS = 5000
+
+
+class Autosaver:
+    """Coalesces bursts of edits into single saves.
+    
+    schedule(delay_ms, callback) and cancel(handle) are Tk's ``root.after``
+    and ``root.after_cancel``. save() returns whether it saved anything
+    (e.g. False for a note without a title).
+    """
+    
+    def __init__(self, schedule: Callable[[int, Callable[[], None]], Any],
+                 cancel: Callable[[Any], None], save: Callable[[], bool],
+                 idle_ms: int = IDLE_MS, max_latency_ms: int = MAX_LATENCY_MS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.schedule = schedule
+        self.cancel_scheduled = cancel
+        self.save = save
+        self.idle_ms = idle_ms
+        self.max_latency_ms = max_latency_ms
+        self.clock = clock
+        self.handle = None
+        # When the oldest unsaved edit was made, None when nothing is unsaved
+        self.first_unsaved: Optional[float] = None
+        self.edits = 0
+        self.saves = 0
+    
+    @property
+    def dirty(self) -> bool:
+        """Whether there are unsaved edits."""
+        return self.first_unsaved is not None
+    
+    def changed(self):
+        """Record an edit and (re)schedule the save."""
+        self.edits += 1
+        now = self.clock()
+        if self.first_unsaved is None:
+            self.first_unsaved = now
+        waited_ms = (now - self.first_unsaved) * 1000
+        delay = min(self.idle_ms, max(0, self.max_latency_ms - waited_ms))
+        self._cancel_timer()
+        self.handle = self.schedule(int(delay), self._on_timer)
+    
+    def _on_timer(self):
+        self.handle = None
+        self.flush()
+    
+    def flush(self, force: bool = False) -> bool:
+        """Save now if there are unsaved edits (or always, with force)."""
+        self._cancel_timer()
+        if self.first_unsaved is None and not force:
+            return False
+        self.first_unsaved = None
+        if not self.save():
+            return False
+        self.saves += 1
+        return True
+    
+    def discard(self):
+        """Forget unsaved edits, e.g. of a note being deleted."""
+        self._cancel_timer()
+        self.first_unsaved = None
+    
+    def _cancel_timer(self):
+        if self.handle is not None:
+            self.cancel_scheduled(self.handle)
+            self.handle = None
+    
+    def stats(self) -> Dict:
+        """Edits seen, saves made and saves avoided by coalescing."""
+        return {
+            'edits': self.edits,
+            'saves': self.saves,
+            'saves_avoided': max(0, self.edits - self.saves),
+            'dirty': self.dirty
+        }
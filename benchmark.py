@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Encrypted Notes Manager storage and search paths
+"""
+
+import os
+import sys
+import json
+import gc
+import time
+import heapq
+import random
+import shutil
+import datetime
+import argparse
+import tempfile
+import tracemalloc
+from autosave import Autosaver
+from encryption import EncryptionManager
+from fuzzy_index import MAX_EDITS, allowed_edits, edit_distance
+from kdf import KDFS, calibrate, time_derivation
+from notes_manager import NotesVault, Note
+from time_index import us_to_iso
+
+
+def make_notes(count: int, size: int = 200):
+    """Build synthetic notes with roughly `size` characters of content."""
+    words = ["alpha", "backend", "meeting", "python", "grocery", "release",
+             "design", "budget", "travel", "recipe", "server", "kernel"]
+    notes = []
+    for i in range(count):
+        body = " ".join(words[(i * 7 + j) % len(words)] for j in range(size // 7))
+        tags = [words[i % len(words)], words[(i * 3) % len(words)]]
+        notes.append(Note(f"Note {i} {words[i % len(words)]}", body, tags))
+    return notes
+
+
+def new_vault(temp_dir: str, name: str) -> NotesVault:
+    """Create a fresh vault in the temp directory."""
+    vault = NotesVault(os.path.join(temp_dir, name))
+    vault.create_vault("benchmark_password")
+    return vault
+
+
+def bench_batch_writes(count: int):
+    """Compare adding notes one by one against a single batched commit."""
+    print(f"📝 Adding {count} notes: single add_note calls vs one add_notes batch")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "single.enc")
+        notes = make_notes(count)
+        started = time.perf_counter()
+        for note in notes:
+            vault.add_note(note)
+        single = time.perf_counter() - started
+        
+        vault = new_vault(temp_dir, "batch.enc")
+        notes = make_notes(count)
+        started = time.perf_counter()
+        vault.add_notes(notes)
+        batch = time.perf_counter() - started
+        
+        print(f"  single adds : {single:8.3f} s ({single / count * 1000:.3f} ms/note)")
+        print(f"  one batch   : {batch:8.3f} s ({batch / count * 1000:.3f} ms/note)")
+        print(f"  speedup     : {single / batch:8.1f}x")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_parallel_unlock(count: int):
+    """Compare single-threaded unlock against thread and process pools."""
+    print(f"🔓 Unlocking a sharded vault of {count} notes with different worker pools")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault_path = os.path.join(temp_dir, "unlock.enc")
+        vault = NotesVault(vault_path, storage="sharded", shard_count=32)
+        vault.create_vault("benchmark_password")
+        vault.add_notes(make_notes(count, size=2000))
+        vault.lock_vault()
+        
+        for label, options in [
+            ("single thread", {"unlock_workers": 1}),
+            ("thread pool  ", {"unlock_executor": "thread", "parallel_unlock_bytes": 0}),
+            ("process pool ", {"unlock_executor": "process", "parallel_unlock_bytes": 0}),
+        ]:
+            vault = NotesVault(vault_path, **options)
+            started = time.perf_counter()
+            vault.unlock_vault("benchmark_password")
+            elapsed = time.perf_counter() - started
+            print(f"  {label}: {elapsed:8.3f} s ({vault.decryptor.workers} workers)")
+            vault.lock_vault()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_container(count: int):
+    """Compare the v1 Fernet token format against v2 binary AES-GCM."""
+    print(f"📦 Encrypting {count} note payloads: Fernet tokens vs AES-GCM blobs")
+    manager = EncryptionManager()
+    manager.set_password("benchmark_password")
+    payloads = [json.dumps(note.to_dict()) for note in make_notes(count)]
+    plain = sum(len(payload.encode()) for payload in payloads)
+    
+    started = time.perf_counter()
+    tokens = [manager.fernet.encrypt(payload.encode()) for payload in payloads]
+    fernet_encrypt = time.perf_counter() - started
+    started = time.perf_counter()
+    for token in tokens:
+        manager.decrypt_legacy(token)
+    fernet_decrypt = time.perf_counter() - started
+    fernet_size = sum(len(token) for token in tokens)
+    
+    started = time.perf_counter()
+    blobs = [manager.encrypt_data(payload) for payload in payloads]
+    gcm_encrypt = time.perf_counter() - started
+    started = time.perf_counter()
+    for blob in blobs:
+        manager.decrypt_data(blob)
+    gcm_decrypt = time.perf_counter() - started
+    gcm_size = sum(len(blob) for blob in blobs)
+    
+    print(f"  plaintext   : {plain:10d} bytes")
+    print(f"  fernet (v1) : {fernet_size:10d} bytes ({fernet_size / plain:.2f}x), "
+          f"encrypt {fernet_encrypt:.3f} s, decrypt {fernet_decrypt:.3f} s")
+    print(f"  aes-gcm (v2): {gcm_size:10d} bytes ({gcm_size / plain:.2f}x), "
+          f"encrypt {gcm_encrypt:.3f} s, decrypt {gcm_decrypt:.3f} s")
+
+
+def bench_password_rotation(count: int):
+    """Time a master password change on a small and a large vault."""
+    print(f"🔑 Changing the master password of vaults with 100 and {count} notes")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for size in (100, count):
+            vault = new_vault(temp_dir, f"rotate-{size}.enc")
+            vault.add_notes(make_notes(size, size=2000))
+            started = time.perf_counter()
+            vault.change_master_password("benchmark_password", "rotated_password")
+            elapsed = time.perf_counter() - started
+            file_bytes = vault.compaction_stats()['file_bytes']
+            print(f"  {size:8d} notes ({file_bytes / 1024 / 1024:7.1f} MB): {elapsed:8.3f} s")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_kdf_calibration(count: int):
+    """Calibrate every KDF to a few unlock targets and time the result."""
+    print("⏱️ Calibrating key derivation to target unlock times on this machine")
+    for name, kdf in sorted(KDFS.items()):
+        for target in (0.1, 0.25, 0.5):
+            params = calibrate(name, target)
+            elapsed = time_derivation(kdf, params, rounds=1)
+            print(f"  {name:14s} target {target:4.2f} s: {elapsed:6.3f} s with {params}")
+
+
+def linear_search(vault: NotesVault, query: str):
+    """The original search: scan every note's title, content and tags."""
+    query_lower = query.lower()
+    return [
+        (note_id, note) for note_id, note in vault.notes.items()
+        if (query_lower in note.title.lower() or
+            query_lower in note.content.lower() or
+            any(query_lower in tag.lower() for tag in note.tags))
+    ]
+
+
+def bench_search(count: int):
+    """Compare the indexed search_notes against a linear scan."""
+    print(f"🔍 Searching {count} notes: linear scan vs inverted index")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "search.enc")
+        notes = make_notes(count)
+        # Rare words so selective queries have something to find.
+        for i in range(0, count, 100):
+            notes[i].content += f" invoice{i} code{i * 7919 % 1000003}"
+        vault.add_notes(notes)
+        vault.search_notes("warm up")
+        
+        for query in ["invoice5000", "voice", "ice50", "budget", "zzz"]:
+            started = time.perf_counter()
+            expected = linear_search(vault, query)
+            linear = time.perf_counter() - started
+            started = time.perf_counter()
+            results = vault.search_notes(query)
+            indexed = time.perf_counter() - started
+            assert [note_id for note_id, _ in results] == [note_id for note_id, _ in expected]
+            print(f"  {query!r:15s}: {len(results):6d} hits, linear {linear * 1000:8.2f} ms, "
+                  f"indexed {indexed * 1000:8.2f} ms")
+        
+        index = vault.search_index
+        print(f"  vocabulary of {len(index.postings)} words, {len(index.trigrams)} trigrams:")
+        for fragment in ["ice50", "ckend", "e12345"]:
+            started = time.perf_counter()
+            scanned = index.scan_words(fragment)
+            scan = time.perf_counter() - started
+            started = time.perf_counter()
+            found = index.words_containing(fragment)
+            trigram = time.perf_counter() - started
+            assert sorted(found) == sorted(scanned)
+            print(f"  words containing {fragment!r:9s}: {len(found):5d}, vocabulary scan "
+                  f"{scan * 1000:7.3f} ms, trigram index {trigram * 1000:7.3f} ms")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_ranked(count: int):
+    """Compare heap-based top-k BM25 ranking against ranking every match."""
+    print(f"🏆 Ranking {count} notes with BM25: top 10 vs full sort")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "ranked.enc")
+        notes = make_notes(count)
+        for i in range(0, count, 100):
+            notes[i].content += f" invoice{i}"
+        vault.add_notes(notes)
+        vault.search_ranked("warm up")
+        
+        for query in ["invoice5000", "invoice budget", "budget", "ice"]:
+            started = time.perf_counter()
+            everything = vault.search_ranked(query, k=count)
+            full = time.perf_counter() - started
+            started = time.perf_counter()
+            top = vault.search_ranked(query, k=10)
+            heap = time.perf_counter() - started
+            assert [note_id for note_id, _, _ in top] == [note_id for note_id, _, _ in everything[:10]]
+            print(f"  {query!r:16s}: {len(everything):6d} matches, full sort {full * 1000:8.2f} ms, "
+                  f"top 10 {heap * 1000:8.2f} ms")
+            if top:
+                print(f"  {'':16s}  best: {top[0][1].title!r} ({top[0][2]:.2f})")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_tags(count: int):
+    """Compare tag index lookups against scanning every note's tags."""
+    print(f"🏷️ Tag facets and queries over {count} notes: scan vs tag index")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "tags.enc")
+        notes = make_notes(count)
+        for i in range(0, count, 10):
+            notes[i].tags += ("archived",)
+        vault.add_notes(notes)
+        
+        started = time.perf_counter()
+        scanned: dict = {}
+        for _, note in vault.get_all_notes():
+            for tag in set(tag.lower() for tag in note.tags):
+                scanned[tag] = scanned.get(tag, 0) + 1
+        scan = time.perf_counter() - started
+        started = time.perf_counter()
+        counts = vault.tag_counts()
+        indexed = time.perf_counter() - started
+        assert counts == scanned
+        print(f"  facet counts ({len(counts)} tags): scan {scan * 1000:8.2f} ms, "
+              f"index {indexed * 1000:8.2f} ms")
+        
+        query = "tag:backend AND tag:python AND NOT tag:archived"
+        started = time.perf_counter()
+        expected = [
+            note_id for note_id, note in vault.get_all_notes()
+            if {"backend", "python"} <= set(note.tags) and "archived" not in note.tags
+        ]
+        scan = time.perf_counter() - started
+        started = time.perf_counter()
+        results = vault.search_tags(query)
+        indexed = time.perf_counter() - started
+        assert [note_id for note_id, _ in results] == expected
+        print(f"  {query!r}: {len(results)} hits, scan {scan * 1000:8.2f} ms, "
+              f"index {indexed * 1000:8.2f} ms")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_query(count: int):
+    """Show the plans the query planner picks, with their timings."""
+    print(f"🧭 Query plans over {count} notes")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "query.enc")
+        notes = make_notes(count)
+        for i in range(0, count, 100):
+            notes[i].content += f" invoice{i}"
+            notes[i].tags += ("archived",)
+        vault.add_notes(notes)
+        vault.search_notes("warm up")
+        
+        for query in ["tag:python budget NOT tag:archived",
+                      "invoice modified:<1d NOT tag:travel",
+                      'title:"note 42 " OR "invoice4200"']:
+            print(vault.explain(query))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class DictNote:
+    """A note laid out as before __slots__: attribute dict, tag list, ISO timestamps."""
+    
+    def __init__(self, data: dict):
+        self.title = data['title']
+        self.body_ref = data['body_ref']
+        self._body_loader = None
+        self._content = None
+        self.tags = list(data['tags'])
+        self.created_at = us_to_iso(data['created_us'])
+        self.modified_at = us_to_iso(data['modified_us'])
+
+
+def retained_bytes(build) -> int:
+    """Memory still allocated by build() once its result is all that is left."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        del result
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(count: int):
+    """Memory of loaded note metadata: dict-based notes vs slotted, interned notes."""
+    print(f"🧠 Note metadata memory for {count} notes (tracemalloc)")
+    records = {}
+    for i, note in enumerate(make_notes(count)):
+        records[f"{i:032x}"] = {'title': note.title, 'tags': list(note.tags), 'body_ref': i,
+                                'created_us': 1700000000000000 + i, 'modified_us': 1700000000000000 + i}
+    # Loaded vaults parse JSON, which makes a fresh string for every tag occurrence.
+    text = json.dumps(records)
+    del records
+    
+    def load(make):
+        return lambda: {note_id: make(data) for note_id, data in json.loads(text).items()}
+    
+    def slotted(data: dict) -> Note:
+        note = Note.from_dict(data)
+        note.body_ref = data['body_ref']
+        return note
+    
+    before = retained_bytes(load(DictNote))
+    after = retained_bytes(load(slotted))
+    print(f"  dict-based notes {before / 1048576:7.1f} MiB ({before / count:5.0f} B/note), "
+          f"slotted notes {after / 1048576:7.1f} MiB ({after / count:5.0f} B/note), "
+          f"{1 - after / before:.0%} less")
+
+
+class SimulatedClock:
+    """A clock and after()-style scheduler that only move when told to."""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.timers = []
+        self.handles = 0
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def schedule(self, delay_ms: int, callback):
+        self.handles += 1
+        heapq.heappush(self.timers, (self.now + delay_ms / 1000, self.handles, callback))
+        return self.handles
+    
+    def cancel(self, handle):
+        self.timers = [timer for timer in self.timers if timer[1] != handle]
+        heapq.heapify(self.timers)
+    
+    def advance(self, seconds: float):
+        """Move time forward, running the timers that come due."""
+        until = self.now + seconds
+        while self.timers and self.timers[0][0] <= until:
+            self.now, _, callback = heapq.heappop(self.timers)
+            callback()
+        self.now = until
+
+
+def bench_autosave(count: int):
+    """Writes made while typing: one per keystroke vs coalescing autosave."""
+    keystrokes = min(count, 2000)
+    print(f"💾 Autosave while typing {keystrokes} keystrokes into a 20 KB note")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "autosave.enc")
+        note_id = vault.add_note(Note("Draft", "x" * 20000, []))
+        rng = random.Random(7)
+        text = [vault.notes[note_id].content]
+        write_times = []
+        
+        def save() -> bool:
+            started = time.perf_counter()
+            vault.update_note(note_id, Note("Draft", text[0], []))
+            write_times.append(time.perf_counter() - started)
+            return True
+        
+        clock = SimulatedClock()
+        autosaver = Autosaver(clock.schedule, clock.cancel, save, clock=clock)
+        size_before = os.path.getsize(vault.vault_path)
+        for i in range(keystrokes):
+            text[0] += "abcdefghij"[i % 10]
+            autosaver.changed()
+            # Bursts of typing at 5-10 keys per second, with the odd pause to think
+            clock.advance(3.0 if rng.random() < 0.02 else rng.uniform(0.1, 0.2))
+        autosaver.flush()
+        written = os.path.getsize(vault.vault_path) - size_before
+        typed = clock.now
+        per_write = sum(write_times) / len(write_times)
+        
+        stats = autosaver.stats()
+        print(f"  {typed:.0f} s of typing: per keystroke {stats['edits']} writes "
+              f"(~{stats['edits'] * per_write * 1000:.0f} ms, ~{written / stats['saves'] * stats['edits'] / 1048576:.1f} MiB), "
+              f"autosave {stats['saves']} writes ({sum(write_times) * 1000:.0f} ms, "
+              f"{written / 1048576:.1f} MiB), {stats['saves_avoided']} saves avoided")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_recent(count: int):
+    """Compare sorting ISO timestamps against the sorted timestamp index."""
+    print(f"🕒 Recent notes and date ranges over {count} notes: sort vs time index")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "recent.enc")
+        vault.add_notes(make_notes(count))
+        # Spread modification times over a year.
+        for i, note in enumerate(vault.notes.values()):
+            note.modified_us -= (i * 7919 % count) * 365 * 86400 * 1000000 // count
+        vault.time_index.rebuild(vault.notes)
+        iso = {note_id: note.modified_at for note_id, note in vault.notes.items()}
+        
+        started = time.perf_counter()
+        expected = sorted(iso, key=lambda note_id: datetime.datetime.fromisoformat(iso[note_id]),
+                          reverse=True)[:20]
+        scan = time.perf_counter() - started
+        started = time.perf_counter()
+        recent = [note_id for note_id, _ in vault.recent_notes(20)]
+        indexed = time.perf_counter() - started
+        assert recent == expected
+        print(f"  20 most recently modified: parse + sort {scan * 1000:8.2f} ms, "
+              f"index {indexed * 1000:8.3f} ms")
+        
+        start, end = sorted(iso.values())[count // 2], sorted(iso.values())[count // 2 + count // 100]
+        started = time.perf_counter()
+        expected = [note_id for note_id, stamp in iso.items() if start <= stamp < end]
+        scan = time.perf_counter() - started
+        started = time.perf_counter()
+        found = vault.notes_between(start, end)
+        indexed = time.perf_counter() - started
+        assert sorted(note_id for note_id, _ in found) == sorted(expected)
+        print(f"  1% date range ({len(found)} notes): scan {scan * 1000:8.2f} ms, "
+              f"index {indexed * 1000:8.3f} ms")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_typing(count: int):
+    """Per-keystroke latency of as-you-type search, with and without a session."""
+    print(f"⌨️  Typing queries over {count} notes: fresh search vs search session")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "typing.enc")
+        notes = make_notes(count)
+        # The same 100 rare words at any vault size, so result sizes stay fixed.
+        for j in range(100):
+            notes[j * count // 100].content += f" invoice{j:03d} code{j * 7919 % 1000:03d}"
+        vault.add_notes(notes)
+        vault.search_notes("warm up")
+        
+        for word in ["invoice042", "voice04", "code9"]:
+            keystrokes = [word[:i] for i in range(1, len(word) + 1)]
+            # Type the word, then delete the last three characters again.
+            keystrokes += keystrokes[-4:-1][::-1]
+            fresh = []
+            for query in keystrokes:
+                started = time.perf_counter()
+                expected = vault.search_notes(query)
+                fresh.append(time.perf_counter() - started)
+            session = vault.search_session()
+            typed = []
+            for query in keystrokes:
+                started = time.perf_counter()
+                results = session.search(query)
+                typed.append(time.perf_counter() - started)
+            assert [note_id for note_id, _ in results] == [note_id for note_id, _ in expected]
+            # The first keystrokes match most of the vault either way.
+            late = slice(len(word) // 2, None)
+            print(f"  {word!r:12s}: fresh search worst late key {max(fresh[late]) * 1000:7.2f} ms, "
+                  f"session {max(typed[late]) * 1000:7.3f} ms "
+                  f"({session.refinements} refined, {session.cache.hits} cached)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def make_topic_notes(count: int, duplicate_every: int = 100):
+    """Notes drawn from a few hundred topics, with a near-copy of every Nth note."""
+    rng = random.Random(42)
+    vocabulary = [f"{stem}{i}" for i in range(400) for stem in ("term", "word", "name")]
+    topics = [rng.sample(vocabulary, 40) for _ in range(300)]
+    notes = []
+    for i in range(count):
+        topic = topics[rng.randrange(len(topics))]
+        words = rng.sample(topic, 20) + rng.sample(vocabulary, 5)
+        if duplicate_every and i % duplicate_every == 1:
+            words = notes[i - 1].content.split()
+            words[rng.randrange(len(words))] = "edited"
+        notes.append(Note(f"Note {i}", " ".join(words), []))
+    return notes
+
+
+def bench_related(count: int):
+    """Related notes and near-duplicates: brute force vs TF-IDF columns and MinHash LSH."""
+    print(f"🔗 Related notes and duplicates over {count} notes")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "related.enc")
+        vault.add_notes(make_topic_notes(count))
+        note_ids = list(vault.notes)
+        
+        started = time.perf_counter()
+        vault.related_notes(note_ids[0])
+        index = vault.related_index
+        print(f"  index built in {(time.perf_counter() - started) * 1000:.0f} ms "
+              f"({len(index.columns)} words, {len(index.buckets)} LSH buckets)")
+        
+        samples = note_ids[::max(1, count // 20)][:20]
+        started = time.perf_counter()
+        for note_id in samples:
+            row = index.rows[note_id]
+            scores = [(other, sum(weight * other_row.get(word, 0.0) for word, weight in row.items()))
+                      for other, other_row in index.rows.items() if other != note_id]
+            heapq.nsmallest(10, scores, key=lambda item: (-item[1], item[0]))
+        brute = (time.perf_counter() - started) / len(samples)
+        started = time.perf_counter()
+        for note_id in samples:
+            vault.related_notes(note_id)
+        columns = (time.perf_counter() - started) / len(samples)
+        print(f"  related(k=10): pairwise cosine {brute * 1000:8.2f} ms, "
+              f"TF-IDF columns {columns * 1000:6.2f} ms per note")
+        
+        started = time.perf_counter()
+        duplicates = vault.find_duplicates()
+        lsh = time.perf_counter() - started
+        # All pairs only on a slice; the full vault would take (count / sample)^2 as long.
+        sample = note_ids[:min(count, 2000)]
+        started = time.perf_counter()
+        exact = sum(1 for i, first in enumerate(sample) for second in sample[i + 1:]
+                    if index.jaccard(first, second) >= 0.8)
+        pairwise = (time.perf_counter() - started) * (count / len(sample)) ** 2
+        found = sum(1 for first, second, _ in duplicates if first in sample and second in sample)
+        print(f"  duplicates: {len(duplicates)} pairs, MinHash LSH {lsh * 1000:8.1f} ms "
+              f"({len(index.candidate_pairs())} candidates), all pairs ~{pairwise:8.1f} s "
+              f"(estimated); {found}/{exact} exact pairs found in the first {len(sample)} notes")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def bench_fuzzy(count: int):
+    """Typo-tolerant word lookup: vocabulary scan vs deletion index."""
+    print(f"🔤 Fuzzy lookups over {count} notes: vocabulary scan vs deletion index")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        vault = new_vault(temp_dir, "fuzzy.enc")
+        notes = make_notes(count)
+        # Rare words grow the vocabulary with the vault, as real notes do.
+        for i in range(0, count, 10):
+            notes[i].content += f" invoice{i} code{i * 7919 % 1000003}"
+        vault.add_notes(notes)
+        index = vault.search_index
+        
+        started = time.perf_counter()
+        vault.search_notes("warm up", fuzzy=True)
+        built = time.perf_counter() - started
+        stats = vault.fuzzy_index_stats()
+        print(f"  {stats['words']} words, {stats['variants']} deletion variants, "
+              f"{stats['bytes'] / 1048576:.1f} MiB, built in {built * 1000:.0f} ms")
+        
+        for term in ["backnd", "meetign", "invoce50", "kubernetse"]:
+            edits = allowed_edits(term, MAX_EDITS)
+            started = time.perf_counter()
+            scanned = [(word, distance) for word in index.postings
+                       for distance in [edit_distance(term, word, edits)] if distance <= edits]
+            scan = time.perf_counter() - started
+            started = time.perf_counter()
+            found = index.fuzzy.lookup(term, edits)
+            indexed = time.perf_counter() - started
+            print(f"  {term!r:13s}: {len(found):3d} words within {edits}, vocabulary scan "
+                  f"{scan * 1000:8.2f} ms, deletion index {indexed * 1000:6.3f} ms "
+                  f"({len(scanned)} by scan)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "autosave": bench_autosave,
+    "batch": bench_batch_writes,
+    "container": bench_container,
+    "fuzzy": bench_fuzzy,
+    "kdf": bench_kdf_calibration,
+    "memory": bench_memory,
+    "query": bench_query,
+    "ranked": bench_ranked,
+    "recent": bench_recent,
+    "related": bench_related,
+    "rotate": bench_password_rotation,
+    "search": bench_search,
+    "tags": bench_tags,
+    "typing": bench_typing,
+    "unlock": bench_parallel_unlock,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encrypted Notes Manager benchmarks')
+    parser.add_argument('benchmarks', nargs='*',
+                        help=f"Benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    parser.add_argument('--count', type=int, default=10000,
+                        help='Number of synthetic notes')
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args.count)
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
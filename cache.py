@@ -0,0 +1,59 @@
+"""
+Small bounded caches used by the notes vault.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total weight of its values."""
+    
+    def __init__(self, max_weight: int, weigh: Callable[[Any], int] = len):
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a cached value and mark it as recently used."""
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+    
+    def put(self, key: Hashable, value: Any):
+        """Cache a value, evicting the least recently used ones as needed."""
+        weight = self.weigh(value)
+        with self._lock:
+            if key in self._items:
+                self.weight -= self.weigh(self._items.pop(key))
+            if weight > self.max_weight:
+                return
+            self._items[key] = value
+            self.weight += weight
+            while self.weight > self.max_weight:
+                _, evicted = self._items.popitem(last=False)
+                self.weight -= self.weigh(evicted)
+    
+    def discard(self, key: Hashable):
+        """Drop a key from the cache if present."""
+        with self._lock:
+            if key in self._items:
+                self.weight -= self.weigh(self._items.pop(key))
+    
+    def clear(self):
+        """Empty the cache."""
+        with self._lock:
+            self._items.clear()
+            self.weight = 0
+    
+    def __len__(self) -> int:
+        return len(self._items)
@@ -6,15 +6,19 @@ Command Line Interface for the Encrypted Notes Manager
 import os
 import sys
 import getpass
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from notes_manager import NotesVault, Note
+from query import is_structured
+
+# Search matches are ordered by relevance when there are at most this many
+RANK_LIMIT = 2000
 
 
 class NotesManagerCLI:
     """Command Line Interface for the Encrypted Notes Manager."""
     
-    def __init__(self):
-        self.vault = NotesVault()
+    def __init__(self, vault: Optional[NotesVault] = None):
+        self.vault = vault or NotesVault()
         self.running = True
     
     def clear_screen(self):
@@ -42,6 +46,10 @@ class NotesManagerCLI:
             print("4. Edit Note")
             print("5. Delete Note")
             print("6. Lock Vault")
+            print("7. Change Master Password")
+            print("8. Create Recovery Key")
+            print("9. Tags")
+            print("10. Related Notes & Duplicates")
         print("0. Exit")
         print("-" * 30)
     
@@ -89,6 +97,11 @@ class NotesManagerCLI:
             self.wait_for_key()
             return
         
+        if self.vault.agent and self.vault.unlock_vault(None):
+            print("✅ Vault unlocked with the key cached by the unlock agent!")
+            self.wait_for_key()
+            return
+        
         password = self.get_password("Enter master password: ")
         
         if self.vault.unlock_vault(password):
@@ -103,7 +116,9 @@ class NotesManagerCLI:
         print("\n📝 ALL NOTES")
         print("-" * 50)
         
-        notes = self.vault.get_all_notes()
+        sort = self.get_input("Sort by [v]ault order, [m]odified or [c]reated (Enter for vault order): ")
+        by = {"m": "modified", "c": "created"}.get(sort[:1].lower())
+        notes = self.vault.recent_notes(by=by) if by else self.vault.get_all_notes()
         if not notes:
             print("No notes found.")
             self.wait_for_key()
@@ -112,6 +127,9 @@ class NotesManagerCLI:
         for i, (note_id, note) in enumerate(notes, 1):
             tags_str = f" [Tags: {', '.join(note.tags)}]" if note.tags else ""
             print(f"{i}. {note.title}{tags_str}")
+            if by:
+                stamp = getattr(note, f"{by}_at") or "-"
+                print(f"   {by.capitalize()}: {stamp[:16].replace('T', ' ')}")
             if note.content:
                 preview = note.content[:100] + "..." if len(note.content) > 100 else note.content
                 print(f"   {preview}")
@@ -124,22 +142,58 @@ class NotesManagerCLI:
         print("\n🔍 SEARCH NOTES")
         print("-" * 30)
         
+        print("Matches of plain words are ranked by relevance. Filters such as tag:python,")
+        print("title:budget, modified:<7d and AND/OR/NOT run as a query;")
+        print("prefix one with 'explain ' to see its plan.")
         query = self.get_input("Enter search query: ")
         if not query:
             return
         
-        results = self.vault.search_notes(query)
+        if query.startswith("explain "):
+            try:
+                print(self.vault.explain(query[len("explain "):]))
+            except ValueError as e:
+                print(f"❌ {e}")
+            self.wait_for_key()
+            return
+        
+        try:
+            results = [(note_id, note, None) for note_id, note in self.vault.search_notes(query)]
+        except ValueError as e:
+            print(f"❌ {e}")
+            self.wait_for_key()
+            return
+        ranked = False
+        if results and not is_structured(query) and len(results) <= RANK_LIMIT:
+            # Ranking only orders the notes that matched; it must not change which did.
+            by_relevance = self.vault.search_ranked(query, k=len(results),
+                                                    within=[note_id for note_id, _, _ in results])
+            if len(by_relevance) == len(results):
+                results = by_relevance
+                ranked = True
+        close_matches = False
+        if not results and not is_structured(query):
+            # Nothing matched as typed; allow a typo or two per word.
+            results = [(note_id, note, None)
+                       for note_id, note in self.vault.search_notes(query, fuzzy=True)[:20]]
+            close_matches = bool(results)
         if not results:
             print("No notes found matching your query.")
             self.wait_for_key()
             return
         
-        print(f"\nFound {len(results)} result(s):")
+        if close_matches:
+            print(f"\nNo exact matches; {len(results)} close match(es), closest first:")
+        elif ranked:
+            print(f"\nFound {len(results)} result(s), most relevant first:")
+        else:
+            print(f"\nFound {len(results)} result(s):")
         print("-" * 40)
         
-        for i, (note_id, note) in enumerate(results, 1):
+        for i, (note_id, note, score) in enumerate(results, 1):
             tags_str = f" [Tags: {', '.join(note.tags)}]" if note.tags else ""
-            print(f"{i}. {note.title}{tags_str}")
+            score_str = f" (score {score:.2f})" if score is not None else ""
+            print(f"{i}. {note.title}{tags_str}{score_str}")
             if note.content:
                 preview = note.content[:100] + "..." if len(note.content) > 100 else note.content
                 print(f"   {preview}")
@@ -147,6 +201,90 @@ class NotesManagerCLI:
         
         self.wait_for_key()
     
+    def show_tags(self):
+        """Show how many notes carry each tag and filter notes by tag."""
+        print("\n🏷️ TAGS")
+        print("-" * 30)
+        
+        counts = self.vault.tag_counts()
+        if not counts:
+            print("No tagged notes.")
+            self.wait_for_key()
+            return
+        
+        for tag, count in counts.items():
+            print(f"{count:6d}  {tag}")
+        
+        print("\nFilter with a tag query, e.g. tag:python AND NOT tag:archived")
+        query = self.get_input("Tag query (Enter to go back): ")
+        if not query:
+            return
+        
+        try:
+            results = self.vault.search_tags(query)
+        except ValueError as e:
+            print(f"❌ {e}")
+            self.wait_for_key()
+            return
+        
+        print(f"\n{len(results)} note(s) match:")
+        print("-" * 40)
+        for i, (note_id, note) in enumerate(results, 1):
+            tags_str = f" [Tags: {', '.join(note.tags)}]" if note.tags else ""
+            print(f"{i}. {note.title}{tags_str}")
+        
+        self.wait_for_key()
+    
+    def show_related(self):
+        """Show the notes related to one note, or a near-duplicate report."""
+        print("\n🔗 RELATED NOTES & DUPLICATES")
+        print("-" * 30)
+        
+        notes = self.vault.get_all_notes()
+        if not notes:
+            print("No notes found.")
+            self.wait_for_key()
+            return
+        
+        for i, (note_id, note) in enumerate(notes, 1):
+            print(f"{i}. {note.title}")
+        
+        choice = self.get_input("Enter note number (Enter for a duplicates report): ")
+        if not choice:
+            duplicates = self.vault.find_duplicates()
+            if not duplicates:
+                print("No near-duplicate notes found.")
+            else:
+                print(f"\n{len(duplicates)} near-duplicate pair(s):")
+                print("-" * 40)
+                for note_id, other_id, similarity in duplicates:
+                    print(f"{similarity:4.0%}  {self.vault.notes[note_id].title}  ~  "
+                          f"{self.vault.notes[other_id].title}")
+            self.wait_for_key()
+            return
+        
+        try:
+            index = int(choice)
+        except ValueError:
+            print("❌ Please enter a valid number.")
+            self.wait_for_key()
+            return
+        if not 1 <= index <= len(notes):
+            print("❌ Invalid selection.")
+            self.wait_for_key()
+            return
+        
+        note_id, note = notes[index - 1]
+        related = self.vault.related_notes(note_id, k=10)
+        print(f"\nNotes related to {note.title!r}:")
+        print("-" * 40)
+        if not related:
+            print("No related notes found.")
+        for i, (_, other, similarity) in enumerate(related, 1):
+            print(f"{i}. {other.title} ({similarity:.2f})")
+        
+        self.wait_for_key()
+    
     def create_note(self):
         """Create a new note."""
         print("\n✏️  CREATE NEW NOTE")
@@ -274,6 +412,46 @@ class NotesManagerCLI:
         
         self.wait_for_key()
     
+    def change_password(self):
+        """Change the master password."""
+        print("\n🔑 CHANGE MASTER PASSWORD")
+        print("-" * 30)
+        
+        current_password = self.get_password("Enter current master password: ")
+        password = self.get_password("Enter new master password: ")
+        if len(password) < 6:
+            print("❌ Password should be at least 6 characters long.")
+            self.wait_for_key()
+            return
+        
+        confirm_password = self.get_password("Confirm new master password: ")
+        if password != confirm_password:
+            print("❌ Passwords do not match.")
+            self.wait_for_key()
+            return
+        
+        if self.vault.change_master_password(current_password, password):
+            print("✅ Master password changed!")
+        else:
+            print("❌ Invalid password.")
+        
+        self.wait_for_key()
+    
+    def create_recovery_key(self):
+        """Create a recovery key for the vault."""
+        print("\n🗝️ CREATE RECOVERY KEY")
+        print("-" * 30)
+        
+        recovery_key = self.vault.add_recovery_key()
+        if recovery_key:
+            print("✅ Recovery key created. It unlocks the vault in place of the master password.")
+            print("   Store it somewhere safe; it will not be shown again.")
+            print(f"\n   {recovery_key}")
+        else:
+            print("❌ Failed to create recovery key.")
+        
+        self.wait_for_key()
+    
     def lock_vault(self):
         """Lock the vault."""
         self.vault.lock_vault()
@@ -282,65 +460,78 @@ class NotesManagerCLI:
     
     def run(self):
         """Run the CLI application."""
-        while self.running:
-            self.clear_screen()
-            self.print_header()
+        try:
+            while self.running:
+                self.clear_screen()
+                self.print_header()
             
-            if self.vault.is_unlocked:
-                print(f"🔓 Vault Status: UNLOCKED ({len(self.vault.notes)} notes)")
-            else:
-                print("🔒 Vault Status: LOCKED")
+                if self.vault.is_unlocked:
+                    print(f"🔓 Vault Status: UNLOCKED ({len(self.vault.notes)} notes)")
+                else:
+                    print("🔒 Vault Status: LOCKED")
             
-            print()
-            self.print_menu()
+                print()
+                self.print_menu()
             
-            try:
-                choice = self.get_input("Enter your choice: ")
+                try:
+                    choice = self.get_input("Enter your choice: ")
                 
-                if choice == "0":
-                    self.running = False
-                    print("👋 Goodbye!")
-                    break
-                elif not self.vault.is_unlocked:
-                    if choice == "1":
-                        self.create_vault()
-                    elif choice == "2":
-                        self.open_vault()
-                    else:
-                        print("❌ Invalid choice.")
-                        self.wait_for_key()
-                else:
-                    if choice == "1":
-                        self.list_notes()
-                    elif choice == "2":
-                        self.search_notes()
-                    elif choice == "3":
-                        self.create_note()
-                    elif choice == "4":
-                        self.edit_note()
-                    elif choice == "5":
-                        self.delete_note()
-                    elif choice == "6":
-                        self.lock_vault()
+                    if choice == "0":
+                        self.running = False
+                        print("👋 Goodbye!")
+                        break
+                    elif not self.vault.is_unlocked:
+                        if choice == "1":
+                            self.create_vault()
+                        elif choice == "2":
+                            self.open_vault()
+                        else:
+                            print("❌ Invalid choice.")
+                            self.wait_for_key()
                     else:
-                        print("❌ Invalid choice.")
-                        self.wait_for_key()
+                        if choice == "1":
+                            self.list_notes()
+                        elif choice == "2":
+                            self.search_notes()
+                        elif choice == "3":
+                            self.create_note()
+                        elif choice == "4":
+                            self.edit_note()
+                        elif choice == "5":
+                            self.delete_note()
+                        elif choice == "6":
+                            self.lock_vault()
+                        elif choice == "7":
+                            self.change_password()
+                        elif choice == "8":
+                            self.create_recovery_key()
+                        elif choice in ("9", "tags"):
+                            self.show_tags()
+                        elif choice in ("10", "related"):
+                            self.show_related()
+                        else:
+                            print("❌ Invalid choice.")
+                            self.wait_for_key()
             
-            except KeyboardInterrupt:
-                print("\n\n👋 Goodbye!")
-                self.running = False
-                break
-            except EOFError:
-                print("\n\n👋 Goodbye!")
-                self.running = False
-                break
-            except Exception as e:
-                print(f"❌ An error occurred: {e}")
-                try:
-                    self.wait_for_key()
-                except (EOFError, KeyboardInterrupt):
+                except KeyboardInterrupt:
+                    print("\n\n👋 Goodbye!")
+                    self.running = False
+                    break
+                except EOFError:
+                    print("\n\n👋 Goodbye!")
                     self.running = False
                     break
+                except Exception as e:
+                    print(f"❌ An error occurred: {e}")
+                    try:
+                        self.wait_for_key()
+                    except (EOFError, KeyboardInterrupt):
+                        self.running = False
+                        break
+        finally:
+            # Locking writes the search index, so the next unlock need not rebuild it.
+            if self.vault.is_unlocked:
+                self.vault.lock_vault()
 
 
 if __name__ == "__main__":
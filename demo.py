@@ -5,6 +5,7 @@ Demo script to showcase the Encrypted Notes Manager functionality
 
 import os
 import sys
+import shutil
 import tempfile
 from notes_manager import NotesVault, Note
 
@@ -57,11 +58,12 @@ def demo_encryption_features():
         }
     ]
     
-    note_ids = []
+    notes = [
+        Note(note_data["title"], note_data["content"], note_data["tags"])
+        for note_data in notes_data
+    ]
+    note_ids = vault.add_notes(notes)
     for note_data in notes_data:
-        note = Note(note_data["title"], note_data["content"], note_data["tags"])
-        note_id = vault.add_note(note)
-        note_ids.append(note_id)
         print(f"  ✅ Added: {note_data['title']}")
     
     print(f"📊 Total notes in vault: {len(vault.notes)}")
@@ -106,12 +108,13 @@ def demo_encryption_features():
     
     print("6️⃣ Verifying file encryption...")
     print(f"📁 Vault file exists: {os.path.exists(vault.vault_path)}")
-    print(f"📁 Salt file exists: {os.path.exists(vault.salt_path)}")
     
     if os.path.exists(vault.vault_path):
         with open(vault.vault_path, 'rb') as f:
             encrypted_content = f.read()[:100]
         
+        print(f"🏷️ Format: {encrypted_content[:5].decode()} v{encrypted_content[5]} (AES-256-GCM)")
+        
         print(f"📄 Encrypted file size: {len(encrypted_content)} bytes (showing first 100)")
         print(f"🔒 Encrypted content (hex): {encrypted_content.hex()}")
     print()
@@ -142,9 +145,7 @@ def demo_encryption_features():
     print("🧹 Cleaning up demo files...")
     vault.lock_vault()
     try:
-        os.remove(vault.vault_path)
-        os.remove(vault.salt_path)
-        os.rmdir(temp_dir)
+        shutil.rmtree(temp_dir)
         print("✅ Demo files cleaned up!")
     except Exception as e:
         print(f"⚠️ Cleanup warning: {e}")
@@ -0,0 +1,164 @@
+"""
+Encryption primitives for the notes vault.
+
+Vault data is encrypted with AES-256-GCM and stored as raw binary (12-byte
+nonce followed by ciphertext and tag) under a random data key. Each
+credential (the master password, an optional recovery key) has a key slot
+in the vault header holding the data key wrapped under a key derived from
+that credential, so changing a credential only rewrites its slot. The KDF
+and its parameters are recorded per slot (see kdf.py).
+
+Format v2 vaults used the password-derived key directly and format v1
+vaults used base64 Fernet tokens; both are only read, to migrate them.
+"""
+
+import os
+import base64
+from typing import Dict, List, Optional, Union
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from kdf import DEFAULT_KDF, DEFAULT_TARGET_SECONDS, PBKDF2KDF, calibrate, get_kdf
+
+PBKDF2_ITERATIONS = PBKDF2KDF.MIN_ITERATIONS
+NONCE_SIZE = 12
+# associated data for wrapped data keys
+KEY_WRAP_AAD = b"notes-vault-data-key"
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class EncryptionManager:
+    """Handles encryption and decryption of notes using AES-GCM."""
+    
+    def __init__(self):
+        self.salt = None
+        self.iterations = PBKDF2_ITERATIONS
+        self.key = None
+        self.aead = None
+        self.fernet = None
+        # Key slots for the vault header: the data key wrapped per credential
+        self.keyslots: List[Dict] = []
+        # KDF for new key slots, calibrated to this unlock time (None: defaults)
+        self.kdf = DEFAULT_KDF
+        self.kdf_target_seconds: Optional[float] = DEFAULT_TARGET_SECONDS
+    
+    def derive_key(self, password: str, salt: bytes = None,
+                   iterations: Optional[int] = None) -> bytes:
+        """Derive a raw 256-bit key from password using PBKDF2."""
+        if salt is None:
+            salt = os.urandom(16)
+        self.salt = salt
+        self.iterations = iterations or PBKDF2_ITERATIONS
+        
+        return get_kdf(PBKDF2KDF.name).derive(password, salt, {'iterations': self.iterations})
+    
+    def set_password(self, password: str, salt: bytes = None,
+                     iterations: Optional[int] = None):
+        """Use a key derived straight from the password (format v1/v2 vaults)."""
+        self.set_key(self.derive_key(password, salt, iterations))
+    
+    def create_key(self, password: str):
+        """Generate a new random data key, unlocked by the given password."""
+        self.set_key(AESGCM.generate_key(bit_length=256))
+        self.keyslots = []
+        self.add_keyslot("password", password)
+    
+    def unlock(self, password: str, keyslots: List[Dict]) -> str:
+        """Unwrap the data key with the first key slot the password opens.
+        
+        Returns the name of that slot.
+        """
+        for slot in keyslots:
+            key = self._unwrap(password, slot)
+            if key is not None:
+                self.set_key(key)
+                self.keyslots = [dict(keyslot) for keyslot in keyslots]
+                return slot['name']
+        raise ValueError("Invalid password")
+    
+    def verify(self, password: str) -> bool:
+        """Check a credential against the current key slots."""
+        return any(self._unwrap(password, slot) == self.key for slot in self.keyslots)
+    
+    def add_keyslot(self, name: str, password: str):
+        """Wrap the data key under a password, replacing any slot of that name."""
+        if not self.key:
+            raise ValueError("Encryption not initialized. Set password first.")
+        kdf = get_kdf(self.kdf)
+        if self.kdf_target_seconds:
+            params = calibrate(kdf.name, self.kdf_target_seconds)
+        else:
+            params = kdf.default_params()
+        salt = os.urandom(16)
+        wrapping_key = AESGCM(kdf.derive(password, salt, params))
+        nonce = os.urandom(NONCE_SIZE)
+        wrapped = nonce + wrapping_key.encrypt(nonce, self.key, KEY_WRAP_AAD)
+        self.keyslots = [slot for slot in self.keyslots if slot['name'] != name]
+        self.keyslots.append(dict(
+            {'name': name, 'kdf': kdf.name},
+            **params,
+            salt=base64.b64encode(salt).decode(),
+            wrapped=base64.b64encode(wrapped).decode()
+        ))
+    
+    def remove_keyslot(self, name: str):
+        """Drop a key slot; the last remaining slot cannot be removed."""
+        remaining = [slot for slot in self.keyslots if slot['name'] != name]
+        if not remaining:
+            raise ValueError("Cannot remove the only key slot")
+        self.keyslots = remaining
+    
+    def _unwrap(self, password: str, slot: Dict) -> Optional[bytes]:
+        """Unwrap the data key from one slot; None if the password is wrong."""
+        kdf = get_kdf(slot['kdf'])
+        wrapping_key = AESGCM(kdf.derive(
+            password, base64.b64decode(slot['salt']), kdf.params_of(slot)
+        ))
+        wrapped = base64.b64decode(slot['wrapped'])
+        try:
+            return wrapping_key.decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:], KEY_WRAP_AAD)
+        except InvalidTag:
+            return None
+    
+    def set_key(self, key: bytes):
+        """Initialize encryption from an already derived key."""
+        self.key = key
+        self.aead = AESGCM(key)
+        # Format v1 vaults were Fernet tokens under the same derived key.
+        self.fernet = Fernet(base64.urlsafe_b64encode(key))
+    
+    def clear(self):
+        """Forget the key material."""
+        self.key = None
+        self.aead = None
+        self.fernet = None
+        self.keyslots = []
+    
+    def header_params(self) -> Dict:
+        """Key slots to record in the vault header."""
+        return {'keyslots': self.keyslots}
+    
+    def encrypt_data(self, data: str, aad: Optional[bytes] = None) -> bytes:
+        """Encrypt string data into a nonce + AES-GCM ciphertext blob."""
+        if not self.aead:
+            raise ValueError("Encryption not initialized. Set password first.")
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self.aead.encrypt(nonce, data.encode(), aad)
+    
+    def decrypt_data(self, encrypted_data: Buffer, aad: Optional[bytes] = None) -> str:
+        """Decrypt a nonce + ciphertext blob back to string.
+        
+        Accepts any buffer, so callers can pass memoryview slices of a file
+        they read once instead of copying every record.
+        """
+        if not self.aead:
+            raise ValueError("Encryption not initialized. Set password first.")
+        view = memoryview(encrypted_data)
+        return self.aead.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], aad).decode()
+    
+    def decrypt_legacy(self, token: Buffer) -> str:
+        """Decrypt a format v1 Fernet token."""
+        if not self.fernet:
+            raise ValueError("Encryption not initialized. Set password first.")
+        return self.fernet.decrypt(bytes(token)).decode()
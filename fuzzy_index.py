@@ -0,0 +1,112 @@
+"""
+Typo-tolerant term lookup for the notes vault search index.
+
+A SymSpell-style deletion index: every vocabulary word is filed under each
+string obtained by deleting up to ``max_edits`` characters from its first
+``prefix_length`` characters. Two words within that many edits of each
+other share such a deletion variant, so the words near a query term are
+found by looking up the term's own variants, and only those candidates
+have their edit distance computed. Limiting variants to a prefix bounds
+memory; the price is that a few matches with several insertions or
+deletions inside the prefix can be missed.
+"""
+
+import sys
+from typing import Dict, List, Set, Tuple
+
+MAX_EDITS = 2
+PREFIX_LENGTH = 7
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (transpositions count as one edit).
+    
+    Stops early and returns limit + 1 once the distance must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1,
+                        previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def allowed_edits(term: str, max_edits: int) -> int:
+    """Edits tolerated for a query term: one per four characters, at least one."""
+    return min(max_edits, max(1, len(term) // 4))
+
+
+class DeletionIndex:
+    """Deletion variants -> vocabulary words, updated word by word."""
+    
+    def __init__(self, max_edits: int = MAX_EDITS, prefix_length: int = PREFIX_LENGTH):
+        self.max_edits = max_edits
+        self.prefix_length = prefix_length
+        self.variants: Dict[str, Set[str]] = {}
+        self.word_count = 0
+    
+    def _deletes(self, word: str, edits: int) -> Set[str]:
+        """The word's prefix with up to edits characters deleted."""
+        variants = {word[:self.prefix_length]}
+        frontier = variants
+        for _ in range(edits):
+            frontier = {
+                variant[:i] + variant[i + 1:]
+                for variant in frontier
+                for i in range(len(variant))
+            }
+            variants = variants | frontier
+        return variants
+    
+    def add(self, word: str):
+        """File a new vocabulary word."""
+        for variant in self._deletes(word, self.max_edits):
+            self.variants.setdefault(variant, set()).add(word)
+        self.word_count += 1
+    
+    def remove(self, word: str):
+        """Forget a word that left the vocabulary."""
+        for variant in self._deletes(word, self.max_edits):
+            words = self.variants.get(variant)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.variants[variant]
+        self.word_count -= 1
+    
+    def lookup(self, term: str, max_edits: int) -> List[Tuple[str, int]]:
+        """Vocabulary words within max_edits of the term, as (word, distance)."""
+        if max_edits > self.max_edits:
+            raise ValueError(f"The fuzzy index supports at most {self.max_edits} edits")
+        candidates: Set[str] = set()
+        for variant in self._deletes(term, max_edits):
+            candidates |= self.variants.get(variant, set())
+        
+        matches = []
+        for word in candidates:
+            distance = edit_distance(term, word, max_edits)
+            if distance <= max_edits:
+                matches.append((word, distance))
+        return matches
+    
+    def stats(self) -> Dict:
+        """Size of the index, with its approximate memory use in bytes."""
+        size = sys.getsizeof(self.variants)
+        for variant, words in self.variants.items():
+            # Words are shared with the search index; only the sets and keys are ours.
+            size += sys.getsizeof(variant) + sys.getsizeof(words)
+        return {
+            'words': self.word_count,
+            'variants': len(self.variants),
+            'bytes': size
+        }
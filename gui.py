@@ -1,9 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from tkinter.scrolledtext import ScrolledText
-import threading
-from typing import Optional, Tuple
+import itertools
+from typing import Callable, List, Optional, Tuple
 from notes_manager import NotesVault, Note
+from query import is_structured
+from task_runner import Debouncer, TaskRunner
+from autosave import Autosaver
+from virtual_list import VirtualList
+
+# Search matches are ordered by relevance when there are at most this many
+RANK_LIMIT = 2000
+# Search once typing has paused this long
+SEARCH_DELAY_MS = 150
+# Notes larger than this (UTF-8 bytes) open as a read-only preview of PREVIEW_KB
+LARGE_NOTE_BYTES = 256 * 1024
+PREVIEW_KB = 64
+# Characters inserted into the editor per after() callback when loading a large note
+LOAD_CHUNK_CHARS = 64 * 1024
+# The notes list shows the size of notes at least this large (UTF-8 bytes)
+SIZE_INDICATOR_BYTES = 10 * 1024
+# The search index is written on the worker once changes have paused this long
+INDEX_SAVE_DELAY_MS = 30 * 1000
+
+
+def format_size(size: int) -> str:
+    """Human-readable size in bytes."""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{max(1, round(size / 1024))} KB"
 
 
 class PasswordDialog:
@@ -52,21 +77,66 @@ class PasswordDialog:
         self.dialog.destroy()
 
 
+class EditTarget:
+    """The note open in the editor.
+    
+    Autosaves of a new note run on the worker before its id is known; the
+    first one fills in note_id, so later ones update that note instead of
+    adding it again. listed_id is the id the UI thread has seen, so a new
+    note is noticed by whichever save result arrives first, even when the
+    save that added it was superseded.
+    """
+    
+    serials = itertools.count(1)
+    
+    def __init__(self, note_id: Optional[str] = None):
+        self.note_id = note_id
+        self.listed_id = note_id
+        self.serial = next(self.serials)
+
+
 class NotesManagerGUI:
     """Main GUI for the Encrypted Notes Manager."""
     
-    def __init__(self):
+    def __init__(self, vault: Optional[NotesVault] = None, search_delay_ms: int = SEARCH_DELAY_MS,
+                 preview_kb: int = PREVIEW_KB):
         self.root = tk.Tk()
         self.root.title("Encrypted Notes Manager")
         self.root.geometry("800x600")
         
         self.set_window_icon()
         
-        self.vault = NotesVault()
+        self.vault = vault or NotesVault()
+        self.search_session = self.vault.search_session()
         self.current_note_id = None
-        self.notes_list = []
+        self.tag_list = []
         
         self.setup_gui()
+        # Unlock, save and search run here, off the Tk main thread
+        self.tasks = TaskRunner(self.root.after, on_busy_change=self.on_busy_change)
+        self.search_debouncer = Debouncer(self.root.after, self.root.after_cancel,
+                                          search_delay_ms, self.start_search)
+        # Query the next search will run, and a token bumped whenever it changes;
+        # results of searches started under an older token are dropped.
+        self.pending_query: Optional[str] = None
+        self.search_generation = 0
+        # Edits are written once typing pauses, or every few seconds while it goes on
+        self.autosaver = Autosaver(self.root.after, self.root.after_cancel, self.autosave_note)
+        self.index_debouncer = Debouncer(self.root.after, self.root.after_cancel,
+                                         INDEX_SAVE_DELAY_MS, self.save_search_index)
+        self.edit_target = EditTarget()
+        self.loading_editor = False
+        # Content of the open note as loaded; saved as is until the text is edited,
+        # so a preview or a note still loading in chunks is never saved truncated.
+        # None while the note is being decrypted on the worker.
+        self.editor_content: Optional[str] = ""
+        self.content_dirty = False
+        self.preview_bytes = preview_kb * 1024
+        # Bumped per note opened, so chunked loads of a note left behind stop
+        self.load_generation = 0
+        # Whether the editor shows only part of the note (read-only)
+        self.previewing = False
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
         self.update_ui_state()
     
     def set_window_icon(self):
@@ -84,6 +154,29 @@ class NotesManagerGUI:
         main_paned = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
         main_paned.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        tags_sidebar = ttk.Frame(main_paned)
+        main_paned.add(tags_sidebar, weight=0)
+        
+        ttk.Label(tags_sidebar, text="Tags:").pack(anchor=tk.W)
+        
+        tags_container = ttk.Frame(tags_sidebar)
+        tags_container.pack(fill=tk.BOTH, expand=True)
+        
+        self.tags_listbox = tk.Listbox(tags_container, width=18, exportselection=False)
+        tags_scrollbar = ttk.Scrollbar(tags_container, orient=tk.VERTICAL, command=self.tags_listbox.yview)
+        self.tags_listbox.configure(yscrollcommand=tags_scrollbar.set)
+        
+        self.tags_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        tags_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tags_listbox.bind('<<ListboxSelect>>', self.on_tag_select)
+        
+        self.tag_query_var = tk.StringVar()
+        self.tag_query_entry = ttk.Entry(tags_sidebar, textvariable=self.tag_query_var)
+        self.tag_query_entry.pack(fill=tk.X, pady=(5, 0))
+        self.tag_query_entry.bind('<Return>', self.on_tag_query)
+        ttk.Label(tags_sidebar, text="e.g. tag:a AND NOT tag:b", font=("TkDefaultFont", 8)).pack(anchor=tk.W)
+        
         left_frame = ttk.Frame(main_paned)
         main_paned.add(left_frame, weight=1)
         
@@ -95,25 +188,29 @@ class NotesManagerGUI:
         self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
         self.search_entry.bind('<KeyRelease>', self.on_search)
+        self.search_entry.bind('<Return>', lambda e: self.search_debouncer.flush())
         
         ttk.Button(search_frame, text="Clear", command=self.clear_search).pack(side=tk.RIGHT)
         
         list_frame = ttk.Frame(left_frame)
         list_frame.pack(fill=tk.BOTH, expand=True)
         
-        ttk.Label(list_frame, text="Notes:").pack(anchor=tk.W)
+        list_header = ttk.Frame(list_frame)
+        list_header.pack(fill=tk.X)
         
-        list_container = ttk.Frame(list_frame)
-        list_container.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(list_header, text="Notes:").pack(side=tk.LEFT)
+        self.sort_var = tk.StringVar(value="Vault order")
+        self.sort_combo = ttk.Combobox(list_header, textvariable=self.sort_var, state="readonly", width=16,
+                                       values=["Vault order", "Recently modified", "Recently created"])
+        self.sort_combo.pack(side=tk.RIGHT)
+        self.sort_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_notes_list())
+        ttk.Label(list_header, text="Sort:").pack(side=tk.RIGHT, padx=(0, 5))
         
-        self.notes_listbox = tk.Listbox(list_container)
-        scrollbar = ttk.Scrollbar(list_container, orient=tk.VERTICAL, command=self.notes_listbox.yview)
-        self.notes_listbox.configure(yscrollcommand=scrollbar.set)
-        
-        self.notes_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.notes_listbox.bind('<<ListboxSelect>>', self.on_note_select)
+        # Backed by a sequence of (note_id, note) pairs; only visible rows reach Tk.
+        # Titles come from the vault, so autosaved renames show without a refresh.
+        self.notes_view = VirtualList(list_frame, label=self.note_label,
+                                      on_select=self.on_note_select)
+        self.notes_view.pack(fill=tk.BOTH, expand=True)
         
         buttons_frame = ttk.Frame(left_frame)
         buttons_frame.pack(fill=tk.X, pady=(5, 0))
@@ -134,7 +231,7 @@ class NotesManagerGUI:
         self.title_var = tk.StringVar()
         self.title_entry = ttk.Entry(title_frame, textvariable=self.title_var)
         self.title_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
-        self.title_entry.bind('<KeyRelease>', self.on_title_change)
+        self.title_var.trace_add('write', self.on_title_change)
         
         tags_frame = ttk.Frame(right_frame)
         tags_frame.pack(fill=tk.X, pady=(0, 5))
@@ -143,14 +240,26 @@ class NotesManagerGUI:
         self.tags_var = tk.StringVar()
         self.tags_entry = ttk.Entry(tags_frame, textvariable=self.tags_var)
         self.tags_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
-        self.tags_entry.bind('<KeyRelease>', self.on_tags_change)
+        self.tags_var.trace_add('write', self.on_tags_change)
         
         ttk.Label(tags_frame, text="(comma-separated)", font=("TkDefaultFont", 8)).pack(side=tk.RIGHT, padx=(5, 0))
         
         ttk.Label(right_frame, text="Content:").pack(anchor=tk.W)
+        # Shown above the content while a large note is previewed or loading
+        self.preview_frame = ttk.Frame(right_frame)
+        self.preview_var = tk.StringVar()
+        ttk.Label(self.preview_frame, textvariable=self.preview_var).pack(side=tk.LEFT)
+        self.load_full_btn = ttk.Button(self.preview_frame, text="Load full note", command=self.load_full_note)
+        self.load_full_btn.pack(side=tk.RIGHT)
         self.content_text = ScrolledText(right_frame, wrap=tk.WORD, height=20)
         self.content_text.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
-        self.content_text.bind('<KeyRelease>', self.on_content_change)
+        self.content_text.bind('<<Modified>>', self.on_content_change)
+        
+        ttk.Label(right_frame, text="Related notes:").pack(anchor=tk.W)
+        self.related_listbox = tk.Listbox(right_frame, height=4, exportselection=False)
+        self.related_listbox.pack(fill=tk.X, pady=(0, 5))
+        self.related_listbox.bind('<<ListboxSelect>>', self.on_related_select)
+        self.related_list = []
         
         save_frame = ttk.Frame(right_frame)
         save_frame.pack(fill=tk.X)
@@ -160,8 +269,13 @@ class NotesManagerGUI:
         
         self.status_var = tk.StringVar()
         self.status_var.set("Vault is locked. Use File menu to unlock or create vault.")
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar = ttk.Frame(self.root, relief=tk.SUNKEN)
         status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        ttk.Label(status_bar, textvariable=self.status_var, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # Shown while background tasks run
+        self.busy_var = tk.StringVar()
+        self.busy_label = ttk.Label(status_bar, textvariable=self.busy_var)
+        self.busy_bar = ttk.Progressbar(status_bar, mode='indeterminate', length=80)
     
     def create_menu(self):
         """Create the application menu."""
@@ -175,8 +289,13 @@ class NotesManagerGUI:
         file_menu.add_command(label="Open Vault", command=self.open_vault)
         file_menu.add_separator()
         file_menu.add_command(label="Lock Vault", command=self.lock_vault)
+        file_menu.add_command(label="Change Master Password", command=self.change_password)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.exit_app)
+        
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Tools", menu=tools_menu)
+        tools_menu.add_command(label="Find Duplicate Notes", command=self.show_duplicates)
         
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Help", menu=help_menu)
@@ -187,21 +306,28 @@ class NotesManagerGUI:
         is_unlocked = self.vault.is_unlocked
         
         controls = [
-            self.search_entry, self.notes_listbox, self.new_note_btn,
+            self.search_entry, self.notes_view, self.tags_listbox, self.sort_combo,
+            self.tag_query_entry, self.new_note_btn,
             self.delete_note_btn, self.title_entry, self.tags_entry,
-            self.content_text, self.save_btn
+            self.content_text, self.save_btn, self.related_listbox
         ]
         
         state = tk.NORMAL if is_unlocked else tk.DISABLED
         for control in controls:
             control.config(state=state)
+        if self.editor_content is None:
+            self.set_editor_state(tk.DISABLED)
+        elif self.previewing:
+            self.content_text.config(state=tk.DISABLED)
         
+        self.reset_search()
         if is_unlocked:
             self.status_var.set(f"Vault unlocked - {len(self.vault.notes)} notes")
             self.refresh_notes_list()
         else:
             self.status_var.set("Vault is locked")
-            self.notes_listbox.delete(0, tk.END)
+            self.notes_view.set_items([])
+            self.tags_listbox.delete(0, tk.END)
             self.clear_editor()
     
     def new_vault(self):
@@ -219,86 +345,484 @@ class NotesManagerGUI:
             self.root.wait_window(confirm_dialog.dialog)
             
             if confirm_dialog.result == password:
-                if self.vault.create_vault(password):
-                    messagebox.showinfo("Success", "Vault created successfully!")
-                    self.update_ui_state()
-                else:
-                    messagebox.showerror("Error", "Failed to create vault.")
+                def created(ok):
+                    if ok:
+                        messagebox.showinfo("Success", "Vault created successfully!")
+                        self.update_ui_state()
+                    else:
+                        messagebox.showerror("Error", "Failed to create vault.")
+                
+                self.tasks.submit("unlock", lambda: self.vault.create_vault(password), created,
+                                  self.on_task_error, "Creating vault")
             else:
                 messagebox.showerror("Error", "Passwords do not match.")
     
     def open_vault(self):
         """Open an existing vault."""
+        if self.vault.agent:
+            def unlocked_by_agent(ok):
+                if ok:
+                    self.update_ui_state()
+                    self.status_var.set(f"Vault unlocked by agent - {len(self.vault.notes)} notes")
+                else:
+                    self.ask_password_and_unlock()
+            
+            self.tasks.submit("unlock", lambda: self.vault.unlock_vault(None), unlocked_by_agent,
+                              self.on_task_error, "Unlocking vault")
+            return
+        
+        self.ask_password_and_unlock()
+    
+    def ask_password_and_unlock(self):
+        """Prompt for the master password and unlock in the background."""
         password_dialog = PasswordDialog(self.root, "Open Vault", "Enter master password:")
         self.root.wait_window(password_dialog.dialog)
         
         if password_dialog.result:
             password = password_dialog.result
-            if self.vault.unlock_vault(password):
-                messagebox.showinfo("Success", "Vault unlocked successfully!")
-                self.update_ui_state()
-            else:
-                messagebox.showerror("Error", "Invalid password or vault not found.")
+            
+            def unlocked(ok):
+                if ok:
+                    messagebox.showinfo("Success", "Vault unlocked successfully!")
+                    self.update_ui_state()
+                else:
+                    messagebox.showerror("Error", "Invalid password or vault not found.")
+            
+            self.tasks.submit("unlock", lambda: self.vault.unlock_vault(password), unlocked,
+                              self.on_task_error, "Unlocking vault")
+    
+    def change_password(self):
+        """Change the master password of the open vault."""
+        if not self.vault.is_unlocked:
+            messagebox.showwarning("Locked", "Open a vault first.")
+            return
+        
+        current_dialog = PasswordDialog(self.root, "Change Master Password", "Enter current master password:")
+        self.root.wait_window(current_dialog.dialog)
+        if not current_dialog.result:
+            return
+        
+        password_dialog = PasswordDialog(self.root, "Change Master Password", "Enter new master password:")
+        self.root.wait_window(password_dialog.dialog)
+        if not password_dialog.result:
+            return
+        
+        password = password_dialog.result
+        if len(password) < 6:
+            messagebox.showwarning("Weak Password", "Password should be at least 6 characters long.")
+            return
+        
+        confirm_dialog = PasswordDialog(self.root, "Confirm Password", "Confirm new master password:")
+        self.root.wait_window(confirm_dialog.dialog)
+        
+        if confirm_dialog.result == password:
+            def changed(ok):
+                if ok:
+                    messagebox.showinfo("Success", "Master password changed!")
+                else:
+                    messagebox.showerror("Error", "Invalid password.")
+            
+            self.tasks.submit("password",
+                              lambda: self.vault.change_master_password(current_dialog.result, password),
+                              changed, self.on_task_error, "Changing master password")
+        else:
+            messagebox.showerror("Error", "Passwords do not match.")
     
     def lock_vault(self):
         """Lock the current vault."""
         if self.vault.is_unlocked:
-            self.vault.lock_vault()
-            self.update_ui_state()
-            messagebox.showinfo("Locked", "Vault has been locked.")
+            # Queued behind any save still running; results of searches are of no use now.
+            self.autosaver.flush()
+            self.reset_search()
+            # Locking writes the index itself.
+            self.index_debouncer.cancel()
+            for kind in ("related", "list", "tags", "open"):
+                self.tasks.cancel(kind)
+            
+            def locked(_):
+                self.update_ui_state()
+                messagebox.showinfo("Locked", "Vault has been locked.")
+            
+            self.tasks.submit("lock", self.vault.lock_vault, locked, self.on_task_error, "Locking vault")
+    
+    def on_busy_change(self, description: Optional[str]):
+        """Show or hide the busy indicator in the status bar."""
+        if description:
+            self.busy_var.set(f"{description}...")
+            if not self.busy_bar.winfo_ismapped():
+                self.busy_bar.pack(side=tk.RIGHT, padx=(5, 2))
+                self.busy_label.pack(side=tk.RIGHT)
+                self.busy_bar.start(15)
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.busy_label.pack_forget()
+    
+    def on_task_error(self, error: Exception):
+        """Report a background task that failed."""
+        messagebox.showerror("Error", str(error))
+        self.update_ui_state()
     
     def refresh_notes_list(self):
-        """Refresh the notes list."""
-        self.notes_listbox.delete(0, tk.END)
-        self.notes_list = self.vault.get_all_notes()
+        """Refresh the notes list and the tag sidebar."""
+        self.show_all_notes()
+        self.refresh_tags()
+    
+    def show_all_notes(self):
+        """List every note in the order picked in the sort box."""
+        sort = self.sort_var.get()
+        self.filter_notes(lambda: self.sorted_notes(sort))
+    
+    def filter_notes(self, work: Callable[[], List], status: Optional[Callable[[int], str]] = None,
+                     on_error: Optional[Callable[[Exception], None]] = None):
+        """Show the (note_id, note) pairs work() returns, run on the worker.
+        
+        The worker is the only thread changing the vault's indexes, so
+        reads of them go through it as well.
+        """
+        if not self.vault.is_unlocked:
+            return
+        
+        def show(notes):
+            self.show_notes(notes)
+            if status is not None:
+                self.status_var.set(status(len(notes)))
+        
+        self.tasks.submit("list", work, show,
+                          on_error or (lambda e: self.status_var.set(f"Listing notes failed: {e}")),
+                          "Loading notes")
+    
+    def sorted_notes(self, sort: str):
+        """All notes in a sort box order (worker thread)."""
+        if sort == "Recently modified":
+            return self.vault.recent_notes(by="modified")
+        if sort == "Recently created":
+            return self.vault.recent_notes(by="created")
+        return self.vault.get_all_notes()
+    
+    def note_label(self, entry) -> str:
+        """Notes list text for a (note_id, note) pair, with the size of long notes."""
+        note = self.vault.notes.get(entry[0], entry[1])
+        if note.size is not None and note.size >= SIZE_INDICATOR_BYTES:
+            return f"{note.title}  [{format_size(note.size)}]"
+        return note.title
+    
+    def show_notes(self, notes):
+        """Show a sequence of (note_id, note) pairs in the notes list."""
+        self.notes_view.set_items(notes)
+    
+    def refresh_tags(self):
+        """Refresh the tag sidebar from the vault's tag counts."""
+        if not self.vault.is_unlocked:
+            return
         
-        for note_id, note in self.notes_list:
-            self.notes_listbox.insert(tk.END, note.title)
+        self.tasks.submit("tags", lambda: (self.vault.tag_counts(), len(self.vault.notes)), self.show_tags,
+                          lambda e: self.status_var.set(f"Loading tags failed: {e}"), "Counting tags")
+    
+    def show_tags(self, outcome):
+        """Fill the tag sidebar with (tag counts, number of notes)."""
+        counts, total = outcome
+        self.tags_listbox.delete(0, tk.END)
+        self.tag_list = list(counts)
+        
+        self.tags_listbox.insert(tk.END, f"All notes ({total})")
+        for tag, count in counts.items():
+            self.tags_listbox.insert(tk.END, f"{tag} ({count})")
+    
+    def on_tag_select(self, event=None):
+        """Show the notes carrying the selected tag."""
+        selection = self.tags_listbox.curselection()
+        if not selection or not self.vault.is_unlocked:
+            return
+        
+        index = selection[0]
+        if index == 0:
+            self.show_all_notes()
+        elif index <= len(self.tag_list):
+            tag = self.tag_list[index - 1]
+            self.filter_notes(lambda: self.vault.notes_with_tag(tag),
+                              lambda count: f"{count} notes tagged '{tag}'")
+    
+    def on_tag_query(self, event=None):
+        """Show the notes matching the boolean tag query."""
+        if not self.vault.is_unlocked:
+            return
+        
+        query = self.tag_query_var.get().strip()
+        if not query:
+            self.show_all_notes()
+            return
+        
+        self.filter_notes(lambda: self.vault.search_tags(query),
+                          lambda count: f"{count} notes match {query}",
+                          lambda e: messagebox.showerror("Tag Query", str(e)))
     
     def on_search(self, event=None):
-        """Handle search functionality."""
+        """Schedule a search when the query changed; arrows, modifiers etc. do nothing."""
         if not self.vault.is_unlocked:
             return
         
         query = self.search_var.get().strip()
-        if query:
-            results = self.vault.search_notes(query)
-            self.notes_listbox.delete(0, tk.END)
-            self.notes_list = results
-            for note_id, note in results:
-                self.notes_listbox.insert(tk.END, note.title)
-        else:
+        if query == self.pending_query:
+            return
+        self.pending_query = query
+        self.search_generation += 1
+        self.search_debouncer.trigger()
+    
+    def start_search(self):
+        """Run the pending query on the worker once typing has paused."""
+        if not self.vault.is_unlocked:
+            return
+        
+        query = self.pending_query
+        generation = self.search_generation
+        if not query:
+            self.tasks.cancel("search")
             self.refresh_notes_list()
+            return
+        
+        def show(outcome):
+            if generation == self.search_generation:
+                self.show_search_results(outcome)
+        
+        # A list still loading would replace the results once it arrives.
+        self.tasks.cancel("list")
+        self.tasks.submit("search", lambda: self.run_search(query), show,
+                          self.on_search_error, "Searching")
+    
+    def run_search(self, query: str):
+        """Search on the worker thread: (results, close matches only, seconds)."""
+        results = self.search_session.search(query)
+        duration = self.search_session.last_duration
+        if not is_structured(query) and len(results) <= RANK_LIMIT:
+            ranked = self.vault.search_ranked(query, k=len(results),
+                                              within=[note_id for note_id, _ in results])
+            if len(ranked) == len(results):
+                results = [(note_id, note) for note_id, note, _ in ranked]
+        if not results and not is_structured(query):
+            return self.vault.search_notes(query, fuzzy=True), True, duration
+        return results, False, duration
+    
+    def show_search_results(self, outcome):
+        """Show the results of the newest search."""
+        results, close_matches, duration = outcome
+        self.show_notes(results)
+        if close_matches:
+            self.status_var.set(f"No exact matches; {len(results)} close matches")
+        else:
+            self.status_var.set(f"{len(results)} matches ({duration * 1000:.1f} ms)")
+    
+    def on_search_error(self, error: Exception):
+        """Report a failed search; usually a query still being typed."""
+        self.status_var.set(f"Query: {error}" if isinstance(error, ValueError) else f"Search failed: {error}")
     
     def clear_search(self):
         """Clear search and show all notes."""
         self.search_var.set("")
+        self.reset_search()
         self.refresh_notes_list()
     
-    def on_note_select(self, event=None):
-        """Handle note selection."""
-        selection = self.notes_listbox.curselection()
-        if selection and self.notes_list:
-            index = selection[0]
-            if index < len(self.notes_list):
-                note_id, note = self.notes_list[index]
-                self.load_note_to_editor(note_id, note)
-    
-    def load_note_to_editor(self, note_id: str, note: Note):
-        """Load a note into the editor."""
+    def reset_search(self):
+        """Drop pending and running searches."""
+        self.search_debouncer.cancel()
+        self.tasks.cancel("search")
+        self.pending_query = None
+        self.search_generation += 1
+    
+    def on_note_select(self, entry):
+        """Open the (note_id, note) picked in the notes list."""
+        note_id, _ = entry
+        self.load_note_to_editor(note_id)
+    
+    def load_note_to_editor(self, note_id: str):
+        """Open a note: it is read and decrypted on the worker, then shown."""
+        # The note being left keeps its edits.
+        self.autosaver.flush()
         self.current_note_id = note_id
-        self.title_var.set(note.title)
-        self.tags_var.set(", ".join(note.tags))
+        self.edit_target = EditTarget(note_id)
+        self.load_generation += 1
+        generation = self.load_generation
+        self.editor_content = None
+        self.content_dirty = False
+        self.previewing = False
+        self.loading_editor = True
+        try:
+            self.title_var.set("")
+            self.tags_var.set("")
+            self.content_text.config(state=tk.NORMAL)
+            self.content_text.delete(1.0, tk.END)
+            self.content_text.edit_modified(False)
+        finally:
+            self.loading_editor = False
+        self.preview_frame.pack_forget()
+        # Nothing can be edited until the note is there to save alongside it.
+        self.set_editor_state(tk.DISABLED)
+        preview_bytes = self.preview_bytes
+        
+        def read():
+            # Looked up here so saves queued before this task are seen.
+            note = self.vault.notes.get(note_id)
+            if note is None:
+                raise LookupError("The note no longer exists")
+            content = note.content or ""
+            encoded = content.encode("utf-8")
+            preview = None
+            if len(encoded) > LARGE_NOTE_BYTES:
+                preview = encoded[:preview_bytes].decode("utf-8", "ignore")
+            return note.title, list(note.tags), content, len(encoded), preview
+        
+        def show(outcome):
+            if generation == self.load_generation:
+                self.show_note_content(*outcome)
+        
+        def failed(error: Exception):
+            if generation == self.load_generation:
+                self.clear_editor()
+                messagebox.showerror("Error", f"Failed to open note: {error}")
         
+        self.tasks.submit("open", read, show, failed, "Opening note")
+        self.refresh_related()
+    
+    def set_editor_state(self, state: str):
+        """Enable or disable the title, tags and content fields."""
+        for control in (self.title_entry, self.tags_entry, self.content_text):
+            control.config(state=state)
+    
+    def show_note_content(self, title: str, tags: List[str], content: str, size: int,
+                          preview: Optional[str]):
+        """Fill the editor with an opened note, or a read-only preview of a large body."""
+        self.editor_content = content
+        self.set_editor_state(tk.NORMAL)
+        self.loading_editor = True
+        try:
+            self.title_var.set(title)
+            self.tags_var.set(", ".join(tags))
+            if preview is not None:
+                # Inserting megabytes at once freezes Tk; show the start read-only.
+                self.content_text.insert(1.0, preview)
+                self.content_text.config(state=tk.DISABLED)
+                self.previewing = True
+                self.show_preview_banner(f"Preview: first {format_size(len(preview.encode('utf-8')))} of "
+                                         f"{format_size(size)} (read-only)")
+            else:
+                self.content_text.insert(1.0, content)
+            self.content_text.edit_modified(False)
+        finally:
+            self.loading_editor = False
+    
+    def show_preview_banner(self, text: str, can_load: bool = True):
+        """Show the large-note banner above the content."""
+        self.preview_var.set(text)
+        self.load_full_btn.config(state=tk.NORMAL if can_load else tk.DISABLED)
+        if not self.preview_frame.winfo_ismapped():
+            self.preview_frame.pack(fill=tk.X, pady=(0, 5), before=self.content_text)
+    
+    def load_full_note(self):
+        """Stream the whole of a previewed note into the editor, a chunk per callback."""
+        generation = self.load_generation
+        content = self.editor_content
+        size = format_size(len(content.encode("utf-8")))
+        self.content_text.config(state=tk.NORMAL)
         self.content_text.delete(1.0, tk.END)
-        self.content_text.insert(1.0, note.content)
+        self.content_text.config(state=tk.DISABLED)
+        
+        def load_chunk(position: int):
+            if generation != self.load_generation:
+                return
+            self.loading_editor = True
+            try:
+                self.content_text.config(state=tk.NORMAL)
+                self.content_text.insert("end-1c", content[position:position + LOAD_CHUNK_CHARS])
+                self.content_text.edit_modified(False)
+            finally:
+                self.loading_editor = False
+            position += LOAD_CHUNK_CHARS
+            if position < len(content):
+                self.content_text.config(state=tk.DISABLED)
+                self.show_preview_banner(f"Loading {size}: "
+                                         f"{position * 100 // len(content)}%", can_load=False)
+                self.root.after(1, load_chunk, position)
+            else:
+                self.previewing = False
+                self.preview_frame.pack_forget()
+                self.status_var.set(f"Loaded {size}")
+        
+        load_chunk(0)
+    
+    def refresh_related(self):
+        """Fill the related notes list for the note in the editor."""
+        self.related_listbox.delete(0, tk.END)
+        self.related_list = []
+        if not self.current_note_id or not self.vault.is_unlocked:
+            self.tasks.cancel("related")
+            return
+        
+        note_id = self.current_note_id
+        
+        def show(related):
+            if self.current_note_id != note_id:
+                return
+            self.related_list = [related_id for related_id, _, _ in related]
+            for _, note, similarity in related:
+                self.related_listbox.insert(tk.END, f"{note.title}  ({similarity:.2f})")
+        
+        self.tasks.submit("related", lambda: self.vault.related_notes(note_id, k=8), show,
+                          lambda e: self.status_var.set(f"Related notes failed: {e}"), "Finding related notes")
+    
+    def on_related_select(self, event=None):
+        """Open the selected related note."""
+        selection = self.related_listbox.curselection()
+        if selection and selection[0] < len(self.related_list):
+            self.load_note_to_editor(self.related_list[selection[0]])
+    
+    def show_duplicates(self):
+        """Report pairs of near-duplicate notes."""
+        if not self.vault.is_unlocked:
+            return
+        
+        def find():
+            # Building the index for a large vault takes a while; keep it off the mainloop.
+            duplicates = self.vault.find_duplicates()
+            lines = [
+                f"{similarity:.0%}  {self.vault.notes[note_id].title}  ~  {self.vault.notes[other_id].title}"
+                for note_id, other_id, similarity in duplicates[:20]
+            ]
+            if len(duplicates) > 20:
+                lines.append(f"... and {len(duplicates) - 20} more")
+            return len(duplicates), lines
+        
+        def show(outcome):
+            count, lines = outcome
+            if not count:
+                messagebox.showinfo("Duplicate Notes", "No near-duplicate notes found.")
+            else:
+                messagebox.showinfo("Duplicate Notes", f"{count} near-duplicate pair(s):\n\n" + "\n".join(lines))
+        
+        self.tasks.submit("duplicates", find, show, self.on_task_error, "Finding duplicate notes")
     
     def clear_editor(self):
         """Clear the note editor."""
+        self.autosaver.flush()
         self.current_note_id = None
-        self.title_var.set("")
-        self.tags_var.set("")
-        self.content_text.delete(1.0, tk.END)
+        self.edit_target = EditTarget()
+        self.load_generation += 1
+        self.editor_content = ""
+        self.content_dirty = False
+        self.previewing = False
+        self.loading_editor = True
+        try:
+            self.title_var.set("")
+            self.tags_var.set("")
+            self.content_text.config(state=tk.NORMAL)
+            self.content_text.delete(1.0, tk.END)
+            self.content_text.edit_modified(False)
+        finally:
+            self.loading_editor = False
+        self.tasks.cancel("open")
+        self.set_editor_state(tk.NORMAL if self.vault.is_unlocked else tk.DISABLED)
+        self.preview_frame.pack_forget()
+        self.related_listbox.delete(0, tk.END)
+        self.related_list = []
     
     def new_note(self):
         """Create a new note."""
@@ -306,33 +830,65 @@ class NotesManagerGUI:
         self.title_entry.focus()
     
     def save_note(self):
-        """Save the current note."""
+        """Save the current note now."""
         if not self.vault.is_unlocked:
             return
         
-        title = self.title_var.get().strip()
-        content = self.content_text.get(1.0, tk.END).strip()
-        tags_str = self.tags_var.get().strip()
-        
-        if not title:
+        if not self.title_var.get().strip():
             messagebox.showwarning("Missing Title", "Please enter a title for the note.")
             return
         
-        tags = [tag.strip() for tag in tags_str.split(",") if tag.strip()]
+        self.autosaver.flush(force=True)
+    
+    def autosave_note(self) -> bool:
+        """Write the editor's note on the worker; False if there is nothing to save."""
+        if not self.vault.is_unlocked:
+            return False
+        
+        title = self.title_var.get().strip()
+        if not title or self.editor_content is None:
+            return False
+        # Reading back a multi-megabyte Text is slow; only do it after the text was edited.
+        content = self.content_text.get(1.0, tk.END).strip() if self.content_dirty else self.editor_content
+        tags = [tag.strip() for tag in self.tags_var.get().split(",") if tag.strip()]
         note = Note(title, content, tags)
+        target = self.edit_target
         
-        try:
-            if self.current_note_id:
-                self.vault.update_note(self.current_note_id, note)
-                messagebox.showinfo("Saved", "Note updated successfully!")
+        def write():
+            if target.note_id:
+                self.vault.update_note(target.note_id, note)
             else:
-                note_id = self.vault.add_note(note)
-                self.current_note_id = note_id
-                messagebox.showinfo("Saved", "Note created successfully!")
+                target.note_id = self.vault.add_note(note)
             
+        # A newer save of the same note replaces one still waiting for the worker.
+        self.tasks.submit(f"save:{target.serial}", write,
+                          lambda _: self.on_saved(target),
+                          lambda e: self.on_save_error(target, e),
+                          "Saving")
+        return True
+        
+    def on_saved(self, target: EditTarget):
+        """Show a finished save in the notes list and status bar."""
+        if not self.vault.is_unlocked:
+            return
+        # Decided here rather than by the save: the one that added the note
+        # may have been superseded and its result dropped.
+        if target.note_id != target.listed_id:
+            target.listed_id = target.note_id
+            if self.edit_target is target:
+                self.current_note_id = target.note_id
             self.refresh_notes_list()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save note: {e}")
+        else:
+            self.notes_view.render()
+        self.index_debouncer.trigger()
+        stats = self.autosaver.stats()
+        self.status_var.set(f"Saved - {stats['saves']} writes for {stats['edits']} edits")
+    
+    def on_save_error(self, target: EditTarget, error: Exception):
+        """Report a failed save; an earlier save of the note may still have added it."""
+        messagebox.showerror("Error", f"Failed to save note: {error}")
+        if self.vault.is_unlocked and target.note_id != target.listed_id:
+            self.on_saved(target)
     
     def delete_note(self):
         """Delete the current note."""
@@ -341,22 +897,54 @@ class NotesManagerGUI:
             return
         
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this note?"):
-            try:
-                self.vault.delete_note(self.current_note_id)
-                self.clear_editor()
+            note_id = self.current_note_id
+            self.autosaver.discard()
+            self.clear_editor()
+            
+            def deleted(_):
+                self.index_debouncer.trigger()
                 self.refresh_notes_list()
                 messagebox.showinfo("Deleted", "Note deleted successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete note: {e}")
+            
+            self.tasks.submit(f"delete:{note_id}", lambda: self.vault.delete_note(note_id), deleted,
+                              lambda e: messagebox.showerror("Error", f"Failed to delete note: {e}"),
+                              "Deleting note")
     
-    def on_title_change(self, event=None):
-        pass
+    def save_search_index(self):
+        """Write the changed search index on the worker, off the save path."""
+        if not self.vault.is_unlocked:
+            return
+        self.tasks.submit("index", self.vault.save_search_index, lambda _: None,
+                          lambda e: self.status_var.set(f"Saving search index failed: {e}"),
+                          "Saving search index")
     
-    def on_tags_change(self, event=None):
-        pass
+    def on_title_change(self, *args):
+        self.on_editor_change()
+    
+    def on_tags_change(self, *args):
+        self.on_editor_change()
     
     def on_content_change(self, event=None):
-        pass
+        # <<Modified>> also fires when the flag is cleared; only react to edits.
+        if not self.content_text.edit_modified():
+            return
+        self.content_text.edit_modified(False)
+        if not self.loading_editor and self.vault.is_unlocked:
+            self.content_dirty = True
+        self.on_editor_change()
+    
+    def on_editor_change(self):
+        """Mark the note in the editor as changed, for the autosaver."""
+        if self.loading_editor or not self.vault.is_unlocked:
+            return
+        if not self.autosaver.dirty:
+            self.status_var.set("Unsaved changes")
+        self.autosaver.changed()
+    
+    def exit_app(self):
+        """Save pending edits and quit."""
+        self.autosaver.flush()
+        self.root.quit()
     
     def show_about(self):
         """Show about dialog."""
@@ -377,7 +965,13 @@ Built with Python, Tkinter, and cryptography library."""
     
     def run(self):
         """Start the application."""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            # Let a save still in flight reach the disk, then write the search index.
+            self.tasks.shutdown()
+            if self.vault.is_unlocked:
+                self.vault.lock_vault()
 
 
 if __name__ == "__main__":
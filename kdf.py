@@ -0,0 +1,118 @@
+"""
+Password-based key derivation for the notes vault.
+
+Each key slot in the vault header names its KDF and carries that KDF's
+parameters next to its salt, so parameters can be retuned by rewriting one
+slot. Parameters for new slots are calibrated to a target unlock time on
+the current machine, never going below the fixed defaults used before.
+"""
+
+import math
+import time
+from typing import Dict, Tuple
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+KEY_LENGTH = 32
+DEFAULT_KDF = "pbkdf2-sha256"
+DEFAULT_TARGET_SECONDS = 0.25
+
+
+class PBKDF2KDF:
+    """PBKDF2-HMAC-SHA256, tuned through its iteration count."""
+    
+    name = "pbkdf2-sha256"
+    MIN_ITERATIONS = 100000
+    PROBE_ITERATIONS = 20000
+    
+    def default_params(self) -> Dict:
+        """Parameters used when no calibration is requested."""
+        return {'iterations': self.MIN_ITERATIONS}
+    
+    def params_of(self, slot: Dict) -> Dict:
+        """Pick this KDF's parameters out of a key slot."""
+        return {'iterations': slot['iterations']}
+    
+    def derive(self, password: str, salt: bytes, params: Dict) -> bytes:
+        """Derive a raw 256-bit key."""
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=KEY_LENGTH,
+            salt=salt,
+            iterations=params['iterations'],
+        )
+        return kdf.derive(password.encode())
+    
+    def calibrate(self, target_seconds: float) -> Dict:
+        """Pick an iteration count taking about target_seconds here."""
+        probe = {'iterations': self.PROBE_ITERATIONS}
+        elapsed = time_derivation(self, probe)
+        iterations = int(self.PROBE_ITERATIONS * target_seconds / elapsed)
+        # Round to a readable number; the timing is not that precise anyway.
+        iterations = iterations // 1000 * 1000
+        return {'iterations': max(self.MIN_ITERATIONS, iterations)}
+
+
+class ScryptKDF:
+    """scrypt, tuned through its memory/CPU cost n (r=8, p=1)."""
+    
+    name = "scrypt"
+    MIN_N = 2 ** 14
+    # Keeps unlock from needing more than 256 MB of memory.
+    MAX_N = 2 ** 18
+    R = 8
+    P = 1
+    
+    def default_params(self) -> Dict:
+        """Parameters used when no calibration is requested."""
+        return {'n': self.MIN_N, 'r': self.R, 'p': self.P}
+    
+    def params_of(self, slot: Dict) -> Dict:
+        """Pick this KDF's parameters out of a key slot."""
+        return {'n': slot['n'], 'r': slot['r'], 'p': slot['p']}
+    
+    def derive(self, password: str, salt: bytes, params: Dict) -> bytes:
+        """Derive a raw 256-bit key."""
+        kdf = Scrypt(salt=salt, length=KEY_LENGTH, n=params['n'], r=params['r'], p=params['p'])
+        return kdf.derive(password.encode())
+    
+    def calibrate(self, target_seconds: float) -> Dict:
+        """Pick the largest power-of-two n taking at most about target_seconds here."""
+        elapsed = time_derivation(self, self.default_params())
+        # Cost grows linearly with n.
+        doublings = max(0, int(math.log2(max(1.0, target_seconds / elapsed))))
+        n = min(self.MAX_N, self.MIN_N << doublings)
+        return {'n': n, 'r': self.R, 'p': self.P}
+
+
+KDFS = {kdf.name: kdf for kdf in (PBKDF2KDF(), ScryptKDF())}
+
+# (kdf name, target seconds) -> calibrated parameters, measured once per process
+_calibrated: Dict[Tuple[str, float], Dict] = {}
+
+
+def get_kdf(name: str):
+    """Look up a KDF by the name stored in key slots."""
+    if name not in KDFS:
+        raise ValueError(f"Unknown KDF: {name}")
+    return KDFS[name]
+
+
+def time_derivation(kdf, params: Dict, rounds: int = 3) -> float:
+    """Fastest of a few derivations with the given parameters, in seconds."""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        kdf.derive("calibration", b"\0" * 16, params)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return max(best, 1e-6)
+
+
+def calibrate(name: str = DEFAULT_KDF, target_seconds: float = DEFAULT_TARGET_SECONDS) -> Dict:
+    """Parameters for a KDF that take about target_seconds on this machine."""
+    key = (name, target_seconds)
+    if key not in _calibrated:
+        _calibrated[key] = get_kdf(name).calibrate(target_seconds)
+    return dict(_calibrated[key])
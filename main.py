@@ -11,6 +11,8 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from gui import NotesManagerGUI
 from cli import NotesManagerCLI
+from notes_manager import NotesVault
+from agent import AgentClient
 
 
 def main():
@@ -19,22 +21,25 @@ def main():
                        help='Run in command line interface mode')
     parser.add_argument('--gui', action='store_true', 
                        help='Run in graphical user interface mode (default)')
+    parser.add_argument('--agent', action='store_true',
+                       help='Reuse vault keys cached by the unlock agent (start it with: python agent.py start)')
     
     args = parser.parse_args()
+    vault = NotesVault(agent=AgentClient()) if args.agent else None
     
     if args.cli:
         print("Starting Encrypted Notes Manager - CLI Mode")
-        app = NotesManagerCLI()
+        app = NotesManagerCLI(vault)
         app.run()
     else:
         print("Starting Encrypted Notes Manager - GUI Mode")
         try:
-            app = NotesManagerGUI()
+            app = NotesManagerGUI(vault)
             app.run()
         except ImportError as e:
             print(f"GUI mode failed: {e}")
             print("Falling back to CLI mode...")
-            app = NotesManagerCLI()
+            app = NotesManagerCLI(vault)
             app.run()
 
 
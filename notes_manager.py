@@ -1,98 +1,202 @@
 import os
+import sys
 import json
 import base64
 import hashlib
-from typing import Dict, List, Optional, Tuple
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-
-
-class EncryptionManager:
-    """Handles encryption and decryption of notes using AES via Fernet."""
-    
-    def __init__(self):
-        self.salt = None
-        self.key = None
-        self.fernet = None
-    
-    def derive_key(self, password: str, salt: bytes = None) -> bytes:
-        """Derive encryption key from password using PBKDF2."""
-        if salt is None:
-            salt = os.urandom(16)
-        self.salt = salt
-        
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
-        return key
-    
-    def set_password(self, password: str, salt: bytes = None):
-        """Set the master password and initialize encryption."""
-        self.key = self.derive_key(password, salt)
-        self.fernet = Fernet(self.key)
-    
-    def encrypt_data(self, data: str) -> bytes:
-        """Encrypt string data."""
-        if not self.fernet:
-            raise ValueError("Encryption not initialized. Set password first.")
-        return self.fernet.encrypt(data.encode())
-    
-    def decrypt_data(self, encrypted_data: bytes) -> str:
-        """Decrypt data back to string."""
-        if not self.fernet:
-            raise ValueError("Encryption not initialized. Set password first.")
-        return self.fernet.decrypt(encrypted_data).decode()
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from encryption import EncryptionManager
+from kdf import DEFAULT_KDF, DEFAULT_TARGET_SECONDS, get_kdf
+from storage import RecordLog, LOG_MAGIC, read_header
+from sharded_storage import ShardedStore, SHARD_MAGIC
+from parallel_unlock import ParallelDecryptor
+from cache import LRUCache
+from search_index import SearchIndex
+from tag_index import TagIndex
+from query import QueryPlan, parse_tag_query, run_query
+from search_session import SearchSession
+from related import RelatedIndex, DUPLICATE_THRESHOLD
+from time_index import TimeIndex, TIME_FIELDS, iso_to_us, now_us, us_to_iso
 
 
 class Note:
-    """Represents a single note with metadata."""
+    """Represents a single note with metadata.
+    
+    Notes loaded from a vault start without their content; it is decrypted
+    on first access through the loader bound with ``bind_body``.
+    
+    Timestamps are kept as epoch microseconds (``created_us``,
+    ``modified_us``); ``created_at`` and ``modified_at`` read and write them
+    as ISO-8601 strings.
+    
+    Notes use ``__slots__`` and keep their tags as a tuple of interned
+    strings, so a large vault holds one copy of each tag and no per-note
+    attribute dictionaries. Assign a new sequence to ``tags`` to change them.
+    """
     
-    def __init__(self, title: str, content: str, tags: List[str] = None):
+    __slots__ = ('title', 'body_ref', '_body_loader', '_content', '_tags',
+                 'created_us', 'modified_us', 'size')
+    
+    def __init__(self, title: str, content: Optional[str], tags: Iterable[str] = None):
         self.title = title
+        self.body_ref: Optional[int] = None
+        self._body_loader: Optional[Callable[[int], str]] = None
+        # UTF-8 size of the content in bytes, known without decrypting it
+        self.size: Optional[int] = None
         self.content = content
-        self.tags = tags or []
-        self.created_at = None
-        self.modified_at = None
+        self.tags = tags or ()
+        self.created_us: Optional[int] = None
+        self.modified_us: Optional[int] = None
+    
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        """The note's tags, in the order given."""
+        return self._tags
+    
+    @tags.setter
+    def tags(self, value: Iterable[str]):
+        self._tags = tuple(sys.intern(tag) for tag in value)
+    
+    @property
+    def created_at(self) -> Optional[str]:
+        """Creation time as an ISO-8601 string."""
+        return us_to_iso(self.created_us)
+    
+    @created_at.setter
+    def created_at(self, value: Optional[str]):
+        self.created_us = iso_to_us(value)
+    
+    @property
+    def modified_at(self) -> Optional[str]:
+        """Last modification time as an ISO-8601 string."""
+        return us_to_iso(self.modified_us)
+    
+    @modified_at.setter
+    def modified_at(self, value: Optional[str]):
+        self.modified_us = iso_to_us(value)
+    
+    @property
+    def content(self) -> str:
+        """Note text, decrypted from the vault on demand."""
+        if self._content is None and self._body_loader is not None:
+            return self._body_loader(self.body_ref)
+        return self._content
+    
+    @content.setter
+    def content(self, value: Optional[str]):
+        self._content = value
+        if value is not None:
+            self.size = len(value.encode('utf-8'))
+    
+    @property
+    def has_pending_content(self) -> bool:
+        """Whether the content was set in memory and not yet stored."""
+        return self._content is not None or self._body_loader is None
+    
+    def bind_body(self, body_ref: int, loader: Callable[[int], str]):
+        """Drop in-memory content in favour of the stored body."""
+        self.body_ref = body_ref
+        self._body_loader = loader
+        self._content = None
+    
+    def metadata(self) -> Dict:
+        """Convert note metadata (everything but content) to a dictionary."""
+        return {
+            'title': self.title,
+            'tags': list(self.tags),
+            'created_us': self.created_us,
+            'modified_us': self.modified_us,
+            'size': self.size
+        }
     
     def to_dict(self) -> Dict:
-        """Convert note to dictionary for serialization."""
+        """Convert note to dictionary for serialization.
+        
+        Times are given both as ISO-8601 strings, as they always were, and
+        as the epoch microseconds they are stored as.
+        """
         return {
             'title': self.title,
             'content': self.content,
-            'tags': self.tags,
+            'tags': list(self.tags),
             'created_at': self.created_at,
-            'modified_at': self.modified_at
+            'modified_at': self.modified_at,
+            'created_us': self.created_us,
+            'modified_us': self.modified_us
         }
     
     @classmethod
     def from_dict(cls, data: Dict) -> 'Note':
         """Create note from dictionary."""
-        note = cls(data['title'], data['content'], data.get('tags', []))
-        note.created_at = data.get('created_at')
-        note.modified_at = data.get('modified_at')
+        note = cls(data['title'], data.get('content'), data.get('tags', []))
+        if note.size is None:
+            # Metadata records carry the size of the body stored beside them
+            note.size = data.get('size')
+        if 'modified_us' in data:
+            note.created_us = data.get('created_us')
+            note.modified_us = data.get('modified_us')
+        else:
+            # Notes saved before timestamps were stored as integers
+            note.created_at = data.get('created_at')
+            note.modified_at = data.get('modified_at')
         return note
 
 
 class NotesVault:
     """Manages the encrypted notes vault."""
     
-    def __init__(self, vault_path: str = "notes_vault.enc"):
+    def __init__(self, vault_path: str = "notes_vault.enc",
+                 body_cache_size: int = 16 * 1024 * 1024,
+                 storage: str = "log", shard_count: int = 16,
+                 unlock_workers: Optional[int] = None, unlock_executor: str = "process",
+                 parallel_unlock_bytes: int = 8 * 1024 * 1024,
+                 kdf: str = DEFAULT_KDF,
+                 kdf_target_seconds: Optional[float] = DEFAULT_TARGET_SECONDS,
+                 agent=None):
         self.vault_path = vault_path
+        # Format v1 vaults kept their salt here; v2 stores it in the file header
         self.salt_path = vault_path + ".salt"
         self.encryption_manager = EncryptionManager()
+        # New key slots use this KDF, calibrated to take kdf_target_seconds to unlock
+        self.encryption_manager.kdf = get_kdf(kdf).name
+        self.encryption_manager.kdf_target_seconds = kdf_target_seconds
+        # Optional agent.AgentClient caching the data key across processes
+        self.agent = agent
+        # Encrypted full-text index saved next to the vault
+        self.index_path = vault_path + ".idx"
+        self.search_index = SearchIndex()
+        # Notes whose index entry must be rebuilt before the next search
+        self._stale_index: Set[str] = set()
+        self._index_dirty = False
+        # Changed indexes are written after a commit at most this often (seconds)
+        # and always on lock, so a crash loses at most this much indexing work.
+        # TF-IDF vectors and MinHash buckets, built by the first related/duplicate lookup
+        self.related_index: Optional[RelatedIndex] = None
+        # Tag -> note ids, rebuilt from note metadata on unlock
+        self.tag_index = TagIndex()
+        # Notes sorted by created/modified time, rebuilt on unlock
+        self.time_index = TimeIndex()
+        # Storage mode for new vaults: "log" (append-only) or "sharded"
+        self.storage = storage
+        self.shard_count = shard_count
+        # Vaults with less ciphertext than parallel_unlock_bytes unlock on one thread
+        self.decryptor = ParallelDecryptor(unlock_workers, unlock_executor,
+                                           parallel_unlock_bytes)
+        self.store = self._make_store(storage)
         self.notes: Dict[str, Note] = {}
         self.is_unlocked = False
-    
-    def _save_salt(self):
-        """Save salt to file."""
-        if self.encryption_manager.salt:
-            with open(self.salt_path, 'wb') as f:
-                f.write(self.encryption_manager.salt)
+        # Bumped by every change to the notes, so cached search results can tell they are stale
+        self.generation = 0
+        # Decrypted note bodies, bounded by total characters
+        self.body_cache = LRUCache(body_cache_size)
+        # note_id -> pending ("put", note) / ("delete", None) while in a transaction
+        self._pending: Optional[Dict[str, Tuple[str, Optional[Note]]]] = None
+        self._transaction_depth = 0
+        # Compact in the background once this share of the file is dead
+        self.compaction_threshold = 0.5
+        self.compaction_min_bytes = 1024 * 1024
+        self._compaction_thread: Optional[threading.Thread] = None
     
     def _load_salt(self) -> Optional[bytes]:
         """Load salt from file."""
@@ -104,66 +208,393 @@ class NotesVault:
     def create_vault(self, master_password: str) -> bool:
         """Create a new vault with master password."""
         try:
-            self.encryption_manager.set_password(master_password)
-            self._save_salt()
+            self.encryption_manager.create_key(master_password)
+            self.store = self._make_store(self.storage)
             self.notes = {}
+            self.search_index = SearchIndex()
+            self._stale_index = set()
+            self._index_dirty = True
+            self.related_index = None
+            self.tag_index = TagIndex()
+            self.time_index = TimeIndex()
+            self.generation += 1
             self.is_unlocked = True
             self.save_vault()
+            if self.agent:
+                self.agent.put_key(self.vault_path, self.encryption_manager.key)
             return True
         except Exception as e:
             print(f"Error creating vault: {e}")
             return False
     
-    def unlock_vault(self, master_password: str) -> bool:
-        """Unlock existing vault with master password."""
+    def unlock_vault(self, master_password: Optional[str]) -> bool:
+        """Unlock existing vault with master password.
+        
+        With no password the data key is fetched from the unlock agent, if
+        one is configured and still holds it.
+        """
+        from_agent = master_password is None
         try:
             if not os.path.exists(self.vault_path):
                 return False
             
-            salt = self._load_salt()
-            if salt is None:
-                return False
+            header = read_header(self.vault_path)
+            params = header[2] if header else {}
+            # Vaults from before key slots were encrypted with the password key itself
+            legacy = 'keyslots' not in params
+            if from_agent:
+                key = self.agent.get_key(self.vault_path) if self.agent and not legacy else None
+                if key is None:
+                    return False
+                self.encryption_manager.set_key(key)
+                self.encryption_manager.keyslots = params['keyslots']
+            elif not legacy:
+                self.encryption_manager.unlock(master_password, params['keyslots'])
+            else:
+                if params:
+                    salt = base64.b64decode(params['salt'])
+                    iterations = params.get('iterations')
+                else:
+                    salt = self._load_salt()
+                    iterations = None
+                    if salt is None:
+                        return False
+                self.encryption_manager.set_password(master_password, salt, iterations)
             
-            self.encryption_manager.set_password(master_password, salt)
             self.load_vault()
+            if legacy:
+                self._upgrade_format(master_password)
             self.is_unlocked = True
+            if self.agent and not from_agent:
+                self.agent.put_key(self.vault_path, self.encryption_manager.key)
             return True
         except Exception as e:
+            if from_agent and self.agent:
+                # The vault was replaced since the key was cached.
+                self.agent.forget(self.vault_path)
             print(f"Error unlocking vault: {e}")
             return False
     
     def save_vault(self):
-        """Save encrypted vault to file."""
+        """Rewrite the whole vault as a compacted record log."""
         if not self.is_unlocked:
             raise ValueError("Vault is locked")
         
-        notes_data = {
-            note_id: note.to_dict() 
+        self._rewrite(self._note_records())
+    
+    def _note_records(self) -> List[Tuple[str, Dict, str]]:
+        """Every note as an (id, metadata, content) tuple, decrypting bodies."""
+        return [
+            (note_id, note.metadata(), note.content)
             for note_id, note in self.notes.items()
-        }
-        
-        json_data = json.dumps(notes_data)
-        encrypted_data = self.encryption_manager.encrypt_data(json_data)
-        
-        with open(self.vault_path, 'wb') as f:
-            f.write(encrypted_data)
+        ]
+    
+    def _rewrite(self, notes: List[Tuple[str, Dict, str]]):
+        """Write the given notes to a fresh vault file."""
+        body_refs = self.store.rewrite(notes)
+        self.body_cache.clear()
+        for note_id, body_ref in body_refs.items():
+            self.notes[note_id].bind_body(body_ref, self._load_body)
     
     def load_vault(self):
-        """Load and decrypt vault from file."""
+        """Load the vault's metadata index; note bodies stay encrypted."""
         if not os.path.exists(self.vault_path):
             self.notes = {}
             return
         
+        header = read_header(self.vault_path)
+        magic = header[0] if header else None
+        if magic == LOG_MAGIC:
+            self.store = self._make_store("log")
+            notes_data = self.store.load()
+        elif magic == SHARD_MAGIC:
+            self.store = self._make_store("sharded")
+            notes_data = self.store.load()
+        else:
+            # Single-blob vault; unlock_vault rewrites it in the current format
+            self.store = self._make_store(self.storage)
+            notes_data = self._read_legacy_vault()
+        self.body_cache.clear()
+        
+        self.notes = {}
+        for note_id, note_data in notes_data.items():
+            note = Note.from_dict(note_data)
+            if note_data.get('body_ref') is not None:
+                note.bind_body(note_data['body_ref'], self._load_body)
+            self.notes[note_id] = note
+        self.tag_index.rebuild(self.notes)
+        self.time_index.rebuild(self.notes)
+        self.generation += 1
+        self.related_index = None
+        self._load_search_index()
+        self._maybe_schedule_compaction()
+    
+    def _upgrade_format(self, master_password: str):
+        """Re-encrypt a vault keyed straight from the password under a new data key."""
+        # Bodies must be decrypted with the old key before it is replaced.
+        notes = self._note_records()
+        self.encryption_manager.create_key(master_password)
+        self._rewrite(notes)
+        self._remove_salt_file()
+    
+    def _remove_salt_file(self):
+        """Delete the format v1 salt file once the header holds the salt."""
+        if os.path.exists(self.salt_path):
+            os.remove(self.salt_path)
+    
+    def _make_store(self, storage: str):
+        """Create the storage backend for the given mode."""
+        if storage == "sharded":
+            return ShardedStore(self.vault_path, self.encryption_manager,
+                                self.shard_count, self.decryptor)
+        if storage == "log":
+            return RecordLog(self.vault_path, self.encryption_manager, self.decryptor)
+        raise ValueError(f"Unknown storage mode: {storage}")
+    
+    def rebalance_shards(self, shard_count: int):
+        """Redistribute a sharded vault over a new number of shards."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        if not isinstance(self.store, ShardedStore):
+            raise ValueError("Vault is not using sharded storage")
+        
+        self.store.rebalance(shard_count)
+        self.shard_count = shard_count
+    
+    def _read_legacy_vault(self) -> Dict[str, Dict]:
+        """Decrypt a single-blob vault file from before the record log."""
         with open(self.vault_path, 'rb') as f:
             encrypted_data = f.read()
         
-        decrypted_data = self.encryption_manager.decrypt_data(encrypted_data)
-        notes_data = json.loads(decrypted_data)
+        return json.loads(self.encryption_manager.decrypt_legacy(encrypted_data))
+    
+    def change_master_password(self, current_password: str, new_password: str) -> bool:
+        """Change the master password.
+        
+        Only the wrapped data key in the vault header is rewritten, so this
+        takes the same time whatever the size of the vault.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        try:
+            if not self.encryption_manager.verify(current_password):
+                return False
+            previous = list(self.encryption_manager.keyslots)
+            self.encryption_manager.add_keyslot("password", new_password)
+            self._write_keyslots(previous)
+            return True
+        except Exception as e:
+            print(f"Error changing master password: {e}")
+            return False
+    
+    def retune_kdf(self, master_password: str, kdf: Optional[str] = None,
+                   kdf_target_seconds: Optional[float] = None) -> bool:
+        """Re-derive the master password's key slot with a different KDF or unlock time.
+        
+        Like a password change, only the vault header is rewritten.
+        """
+        manager = self.encryption_manager
+        previous = (manager.kdf, manager.kdf_target_seconds)
+        manager.kdf = get_kdf(kdf).name if kdf else manager.kdf
+        manager.kdf_target_seconds = kdf_target_seconds or manager.kdf_target_seconds
+        if self.change_master_password(master_password, master_password):
+            return True
+        manager.kdf, manager.kdf_target_seconds = previous
+        return False
+    
+    def kdf_info(self) -> List[Dict]:
+        """KDF name and parameters of every key slot (no key material)."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        return [
+            {key: value for key, value in slot.items() if key not in ('salt', 'wrapped')}
+            for slot in self.encryption_manager.keyslots
+        ]
+    
+    def add_recovery_key(self) -> Optional[str]:
+        """Create a recovery key that unlocks the vault like the master password.
+        
+        Any previous recovery key stops working. The key is only shown once.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
         
-        self.notes = {
-            note_id: Note.from_dict(note_data)
-            for note_id, note_data in notes_data.items()
+        try:
+            encoded = base64.b32encode(os.urandom(20)).decode()
+            recovery_key = "-".join(encoded[i:i + 4] for i in range(0, len(encoded), 4))
+            previous = list(self.encryption_manager.keyslots)
+            self.encryption_manager.add_keyslot("recovery", recovery_key)
+            self._write_keyslots(previous)
+            return recovery_key
+        except Exception as e:
+            print(f"Error creating recovery key: {e}")
+            return None
+    
+    def remove_recovery_key(self) -> bool:
+        """Revoke the recovery key."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        try:
+            previous = list(self.encryption_manager.keyslots)
+            self.encryption_manager.remove_keyslot("recovery")
+            self._write_keyslots(previous)
+            return True
+        except Exception as e:
+            print(f"Error removing recovery key: {e}")
+            return False
+    
+    def _write_keyslots(self, previous: List[Dict]):
+        """Write changed key slots to the header, restoring them on failure."""
+        try:
+            self.store.write_key_params(self.encryption_manager.header_params())
+        except Exception:
+            self.encryption_manager.keyslots = previous
+            raise
+    
+    def _load_search_index(self):
+        """Load the saved search index and find entries that are out of date."""
+        try:
+            index = SearchIndex.load(self.index_path, self.encryption_manager)
+        except Exception as e:
+            print(f"Error loading search index, rebuilding it: {e}")
+            index = SearchIndex()
+        index.reorder(self.notes)
+        self.search_index = index
+        self._stale_index = {
+            note_id for note_id, note in self.notes.items()
+            if not index.is_current(note_id, note.modified_us)
         }
+        self._index_dirty = bool(self._stale_index)
+    
+    def _index_note(self, note_id: str, note: Note):
+        """Bring a note's search index entry up to date."""
+        self.search_index.index_note(note_id, note.title, note.tags, note.content or "",
+                                     note.modified_us)
+        if self.related_index is not None:
+            self.related_index.set_note(note_id, self.search_index.term_frequencies(note_id))
+        self._stale_index.discard(note_id)
+        self._index_dirty = True
+    
+    def _unindex_note(self, note_id: str):
+        """Drop a deleted note from the search index."""
+        self.search_index.remove_note(note_id)
+        if self.related_index is not None:
+            self.related_index.remove_note(note_id)
+        self._stale_index.discard(note_id)
+        self._index_dirty = True
+    
+    def _invalidate_index(self, note_ids: Iterable[str]):
+        """Re-sync the indexes with rolled back notes."""
+        self.generation += 1
+        self.tag_index.rebuild(self.notes)
+        self.time_index.rebuild(self.notes)
+        self.search_index.reorder(self.notes)
+        self.related_index = None
+        self._stale_index.update(note_id for note_id in note_ids if note_id in self.notes)
+        self._index_dirty = True
+    
+    def _refresh_search_index(self):
+        """Re-index notes whose entries are stale (decrypting their bodies)."""
+        for note_id in list(self._stale_index):
+            if note_id in self.notes:
+                self._index_note(note_id, self.notes[note_id])
+            else:
+                self._unindex_note(note_id)
+    
+    def save_search_index(self):
+        """Write the search index next to the vault if it changed."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        if self._index_dirty:
+            self.search_index.save(self.index_path, self.encryption_manager)
+            self._index_dirty = False
+    
+    def _load_body(self, body_ref: int) -> str:
+        """Return a note body, decrypting it if it is not cached."""
+        content = self.body_cache.get(body_ref)
+        if content is None:
+            content = self.store.read_body(body_ref)
+            self.body_cache.put(body_ref, content)
+        return content
+    
+    def _persist(self, note_id: str, action: str, note: Optional[Note] = None):
+        """Write a put/delete now, or queue it when inside a transaction."""
+        if self._pending is not None:
+            # Only the last change to a note within a transaction matters.
+            self._pending.pop(note_id, None)
+            self._pending[note_id] = (action, note)
+            return
+        self._write_changes([(note_id, action, note)])
+    
+    def _write_changes(self, changes: List[Tuple[str, str, Optional[Note]]],
+                       atomic: bool = False):
+        """Persist changes with one durable write to the storage backend."""
+        entries = []
+        for note_id, action, note in changes:
+            if action == "delete":
+                entries.append((note_id, action, None, None, None))
+                continue
+            
+            content = None
+            if note.has_pending_content or not self.store.has_body(note.body_ref):
+                content = note.content or ""
+            entries.append((note_id, action, note.metadata(), content, note.body_ref))
+        
+        body_refs = self.store.commit(entries, atomic=atomic)
+        
+        # Stored content now lives in the log; keep it only in the bounded cache.
+        for (_, _, note), entry, body_ref in zip(changes, entries, body_refs):
+            if body_ref is None:
+                continue
+            if entry[3] is not None:
+                self.body_cache.put(body_ref, entry[3])
+            note.bind_body(body_ref, self._load_body)
+        self._maybe_schedule_compaction()
+    
+    @contextmanager
+    def transaction(self) -> Iterator['NotesVault']:
+        """Group changes so they are persisted with a single durable write.
+        
+        Changes are applied in memory as usual and appended to the log as one
+        all-or-nothing batch when the block exits. If the block raises, the
+        in-memory notes are rolled back and nothing is written. Nested
+        transactions join the outermost one.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        if self._pending is not None:
+            self._transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self._transaction_depth -= 1
+            return
+        
+        snapshot = dict(self.notes)
+        self._pending = {}
+        try:
+            yield self
+        except BaseException:
+            self.notes = snapshot
+            self._invalidate_index(self._pending)
+            self._pending = None
+            raise
+        
+        pending, self._pending = self._pending, None
+        if pending:
+            try:
+                self._write_changes(
+                    [(note_id, action, note) for note_id, (action, note) in pending.items()],
+                    atomic=True
+                )
+            except Exception:
+                self.notes = snapshot
+                self._invalidate_index(pending)
+                raise
     
     def add_note(self, note: Note) -> str:
         """Add a new note to the vault."""
@@ -171,13 +602,16 @@ class NotesVault:
             raise ValueError("Vault is locked")
         
         note_id = hashlib.md5(f"{note.title}_{len(self.notes)}".encode()).hexdigest()
-        import datetime
-        now = datetime.datetime.now().isoformat()
-        note.created_at = now
-        note.modified_at = now
+        now = now_us()
+        note.created_us = now
+        note.modified_us = now
         
         self.notes[note_id] = note
-        self.save_vault()
+        self.generation += 1
+        self._index_note(note_id, note)
+        self.tag_index.set_tags(note_id, note.tags)
+        self.time_index.set_times(note_id, note.created_us, note.modified_us)
+        self._persist(note_id, "put", note)
         return note_id
     
     def update_note(self, note_id: str, note: Note):
@@ -186,11 +620,14 @@ class NotesVault:
             raise ValueError("Vault is locked")
         
         if note_id in self.notes:
-            import datetime
-            note.created_at = self.notes[note_id].created_at
-            note.modified_at = datetime.datetime.now().isoformat()
+            note.created_us = self.notes[note_id].created_us
+            note.modified_us = now_us()
             self.notes[note_id] = note
-            self.save_vault()
+            self.generation += 1
+            self._index_note(note_id, note)
+            self.tag_index.set_tags(note_id, note.tags)
+            self.time_index.set_times(note_id, note.created_us, note.modified_us)
+            self._persist(note_id, "put", note)
     
     def delete_note(self, note_id: str):
         """Delete a note from the vault."""
@@ -199,23 +636,202 @@ class NotesVault:
         
         if note_id in self.notes:
             del self.notes[note_id]
-            self.save_vault()
+            self.generation += 1
+            self._unindex_note(note_id)
+            self.tag_index.remove_note(note_id)
+            self.time_index.remove_note(note_id)
+            self._persist(note_id, "delete")
+    
+    def add_notes(self, notes: List[Note]) -> List[str]:
+        """Add several notes with a single write."""
+        with self.transaction():
+            return [self.add_note(note) for note in notes]
+    
+    def update_notes(self, updates: Dict[str, Note]):
+        """Update several notes with a single write."""
+        with self.transaction():
+            for note_id, note in updates.items():
+                self.update_note(note_id, note)
+    
+    def delete_notes(self, note_ids: List[str]):
+        """Delete several notes with a single write."""
+        with self.transaction():
+            for note_id in note_ids:
+                self.delete_note(note_id)
+    
+    def compact(self):
+        """Compact the vault file now, dropping superseded records."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        self.store.compact()
+    
+    def compaction_stats(self) -> Dict:
+        """Get live/dead byte counts and the last compaction duration."""
+        return self.store.stats()
+    
+    def _maybe_schedule_compaction(self):
+        """Start a background compaction once enough of the file is dead."""
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            return
+        if self.store.dead_bytes() < self.compaction_min_bytes:
+            return
+        if self.store.dead_ratio() < self.compaction_threshold:
+            return
+        
+        self._compaction_thread = threading.Thread(
+            target=self._background_compaction, daemon=True
+        )
+        self._compaction_thread.start()
+    
+    def _background_compaction(self):
+        """Run a compaction on the background thread."""
+        try:
+            self.store.compact()
+        except Exception as e:
+            print(f"Error compacting vault: {e}")
+    
+    def search_notes(self, query: str, within: Optional[Iterable[str]] = None,
+                     fuzzy: bool = False, max_edits: int = 2) -> List[Tuple[str, Note]]:
+        """Search notes by title, content, or tags.
+        
+        Plain text matches as a substring; the query language in query.py
+        (title:, tag:, created:, modified:, phrases, AND/OR/NOT) is also
+        accepted. Raises ValueError for a malformed query. With within,
+        only those note ids are searched.
+        
+        With fuzzy, the query is taken as plain words, each of which must
+        match a whole word of the note within max_edits typos (at most 2;
+        fewer for short words). Closest matches come first.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        self._refresh_search_index()
+        if fuzzy:
+            allowed = None if within is None else set(within)
+            return [
+                (note_id, self.notes[note_id])
+                for note_id, _ in self.search_index.fuzzy_matches(query.lower(), max_edits)
+                if allowed is None or note_id in allowed
+            ]
+        note_ids, _ = run_query(self, query, None if within is None else set(within))
+        return [(note_id, self.notes[note_id]) for note_id in note_ids]
     
-    def search_notes(self, query: str) -> List[Tuple[str, Note]]:
-        """Search notes by title, content, or tags."""
+    def fuzzy_index_stats(self) -> Optional[Dict]:
+        """Size and approximate memory use of the fuzzy term index, if built yet."""
         if not self.is_unlocked:
             raise ValueError("Vault is locked")
         
-        results = []
-        query_lower = query.lower()
+        fuzzy = self.search_index.fuzzy
+        return fuzzy.stats() if fuzzy is not None else None
+    
+    def search_session(self, cache_size: int = 64) -> SearchSession:
+        """An as-you-type search session over this vault."""
+        return SearchSession(self, cache_size)
+        
+    def explain(self, query: str) -> str:
+        """Run a search and describe its plan with per-step candidate counts."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        self._refresh_search_index()
+        _, plan = run_query(self, query)
+        return str(plan)
+    
+    def search_ranked(self, query: str, k: int = 20,
+                      within: Optional[Iterable[str]] = None) -> List[Tuple[str, Note, float]]:
+        """Best k notes for a query by BM25 relevance, as (note_id, note, score).
+        
+        Notes match on any query word; title and tag hits weigh more than
+        body hits. With within, only those note ids are ranked.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        self._refresh_search_index()
+        return [
+            (note_id, self.notes[note_id], score)
+            for note_id, score in self.search_index.ranked(query.lower(), k, within)
+        ]
+    
+    def _related(self) -> RelatedIndex:
+        """The related-notes index, built or rebuilt from the search index as needed."""
+        self._refresh_search_index()
+        if self.related_index is None or self.related_index.needs_rebuild():
+            index = RelatedIndex()
+            index.build({note_id: self.search_index.term_frequencies(note_id) for note_id in self.notes})
+            self.related_index = index
+        return self.related_index
+    
+    def related_notes(self, note_id: str, k: int = 10) -> List[Tuple[str, Note, float]]:
+        """The k notes most similar to a note by TF-IDF cosine, as (note_id, note, similarity)."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        return [
+            (other_id, self.notes[other_id], similarity)
+            for other_id, similarity in self._related().related(note_id, k)
+        ]
+    
+    def find_duplicates(self, threshold: float = DUPLICATE_THRESHOLD) -> List[Tuple[str, str, float]]:
+        """Pairs of near-duplicate notes as (note_id, other_id, similarity), most similar first.
+        
+        Similarity is the Jaccard similarity of the notes' word sets;
+        candidate pairs come from MinHash LSH buckets.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
         
-        for note_id, note in self.notes.items():
-            if (query_lower in note.title.lower() or 
-                query_lower in note.content.lower() or 
-                any(query_lower in tag.lower() for tag in note.tags)):
-                results.append((note_id, note))
+        return self._related().duplicates(threshold)
+    
+    def tag_counts(self) -> Dict[str, int]:
+        """Number of notes per tag (lowercased), most used first."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        return self.tag_index.counts()
+    
+    def notes_with_tag(self, tag: str) -> List[Tuple[str, Note]]:
+        """Notes carrying one tag (case-insensitive), in vault order."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        tagged = self.tag_index.notes_with(tag)
+        return [(note_id, note) for note_id, note in self.notes.items() if note_id in tagged]
+    
+    def search_tags(self, query: str) -> List[Tuple[str, Note]]:
+        """Notes matching a tag query such as ``tag:python AND NOT tag:archived``.
+        
+        Tag queries use the query language of search_notes restricted to
+        tag: terms. Raises ValueError if the query is malformed.
+        """
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        
+        matches = parse_tag_query(query).evaluate(self, None, QueryPlan(query), 0)
+        return [(note_id, note) for note_id, note in self.notes.items() if note_id in matches]
+    
+    def recent_notes(self, count: Optional[int] = None,
+                     by: str = "modified") -> List[Tuple[str, Note]]:
+        """The count newest notes (all if None) by "modified" or "created" time, newest first."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        if by not in TIME_FIELDS:
+            raise ValueError(f"Unknown time field: {by}")
+        
+        return [(note_id, self.notes[note_id]) for note_id in self.time_index.latest(by, count)]
+    
+    def notes_between(self, start: Optional[str], end: Optional[str],
+                      by: str = "modified") -> List[Tuple[str, Note]]:
+        """Notes with an ISO-8601 time in [start, end), oldest first; None leaves a side open."""
+        if not self.is_unlocked:
+            raise ValueError("Vault is locked")
+        if by not in TIME_FIELDS:
+            raise ValueError(f"Unknown time field: {by}")
         
-        return results
+        note_ids = self.time_index.between(by, iso_to_us(start), iso_to_us(end))
+        return [(note_id, self.notes[note_id]) for note_id in note_ids]
     
     def get_all_notes(self) -> List[Tuple[str, Note]]:
         """Get all notes in the vault."""
@@ -226,7 +842,21 @@ class NotesVault:
     
     def lock_vault(self):
         """Lock the vault."""
+        if self._compaction_thread:
+            self._compaction_thread.join()
+            self._compaction_thread = None
+        if self.is_unlocked:
+            try:
+                self.save_search_index()
+            except Exception as e:
+                print(f"Error saving search index: {e}")
         self.is_unlocked = False
         self.notes = {}
-        self.encryption_manager.key = None
-        self.encryption_manager.fernet = None
+        self.generation += 1
+        self.search_index = SearchIndex()
+        self._stale_index = set()
+        self.related_index = None
+        self.tag_index = TagIndex()
+        self.time_index = TimeIndex()
+        self.body_cache.clear()
+        self.encryption_manager.clear()
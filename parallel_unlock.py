@@ -0,0 +1,104 @@
+"""
+Parallel decryption of vault records and shards during unlock.
+
+Unlock work is a list of independently encrypted payloads (log records or
+shard files). Small vaults are decrypted on the calling thread; large ones
+are split into chunks of roughly equal size and fanned out to a
+``concurrent.futures`` pool, and the parsed results are merged back in order.
+
+Worker processes are always spawned, never forked: the GUI unlocks on a
+worker thread, and forking a multi-threaded (Tk) process can deadlock the
+child on a lock some other thread held.
+"""
+
+import os
+import json
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+from encryption import EncryptionManager, Buffer
+
+Payload = Tuple[Buffer, Optional[bytes]]
+
+
+def decrypt_payload(encryption_manager: EncryptionManager, payload: Payload,
+                    legacy: bool) -> Any:
+    """Decrypt and parse one (ciphertext, associated data) payload."""
+    token, aad = payload
+    if legacy:
+        return json.loads(encryption_manager.decrypt_legacy(token))
+    return json.loads(encryption_manager.decrypt_data(token, aad))
+
+
+def decrypt_chunk(key: bytes, payloads: List[Payload], legacy: bool) -> List[Any]:
+    """Decrypt and parse one chunk of payloads (runs inside a worker)."""
+    encryption_manager = EncryptionManager()
+    encryption_manager.set_key(key)
+    return [decrypt_payload(encryption_manager, payload, legacy) for payload in payloads]
+
+
+def split_chunks(payloads: List[Payload], chunk_count: int) -> List[List[Payload]]:
+    """Split payloads into consecutive chunks of roughly equal byte size."""
+    total = sum(len(token) for token, _ in payloads)
+    target = max(1, total // max(1, chunk_count))
+    chunks: List[List[Payload]] = [[]]
+    size = 0
+    for token, aad in payloads:
+        if size >= target and chunks[-1]:
+            chunks.append([])
+            size = 0
+        chunks[-1].append((token, aad))
+        size += len(token)
+    return chunks
+
+
+class ParallelDecryptor:
+    """Decrypts lists of JSON payloads, in parallel once they are large enough."""
+    
+    def __init__(self, workers: Optional[int] = None, executor: str = "process",
+                 min_parallel_bytes: int = 8 * 1024 * 1024):
+        self.workers = workers or os.cpu_count() or 1
+        # "process" sidesteps the GIL for json parsing; "thread" avoids pool start-up
+        self.executor = executor
+        self.min_parallel_bytes = min_parallel_bytes
+    
+    def _make_pool(self) -> Executor:
+        """Create the configured worker pool."""
+        if self.executor == "process":
+            return ProcessPoolExecutor(max_workers=self.workers,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        if self.executor == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers)
+        raise ValueError(f"Unknown executor: {self.executor}")
+    
+    def should_parallelize(self, payloads: List[Payload]) -> bool:
+        """Decide whether the payloads are worth fanning out."""
+        if self.workers < 2 or len(payloads) < 2:
+            return False
+        return sum(len(token) for token, _ in payloads) >= self.min_parallel_bytes
+    
+    def decrypt_json(self, encryption_manager: EncryptionManager, payloads: List[Payload],
+                     legacy: bool = False) -> List[Any]:
+        """Decrypt and parse every (ciphertext, associated data) payload in order.
+        
+        legacy=True reads format v1 Fernet tokens.
+        """
+        if not self.should_parallelize(payloads):
+            return [decrypt_payload(encryption_manager, payload, legacy) for payload in payloads]
+        
+        if not encryption_manager.key:
+            raise ValueError("Encryption not initialized. Set password first.")
+        if self.executor == "process":
+            # memoryview slices cannot be pickled for worker processes.
+            payloads = [(bytes(token), aad) for token, aad in payloads]
+        # A few chunks per worker keeps the pool busy when chunk costs differ.
+        chunks = split_chunks(payloads, self.workers * 4)
+        results: List[Any] = []
+        with self._make_pool() as pool:
+            futures = [
+                pool.submit(decrypt_chunk, encryption_manager.key, chunk, legacy)
+                for chunk in chunks
+            ]
+            for future in futures:
+                results.extend(future.result())
+        return results
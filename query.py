@@ -0,0 +1,429 @@
+"""
+Structured search queries for the notes vault.
+
+A query combines terms with AND, OR, NOT (upper case) and parentheses;
+adjacent terms are joined with AND:
+
+    budget                  text anywhere in the title, tags or content
+    "quick brown fox"       a phrase, matched as one substring
+    title:meeting           text in the title (content: works the same way)
+    tag:python              notes carrying the tag
+    created:>2025-01-01     created after that day (>=, <, <=, = also work)
+    modified:<7d            modified less than 7 days ago (h, d, w, m, y)
+
+A query without any of that syntax is a plain substring search for the
+whole string, exactly as search always behaved.
+
+The planner runs the terms of an AND from the most to the least selective,
+as estimated from the indexes: tag terms are answered by the tag index,
+date terms by the sorted timestamp index, text terms narrowed by the
+full-text index and then checked, and terms no index can answer only scan
+the notes left over by the terms before them. Once few notes survive,
+tag and date terms check those notes directly rather than reading their
+whole index range. NOT terms run last, subtracting from what survived.
+"""
+
+import re
+import time
+import datetime
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional, Set, Tuple
+from time_index import datetime_to_us, now_us
+
+FIELDS = ("title", "content", "tag", "created", "modified")
+STRUCTURED = re.compile(r'"|\b(?:AND|OR|NOT)\b|\b(?:' + "|".join(FIELDS) + r'):')
+TOKEN = re.compile(r'\s*(\(|\)|\w+:"[^"]*"|"[^"]*"|[^\s()]+)')
+RELATIVE = re.compile(r"(\d+)([hdwmy])")
+RELATIVE_UNITS = {'h': 1 / 24, 'd': 1, 'w': 7, 'm': 30, 'y': 365}
+COMPARISONS = (">=", "<=", ">", "<", "=")
+_NOT_LOOKED_UP = object()
+# Checking this few surviving notes directly beats any index lookup
+CHECK_DIRECTLY = 256
+
+
+def is_structured(query: str) -> bool:
+    """Whether a query uses the query language rather than plain text."""
+    return bool(STRUCTURED.search(query))
+
+
+class QueryPlan:
+    """The steps a query ran, with candidate counts per step."""
+    
+    def __init__(self, query: str):
+        self.query = query
+        self.steps: List[Tuple[int, str, str, int, int]] = []
+        self.duration = None
+        self.results = 0
+    
+    def add(self, depth: int, term: str, strategy: str, considered: int, matched: int = 0) -> int:
+        """Record one step: how many notes went in and how many matched."""
+        self.steps.append((depth, term, strategy, considered, matched))
+        return len(self.steps) - 1
+    
+    def set_matched(self, step: int, matched: int):
+        """Fill in the result count of a step recorded before its children ran."""
+        self.steps[step] = self.steps[step][:4] + (matched,)
+    
+    def __str__(self) -> str:
+        lines = [f"Plan for {self.query!r}:"]
+        for number, (depth, term, strategy, considered, matched) in enumerate(self.steps, 1):
+            label = "  " * depth + term
+            lines.append(f"  {number:2d}. {label:32s} {strategy:22s} {considered:8d} -> {matched:d}")
+        duration = f" in {self.duration * 1000:.2f} ms" if self.duration is not None else ""
+        lines.append(f"  {self.results} result(s){duration}")
+        return "\n".join(lines)
+
+
+class Term(ABC):
+    """A leaf of the query, optionally answered by an index."""
+    
+    # Whether index candidates match without checking each note
+    exact = False
+    index_name = "index"
+    _cached = _NOT_LOOKED_UP
+    
+    def index_candidates(self, vault) -> Optional[Set[str]]:
+        """Note ids from an index (a superset unless exact), or None."""
+        return None
+    
+    @abstractmethod
+    def matches(self, note) -> bool:
+        """Whether a note satisfies the term, checked against the note itself."""
+    
+    def _candidates(self, vault) -> Optional[Set[str]]:
+        if self._cached is _NOT_LOOKED_UP:
+            self._cached = self.index_candidates(vault)
+        return self._cached
+    
+    def index_size(self, vault) -> Optional[int]:
+        """Number of index candidates, or None if no index answers the term."""
+        candidates = self._candidates(vault)
+        return None if candidates is None else len(candidates)
+    
+    def estimate(self, vault) -> int:
+        """Upper bound on the matching notes, as far as indexes can tell."""
+        size = self.index_size(vault)
+        return len(vault.notes) if size is None else size
+    
+    def evaluate(self, vault, within: Optional[Set[str]], plan: QueryPlan, depth: int) -> Set[str]:
+        """Matching notes among within (all notes when None)."""
+        considered = len(vault.notes) if within is None else len(within)
+        notes = vault.notes
+        # Few survivors are checked directly; so are survivors of an exact
+        # term that are fewer than its index candidates.
+        size = None
+        if within is not None and len(within) <= CHECK_DIRECTLY:
+            direct = True
+        else:
+            size = self.index_size(vault)
+            direct = self.exact and within is not None and size is not None and len(within) < size
+        
+        if direct:
+            result = {note_id for note_id in within if self.matches(notes[note_id])}
+            strategy = "check survivors"
+        elif size is None:
+            pool = notes if within is None else within
+            result = {note_id for note_id in pool if self.matches(notes[note_id])}
+            strategy = "scan"
+        else:
+            candidates = self._candidates(vault)
+            pool = candidates if within is None else candidates & within
+            if self.exact:
+                result = set(pool)
+                strategy = self.index_name
+            else:
+                result = {note_id for note_id in pool if self.matches(notes[note_id])}
+                strategy = f"{self.index_name} + check"
+        plan.add(depth, str(self), strategy, considered, len(result))
+        return result
+
+
+class Text(Term):
+    """Case-insensitive substring of the title, content, tags, or all three."""
+    
+    index_name = "text index"
+    
+    def __init__(self, text: str, field: Optional[str] = None, quoted: bool = False):
+        self.text = text.lower()
+        self.field = field
+        self.quoted = quoted
+    
+    def __str__(self) -> str:
+        text = f'"{self.text}"' if self.quoted else self.text
+        return f"{self.field}:{text}" if self.field else text
+    
+    def index_candidates(self, vault) -> Optional[Set[str]]:
+        candidates = vault.search_index.candidates(self.text)
+        return None if candidates is None else set(candidates)
+    
+    def matches(self, note) -> bool:
+        if self.field == "title":
+            return self.text in note.title.lower()
+        if self.field == "content":
+            return self.text in note.content.lower()
+        return (self.text in note.title.lower() or
+                self.text in note.content.lower() or
+                any(self.text in tag.lower() for tag in note.tags))
+
+
+class Tag(Term):
+    """Notes carrying a tag (case-insensitive)."""
+    
+    exact = True
+    index_name = "tag index"
+    
+    def __init__(self, tag: str):
+        self.tag = tag.strip().lower()
+    
+    def __str__(self) -> str:
+        return f'tag:"{self.tag}"' if " " in self.tag else f"tag:{self.tag}"
+    
+    def index_candidates(self, vault) -> Optional[Set[str]]:
+        return vault.tag_index.notes_with(self.tag)
+    
+    def matches(self, note) -> bool:
+        return any(tag.strip().lower() == self.tag for tag in note.tags)
+
+
+class DateRange(Term):
+    """A created/modified timestamp within [low, high) epoch microseconds."""
+    
+    exact = True
+    index_name = "time index"
+    
+    def __init__(self, field: str, text: str, now: Optional[int] = None):
+        self.field = field
+        self.text = text
+        self.low, self.high = parse_date_bounds(text, now_us() if now is None else now)
+    
+    def __str__(self) -> str:
+        return f"{self.field}:{self.text}"
+    
+    def index_size(self, vault) -> Optional[int]:
+        return vault.time_index.count(self.field, self.low, self.high)
+    
+    def index_candidates(self, vault) -> Optional[Set[str]]:
+        return set(vault.time_index.between(self.field, self.low, self.high))
+    
+    def matches(self, note) -> bool:
+        value = getattr(note, f"{self.field}_us")
+        return (value is not None and
+                (self.low is None or value >= self.low) and
+                (self.high is None or value < self.high))
+
+
+def parse_date_bounds(text: str, now: int) -> Tuple[Optional[int], Optional[int]]:
+    """[low, high) epoch microseconds for a created:/modified: value.
+    
+    Dates cover their whole day; relative ages (7d) count back from now,
+    so ``<7d`` means newer than seven days ago and a bare ``7d`` means
+    within the last seven days. None leaves a side open.
+    """
+    op = next((op for op in COMPARISONS if text.startswith(op)), "")
+    value = text[len(op):]
+    
+    relative = RELATIVE.fullmatch(value)
+    if relative:
+        age = datetime.timedelta(days=int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)])
+        start = now - age // datetime.timedelta(microseconds=1)
+        end = start + 1
+        # Younger than the age means later than the cutoff.
+        op = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "": ">="}.get(op, op)
+    else:
+        try:
+            if len(value) == 10:
+                day = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time())
+                start = datetime_to_us(day)
+                end = datetime_to_us(day + datetime.timedelta(days=1))
+            else:
+                start = datetime_to_us(datetime.datetime.fromisoformat(value))
+                end = start + 1
+        except ValueError:
+            raise ValueError(f"Invalid date {value!r}: use YYYY-MM-DD or an age such as 7d")
+    
+    # A date is the span [start, end); an instant is the span [t, t + 1).
+    return {
+        ">": (end, None), ">=": (start, None),
+        "<": (None, start), "<=": (None, end),
+    }.get(op, (start, end))
+
+
+class And:
+    """Notes matching every child, narrowed child by child."""
+    
+    def __init__(self, children: List):
+        self.children = children
+    
+    def estimate(self, vault) -> int:
+        return min([child.estimate(vault) for child in self.children if not isinstance(child, Not)],
+                   default=len(vault.notes))
+    
+    def evaluate(self, vault, within: Optional[Set[str]], plan: QueryPlan, depth: int) -> Set[str]:
+        considered = len(vault.notes) if within is None else len(within)
+        step = plan.add(depth, "AND", "most selective first", considered)
+        # Positive terms from the smallest estimate up, then negations.
+        ordered = sorted(self.children, key=lambda child: (isinstance(child, Not), child.estimate(vault)))
+        current = within
+        for child in ordered:
+            current = child.evaluate(vault, current, plan, depth + 1)
+            if not current:
+                break
+        plan.set_matched(step, len(current))
+        return current
+
+
+class Or:
+    """Notes matching any child."""
+    
+    def __init__(self, children: List):
+        self.children = children
+    
+    def estimate(self, vault) -> int:
+        return min(len(vault.notes), sum(child.estimate(vault) for child in self.children))
+    
+    def evaluate(self, vault, within: Optional[Set[str]], plan: QueryPlan, depth: int) -> Set[str]:
+        considered = len(vault.notes) if within is None else len(within)
+        step = plan.add(depth, "OR", "union", considered)
+        result: Set[str] = set()
+        for child in self.children:
+            result |= child.evaluate(vault, within, plan, depth + 1)
+        plan.set_matched(step, len(result))
+        return result
+
+
+class Not:
+    """Notes not matching the child."""
+    
+    def __init__(self, child):
+        self.child = child
+    
+    def estimate(self, vault) -> int:
+        return len(vault.notes)
+    
+    def evaluate(self, vault, within: Optional[Set[str]], plan: QueryPlan, depth: int) -> Set[str]:
+        pool = set(vault.notes) if within is None else within
+        step = plan.add(depth, "NOT", "difference", len(pool))
+        # Only the surviving notes need checking against the negated term.
+        result = pool - self.child.evaluate(vault, pool, plan, depth + 1)
+        plan.set_matched(step, len(result))
+        return result
+
+
+class _Parser:
+    """Recursive descent over the query tokens: OR < AND < NOT < term."""
+    
+    def __init__(self, tokens: List[str], now: int):
+        self.tokens = tokens
+        self.position = 0
+        self.now = now
+    
+    def peek(self) -> str:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ""
+    
+    def take(self) -> str:
+        token = self.peek()
+        self.position += 1
+        return token
+    
+    def parse(self):
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.peek()!r} in query")
+        return node
+    
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+    
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() and self.peek() not in ("OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else And(children)
+    
+    def parse_not(self):
+        if self.peek() == "NOT":
+            self.take()
+            return Not(self.parse_not())
+        return self.parse_term()
+    
+    def parse_term(self):
+        token = self.take()
+        if token == "(":
+            node = self.parse_or()
+            if self.take() != ")":
+                raise ValueError("Missing ')' in query")
+            return node
+        if not token or token in ("AND", "OR", ")"):
+            raise ValueError(f"Expected a search term, got {token or 'end of query'!r}")
+        
+        field, _, value = token.partition(":")
+        if value and field in FIELDS:
+            if field in ("created", "modified"):
+                return DateRange(field, value, self.now)
+            quoted = value.startswith('"')
+            value = value.strip('"')
+            if field == "tag":
+                return Tag(value)
+            return Text(value, field, quoted)
+        if token.startswith('"'):
+            return Text(token.strip('"'), quoted=True)
+        return Text(token)
+
+
+def parse_query(query: str, now: Optional[int] = None):
+    """Parse a query into a tree of terms, raising ValueError if malformed.
+    
+    Ages such as 7d count back from now (epoch microseconds, default the
+    current time).
+    """
+    if not is_structured(query):
+        return Text(query)
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        raise ValueError("Empty query")
+    return _Parser(tokens, now_us() if now is None else now).parse()
+
+
+def _leaves(node) -> Iterator[Term]:
+    """The terms of a parsed query."""
+    if isinstance(node, (And, Or)):
+        for child in node.children:
+            yield from _leaves(child)
+    elif isinstance(node, Not):
+        yield from _leaves(node.child)
+    else:
+        yield node
+
+
+def parse_tag_query(query: str):
+    """Parse a query made of tag: terms only, raising ValueError otherwise."""
+    if not query.strip():
+        raise ValueError("Empty tag query")
+    node = parse_query(query)
+    for term in _leaves(node):
+        if not isinstance(term, Tag):
+            raise ValueError(f"Expected tag:NAME in tag query, got {str(term)!r}")
+    return node
+
+
+def run_query(vault, query: str,
+              within: Optional[Set[str]] = None) -> Tuple[List[str], QueryPlan]:
+    """Matching note ids in vault order, and the plan that found them.
+    
+    With within, only those note ids are considered. The vault's search
+    index must be up to date.
+    """
+    plan = QueryPlan(query)
+    started = time.perf_counter()
+    matches = parse_query(query).evaluate(vault, within, plan, 0)
+    doc_numbers = vault.search_index.doc_numbers
+    note_ids = sorted(matches, key=doc_numbers.__getitem__)
+    plan.duration = time.perf_counter() - started
+    plan.results = len(note_ids)
+    return note_ids, plan
@@ -0,0 +1,332 @@
+"""
+Full-text search index for the notes vault.
+
+An inverted index maps every lowercase word of a note's title, tags and
+content to the notes containing it. Searching keeps the substring semantics
+of the original linear scan: every run of word characters in the query has
+to occur inside some indexed word of a matching note, so only notes holding
+such words are candidates, and only those are checked against the query.
+Indexed words containing a query fragment are found through a trigram index
+over the vocabulary instead of scanning every word.
+
+Fuzzy search looks query words up in a deletion index over the vocabulary
+(see fuzzy_index.py), built on first use and then kept in step with the
+postings.
+
+Ranked search scores notes with BM25 over the same postings. Title and tag
+occurrences count more than body occurrences (a BM25F-style weighted term
+frequency), and a query word that only occurs inside a longer indexed word
+counts in proportion to how much of that word it covers. Weighted document
+lengths are kept up to date with the postings, so a query only touches the
+posting lists of the words it matches.
+
+The index is saved next to the vault, encrypted with the vault key. Each
+entry records the modification time of the note version it was built from, so
+entries left stale by a crash are detected and rebuilt on the next unlock.
+"""
+
+import os
+import re
+import json
+import math
+import heapq
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from storage import atomic_write
+from fuzzy_index import DeletionIndex, allowed_edits
+
+WORD = re.compile(r"\w+")
+TRIGRAM = 3
+FIELDS = ("title", "tags", "content")
+INDEX_FORMAT = 1
+INDEX_AAD = b"search-index"
+
+# Relative weight of a word occurrence in each field
+FIELD_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'content': 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words."""
+    return WORD.findall(text.lower())
+
+
+def trigrams(word: str) -> Set[str]:
+    """Every three-character substring of a word."""
+    return {word[i:i + TRIGRAM] for i in range(len(word) - TRIGRAM + 1)}
+
+
+def weighted_length(fields: Dict[str, Dict[str, int]]) -> float:
+    """Number of words in a document, weighted by field."""
+    return sum(FIELD_WEIGHTS[field] * sum(counts.values()) for field, counts in fields.items())
+
+
+class SearchIndex:
+    """Inverted index from words to the notes containing them."""
+    
+    def __init__(self):
+        # note_id <-> document number; numbers follow the vault's note order
+        self.doc_numbers: Dict[str, int] = {}
+        self.doc_ids: Dict[int, str] = {}
+        self.next_doc = 0
+        # document -> field -> word -> occurrences
+        self.forward: Dict[int, Dict[str, Dict[str, int]]] = {}
+        # note_id -> modified time (epoch microseconds) of the indexed version
+        self.stamps: Dict[str, Optional[int]] = {}
+        # word -> documents containing it
+        self.postings: Dict[str, Set[int]] = {}
+        # trigram -> indexed words containing it
+        self.trigrams: Dict[str, Set[str]] = {}
+        # document -> field-weighted length, and their sum
+        self.lengths: Dict[int, float] = {}
+        self.total_length = 0.0
+        # Typo-tolerant vocabulary lookup, built by the first fuzzy search
+        self.fuzzy: Optional[DeletionIndex] = None
+    
+    def __len__(self) -> int:
+        return len(self.forward)
+    
+    def is_current(self, note_id: str, stamp: Optional[int]) -> bool:
+        """Whether the note is indexed at the given version."""
+        return note_id in self.stamps and self.stamps[note_id] == stamp
+    
+    def _doc_number(self, note_id: str) -> int:
+        """Document number of a note, allocating one at the end if needed."""
+        doc = self.doc_numbers.get(note_id)
+        if doc is None:
+            doc = self.next_doc
+            self.next_doc += 1
+            self.doc_numbers[note_id] = doc
+            self.doc_ids[doc] = note_id
+        return doc
+    
+    def index_note(self, note_id: str, title: str, tags: List[str], content: str,
+                   stamp: Optional[int]):
+        """Index (or re-index) one note."""
+        self._unlink(note_id)
+        doc = self._doc_number(note_id)
+        fields = {
+            'title': dict(Counter(tokenize(title))),
+            'tags': dict(Counter(word for tag in tags for word in tokenize(tag))),
+            'content': dict(Counter(tokenize(content)))
+        }
+        self._link(doc, fields)
+        self.stamps[note_id] = stamp
+    
+    def remove_note(self, note_id: str):
+        """Drop a note from the index."""
+        self._unlink(note_id)
+        doc = self.doc_numbers.pop(note_id, None)
+        if doc is not None:
+            del self.doc_ids[doc]
+        self.stamps.pop(note_id, None)
+    
+    def _link(self, doc: int, fields: Dict[str, Dict[str, int]]):
+        """Add a document's words to the postings."""
+        self.forward[doc] = fields
+        length = weighted_length(fields)
+        self.lengths[doc] = length
+        self.total_length += length
+        for word in set().union(*fields.values()):
+            docs = self.postings.get(word)
+            if docs is None:
+                docs = self.postings[word] = set()
+                for gram in trigrams(word):
+                    self.trigrams.setdefault(gram, set()).add(word)
+                if self.fuzzy is not None:
+                    self.fuzzy.add(word)
+            docs.add(doc)
+    
+    def _unlink(self, note_id: str):
+        """Remove a document's words from the postings."""
+        doc = self.doc_numbers.get(note_id)
+        fields = self.forward.pop(doc, None) if doc is not None else None
+        if fields is None:
+            return
+        self.total_length -= self.lengths.pop(doc)
+        if not self.forward:
+            # Keep rounding errors from accumulating over an emptied index.
+            self.total_length = 0.0
+        for word in set().union(*fields.values()):
+            docs = self.postings[word]
+            docs.discard(doc)
+            if not docs:
+                del self.postings[word]
+                for gram in trigrams(word):
+                    words = self.trigrams[gram]
+                    words.discard(word)
+                    if not words:
+                        del self.trigrams[gram]
+                if self.fuzzy is not None:
+                    self.fuzzy.remove(word)
+    
+    def term_frequencies(self, note_id: str) -> Dict[str, float]:
+        """Field-weighted occurrences of each word of an indexed note."""
+        counts: Dict[str, float] = {}
+        for field, words in self.forward[self.doc_numbers[note_id]].items():
+            weight = FIELD_WEIGHTS[field]
+            for word, count in words.items():
+                counts[word] = counts.get(word, 0.0) + weight * count
+        return counts
+    
+    def reorder(self, note_ids: Iterable[str]):
+        """Renumber documents to follow the given note order.
+        
+        Entries for notes not in the order are dropped.
+        """
+        forward = {self.doc_ids[doc]: fields for doc, fields in self.forward.items()}
+        stamps = self.stamps
+        self.__init__()
+        for note_id in note_ids:
+            doc = self._doc_number(note_id)
+            if note_id in forward:
+                self._link(doc, forward[note_id])
+                self.stamps[note_id] = stamps[note_id]
+    
+    def words_containing(self, fragment: str) -> List[str]:
+        """Indexed words that contain the fragment.
+        
+        Candidate words must hold every trigram of the fragment; the
+        smallest trigram sets are intersected first. Fragments shorter than
+        a trigram fall back to scanning the vocabulary.
+        """
+        if len(fragment) < TRIGRAM:
+            return self.scan_words(fragment)
+        
+        words: Optional[Set[str]] = None
+        for gram in sorted(trigrams(fragment), key=lambda gram: len(self.trigrams.get(gram, ()))):
+            found = self.trigrams.get(gram)
+            if not found:
+                return []
+            words = set(found) if words is None else words & found
+            if not words:
+                return []
+        return [word for word in words if fragment in word]
+    
+    def scan_words(self, fragment: str) -> List[str]:
+        """Indexed words that contain the fragment, by scanning the vocabulary."""
+        return [word for word in self.postings if fragment in word]
+    
+    def candidates(self, query_lower: str) -> Optional[List[str]]:
+        """Note ids (in vault order) that may contain the query as a substring.
+        
+        Returns None when the query has no word characters to narrow by.
+        """
+        fragments = set(WORD.findall(query_lower))
+        if not fragments:
+            return None
+        
+        docs: Optional[Set[int]] = None
+        # Rarest-looking (longest) fragments first shrink the set fastest.
+        for fragment in sorted(fragments, key=len, reverse=True):
+            matching: Set[int] = set()
+            for word in self.words_containing(fragment):
+                matching |= self.postings[word]
+            docs = matching if docs is None else docs & matching
+            if not docs:
+                return []
+        return [self.doc_ids[doc] for doc in sorted(docs)]
+    
+    def ranked(self, query_lower: str, k: int,
+               within: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """The k best (note_id, score) matches for the query's words, best first.
+        
+        A note matches when it holds any query word. Scores accumulate over
+        the posting lists of the matched words only (restricted to the
+        within note ids, if given), and the top k are picked with a heap;
+        ties keep vault order.
+        """
+        if k <= 0 or not self.forward:
+            return []
+        total_docs = len(self.forward)
+        average_length = self.total_length / total_docs or 1.0
+        allowed = None if within is None else {self.doc_numbers[note_id] for note_id in within}
+        
+        scores: Dict[int, float] = {}
+        for fragment in set(WORD.findall(query_lower)):
+            for word in self.words_containing(fragment):
+                docs = self.postings[word]
+                idf = math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                weight = idf * len(fragment) / len(word)
+                if allowed is not None:
+                    docs = docs & allowed
+                for doc in docs:
+                    fields = self.forward[doc]
+                    tf = sum(FIELD_WEIGHTS[field] * fields[field].get(word, 0) for field in FIELDS)
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc] / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + weight * tf * (BM25_K1 + 1) / (tf + norm)
+        
+        best = heapq.nsmallest(k, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.doc_ids[doc], score) for doc, score in best]
+    
+    def fuzzy_index(self) -> DeletionIndex:
+        """The deletion index over the vocabulary, building it if needed."""
+        if self.fuzzy is None:
+            fuzzy = DeletionIndex()
+            for word in self.postings:
+                fuzzy.add(word)
+            self.fuzzy = fuzzy
+        return self.fuzzy
+    
+    def fuzzy_matches(self, query_lower: str, max_edits: int) -> List[Tuple[str, int]]:
+        """(note_id, total edits) for notes holding every query word or a near miss.
+        
+        Each query word may be off by up to max_edits (fewer for short
+        words, see fuzzy_index.allowed_edits). Closest matches come first,
+        then vault order.
+        """
+        fuzzy = self.fuzzy_index()
+        totals: Optional[Dict[int, int]] = None
+        for term in set(WORD.findall(query_lower)):
+            # doc -> fewest edits of any of its words that match the term
+            best: Dict[int, int] = {}
+            for word, distance in fuzzy.lookup(term, allowed_edits(term, max_edits)):
+                for doc in self.postings[word]:
+                    if distance < best.get(doc, max_edits + 1):
+                        best[doc] = distance
+            if totals is None:
+                totals = best
+            else:
+                totals = {doc: edits + best[doc] for doc, edits in totals.items() if doc in best}
+            if not totals:
+                return []
+        if totals is None:
+            return []
+        ranked = sorted(totals.items(), key=lambda item: (item[1], item[0]))
+        return [(self.doc_ids[doc], edits) for doc, edits in ranked]
+    
+    def to_dict(self) -> Dict:
+        """Serialize the index (documents in order)."""
+        return {
+            'format': INDEX_FORMAT,
+            'docs': [
+                [self.doc_ids[doc], self.stamps[self.doc_ids[doc]], self.forward[doc]]
+                for doc in sorted(self.forward)
+            ]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SearchIndex':
+        """Rebuild an index from its serialized form."""
+        if data.get('format') != INDEX_FORMAT:
+            raise ValueError(f"Unsupported search index format: {data.get('format')}")
+        index = cls()
+        for note_id, stamp, fields in data['docs']:
+            index._link(index._doc_number(note_id), fields)
+            index.stamps[note_id] = stamp
+        return index
+    
+    def save(self, path: str, encryption_manager):
+        """Encrypt and atomically write the index."""
+        data = encryption_manager.encrypt_data(json.dumps(self.to_dict()), INDEX_AAD)
+        atomic_write(path, data)
+    
+    @classmethod
+    def load(cls, path: str, encryption_manager) -> 'SearchIndex':
+        """Read a saved index; an empty one if there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'rb') as f:
+            data = f.read()
+        return cls.from_dict(json.loads(encryption_manager.decrypt_data(data, INDEX_AAD)))
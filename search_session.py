@@ -0,0 +1,78 @@
+"""
+As-you-type search over a notes vault.
+
+A session remembers the results of the queries it ran. When a plain text
+query extends the previous one (the old query is a substring of the new
+one), every match of the new query also matched the old one, so only the
+previous results are searched again. Recent results are kept in a small
+LRU cache, so going back with backspace costs a lookup. Both are dropped
+whenever the vault's generation counter shows the notes changed.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from cache import LRUCache
+from query import is_structured
+
+
+class SearchSession:
+    """Incremental search for one vault, typically one search box."""
+    
+    def __init__(self, vault, cache_size: int = 64):
+        self.vault = vault
+        # query -> matching note ids in vault order; weighed per query, not per result
+        self.cache = LRUCache(cache_size, weigh=lambda _: 1)
+        self.generation: Optional[int] = None
+        self.last_query: Optional[str] = None
+        self.last_results: List[str] = []
+        self.refinements = 0
+        self.full_searches = 0
+        self.last_duration = None
+    
+    def _sync(self):
+        """Forget everything if the vault changed since the last search."""
+        if self.generation != self.vault.generation:
+            self.cache.clear()
+            self.last_query = None
+            self.last_results = []
+            self.generation = self.vault.generation
+    
+    def _extends_last(self, query: str) -> bool:
+        """Whether every match of the query must have matched the last one."""
+        last = self.last_query
+        return (last is not None and not is_structured(query) and not is_structured(last)
+                and last.lower() in query.lower())
+    
+    def matching_ids(self, query: str) -> List[str]:
+        """Ids of the notes matching the query, in vault order (do not modify)."""
+        started = time.perf_counter()
+        self._sync()
+        note_ids = self.cache.get(query)
+        if note_ids is None:
+            if self._extends_last(query):
+                note_ids = [note_id for note_id, _ in self.vault.search_notes(query, self.last_results)]
+                self.refinements += 1
+            else:
+                note_ids = [note_id for note_id, _ in self.vault.search_notes(query)]
+                self.full_searches += 1
+            self.cache.put(query, note_ids)
+        self.last_query = query
+        self.last_results = note_ids
+        self.last_duration = time.perf_counter() - started
+        return note_ids
+    
+    def search(self, query: str) -> List[Tuple[str, Any]]:
+        """(note_id, note) pairs matching the query, like NotesVault.search_notes."""
+        notes = self.vault.notes
+        return [(note_id, notes[note_id]) for note_id in self.matching_ids(query)]
+    
+    def stats(self) -> Dict:
+        """Cache and refinement counters, and the last search's duration."""
+        return {
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'cached_queries': len(self.cache),
+            'refinements': self.refinements,
+            'full_searches': self.full_searches,
+            'last_duration': self.last_duration
+        }
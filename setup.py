@@ -29,7 +29,7 @@ def install_dependencies():
         
         print("\n🧪 Testing installation...")
         try:
-            from cryptography.fernet import Fernet
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
             print("   ✅ cryptography import test passed")
         except ImportError as e:
             print(f"   ❌ Import test failed: {e}")
@@ -0,0 +1,241 @@
+"""
+Sharded storage mode for the encrypted notes vault.
+
+Notes are partitioned by a hash of their id into N encrypted shard files
+plus a small encrypted manifest. A save re-encrypts only the shards that
+changed, so per-save work is roughly vault_size / N.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional, Tuple
+from storage import atomic_write, pack_header, parse_header, update_key_params
+from parallel_unlock import ParallelDecryptor
+
+SHARD_MAGIC = b"NVSHD"
+# v1: Fernet manifest and shards, v2: AES-GCM with KDF parameters in the header,
+# v3: AES-GCM under a random data key, wrapped per credential in the header
+SHARD_VERSION = 3
+
+MANIFEST_AAD = b"manifest"
+
+CHECK_VALUE = "notes-vault-shards"
+
+
+def shard_for(note_id: str, shard_count: int) -> int:
+    """Map a note id to its shard index."""
+    digest = hashlib.md5(note_id.encode()).digest()
+    return int.from_bytes(digest[:4], 'big') % shard_count
+
+
+class ShardedStore:
+    """Vault storage split into independently encrypted shard files.
+    
+    The manifest (stored at the vault path) lists the current file of every
+    shard. Changed shards are written to new files first and the manifest is
+    swapped in afterwards, so a crash never leaves a half-applied save.
+    """
+    
+    def __init__(self, path: str, encryption_manager, shard_count: int = 16,
+                 decryptor: Optional[ParallelDecryptor] = None):
+        self.path = path
+        self.shard_dir = path + ".shards"
+        self.encryption_manager = encryption_manager
+        self.shard_count = shard_count
+        self.decryptor = decryptor or ParallelDecryptor()
+        self.shards: List[Dict[str, Dict]] = [{} for _ in range(shard_count)]
+        self.files: List[Optional[str]] = [None] * shard_count
+        self.generation = 0
+        self.version = SHARD_VERSION
+        self.lock = threading.RLock()
+        self.last_save_duration = None
+        self.last_save_shards = 0
+    
+    def exists(self) -> bool:
+        """Check whether the manifest exists."""
+        return os.path.exists(self.path)
+    
+    def has_body(self, body_ref: Optional[int]) -> bool:
+        """Shards keep content inline, so there are no separate bodies."""
+        return False
+    
+    def read_body(self, body_ref: int) -> str:
+        """Shards keep content inline, so there are no separate bodies."""
+        raise KeyError(f"Note body {body_ref} is not stored separately")
+    
+    def _shard_file(self, index: int) -> str:
+        """Name of the next file for a shard."""
+        return f"shard-{index:04d}-{self.generation:08d}.enc"
+    
+    def _write_shard(self, index: int) -> str:
+        """Encrypt one shard into a new file and return its name."""
+        name = self._shard_file(index)
+        # Binding the file name stops shard files from being swapped around.
+        data = self.encryption_manager.encrypt_data(json.dumps(self.shards[index]), name.encode())
+        atomic_write(os.path.join(self.shard_dir, name), data)
+        return name
+    
+    def _write_manifest(self):
+        """Encrypt and atomically replace the manifest."""
+        manifest = {
+            'check': CHECK_VALUE,
+            'generation': self.generation,
+            'shards': self.files
+        }
+        header = pack_header(SHARD_MAGIC, SHARD_VERSION, self.encryption_manager.header_params())
+        data = self.encryption_manager.encrypt_data(json.dumps(manifest), MANIFEST_AAD)
+        atomic_write(self.path, header + data)
+    
+    def _remove_stale_files(self):
+        """Delete shard files the manifest no longer references."""
+        current = set(self.files)
+        for name in os.listdir(self.shard_dir):
+            if name not in current:
+                try:
+                    os.remove(os.path.join(self.shard_dir, name))
+                except OSError:
+                    pass
+    
+    def _save(self, indexes: List[int]):
+        """Write the given shards and publish them through a new manifest."""
+        started = time.perf_counter()
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.generation += 1
+        for index in indexes:
+            self.files[index] = self._write_shard(index)
+        self._write_manifest()
+        self._remove_stale_files()
+        self.last_save_duration = time.perf_counter() - started
+        self.last_save_shards = len(indexes)
+    
+    def rewrite(self, notes: List[Tuple[str, Dict, str]]) -> Dict[str, int]:
+        """Write every shard from scratch with the given (id, meta, content) notes."""
+        with self.lock:
+            self.version = SHARD_VERSION
+            self.shards = [{} for _ in range(self.shard_count)]
+            self.files = [None] * self.shard_count
+            for note_id, meta, content in notes:
+                self.shards[shard_for(note_id, self.shard_count)][note_id] = dict(meta, content=content)
+            self._save(list(range(self.shard_count)))
+            return {}
+    
+    def rebalance(self, shard_count: int):
+        """Redistribute all notes over a different number of shards."""
+        with self.lock:
+            notes = [
+                (note_id, note_data, note_data.get('content'))
+                for shard in self.shards
+                for note_id, note_data in shard.items()
+            ]
+            self.shard_count = shard_count
+            self.rewrite(notes)
+    
+    def _read_shard(self, name: str) -> bytes:
+        """Read one encrypted shard file."""
+        with open(os.path.join(self.shard_dir, name), 'rb') as f:
+            return f.read()
+    
+    def load(self) -> Dict[str, Dict]:
+        """Decrypt the manifest, then the shards (in parallel when large)."""
+        with self.lock:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            
+            magic, version, _, header_size = parse_header(data)
+            if magic != SHARD_MAGIC or version > SHARD_VERSION:
+                raise ValueError(f"Unsupported shard manifest version: {version}")
+            self.version = version
+            legacy = version < 2
+            if legacy:
+                manifest = json.loads(self.encryption_manager.decrypt_legacy(data[header_size:]))
+            else:
+                manifest = json.loads(self.encryption_manager.decrypt_data(
+                    memoryview(data)[header_size:], MANIFEST_AAD
+                ))
+            if manifest.get('check') != CHECK_VALUE:
+                raise ValueError("Shard manifest check mismatch")
+            
+            self.generation = manifest['generation']
+            self.files = manifest['shards']
+            self.shard_count = len(self.files)
+            self.shards = self.decryptor.decrypt_json(
+                self.encryption_manager,
+                [(self._read_shard(name), name.encode()) for name in self.files],
+                legacy=legacy
+            )
+            self._remove_stale_files()
+            
+            notes_data: Dict[str, Dict] = {}
+            for shard in self.shards:
+                notes_data.update(shard)
+            return notes_data
+    
+    def write_key_params(self, params: Dict):
+        """Replace the key slots in the manifest header without touching any shard."""
+        with self.lock:
+            update_key_params(self.path, params)
+    
+    def commit(self, changes: List[Tuple], atomic: bool = False) -> List[Optional[int]]:
+        """Apply (note_id, action, meta, content, body_ref) changes.
+        
+        Only the shards touched by the changes are re-encrypted. Every save
+        is published by a single manifest swap, so it is always atomic.
+        """
+        with self.lock:
+            updated: Dict[int, Dict[str, Dict]] = {}
+            for note_id, action, meta, content, _ in changes:
+                index = shard_for(note_id, self.shard_count)
+                if index not in updated:
+                    updated[index] = dict(self.shards[index])
+                if action == "delete":
+                    updated[index].pop(note_id, None)
+                else:
+                    updated[index][note_id] = dict(meta, content=content)
+            
+            previous = {index: self.shards[index] for index in updated}
+            previous_files = list(self.files)
+            for index, shard in updated.items():
+                self.shards[index] = shard
+            try:
+                self._save(sorted(updated))
+            except Exception:
+                for index, shard in previous.items():
+                    self.shards[index] = shard
+                self.files = previous_files
+                raise
+            return [None] * len(changes)
+    
+    def dead_bytes(self) -> int:
+        """Shards are rewritten whole, so they never hold dead bytes."""
+        return 0
+    
+    def dead_ratio(self) -> float:
+        """Shards are rewritten whole, so they never hold dead bytes."""
+        return 0.0
+    
+    def compact(self):
+        """Nothing to compact in sharded mode."""
+    
+    def stats(self) -> Dict:
+        """Return size statistics for the manifest and shards."""
+        with self.lock:
+            shard_bytes = [
+                os.path.getsize(os.path.join(self.shard_dir, name)) if name else 0
+                for name in self.files
+            ]
+            total = sum(shard_bytes) + (os.path.getsize(self.path) if self.exists() else 0)
+            return {
+                'file_bytes': total,
+                'live_bytes': total,
+                'dead_bytes': 0,
+                'dead_ratio': 0.0,
+                'compactions': 0,
+                'last_compaction_duration': None,
+                'shard_count': self.shard_count,
+                'shard_bytes': shard_bytes,
+                'last_save_duration': self.last_save_duration,
+                'last_save_shards': self.last_save_shards
+            }
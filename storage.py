@@ -0,0 +1,595 @@
+"""
+Append-only record log backing the encrypted notes vault.
+
+Each mutation is appended to the vault file as its own encrypted record
+instead of re-encrypting every note, so saving costs O(note size).
+
+A note is stored as two records: a body record holding its content and a
+metadata record holding its title, tags, timestamps and the sequence number
+of its body. Unlock only decrypts metadata records; bodies are decrypted on
+demand through ``read_body``.
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+from encryption import Buffer
+from parallel_unlock import ParallelDecryptor
+
+LOG_MAGIC = b"NVLOG"
+# v1: base64 Fernet records, salt in a side file
+# v2: binary AES-GCM records, KDF parameters in the file header
+# v3: records under a random data key, wrapped per credential in header key blocks
+LOG_VERSION = 3
+
+KIND_CHECK = 1
+KIND_PUT = 2        # full note in one record (written by older versions)
+KIND_DELETE = 3
+KIND_META = 4
+KIND_BODY = 5
+KIND_BEGIN = 6      # start of an all-or-nothing batch
+KIND_COMMIT = 7     # end of a batch; without it the batch is discarded
+
+# magic, format version
+FILE_HEADER = struct.Struct(">5sB")
+# length of the JSON header parameters that follow FILE_HEADER (v2)
+HEADER_PARAMS = struct.Struct(">H")
+# write counter, CRC32 and length of the JSON parameters in a key block (v3+)
+KEY_BLOCK = struct.Struct(">QIH")
+# Two fixed-size key blocks follow FILE_HEADER; updates alternate between them
+KEY_BLOCK_SIZE = 4096
+# record kind, sequence number, payload length
+RECORD_HEADER = struct.Struct(">BQI")
+# associated data binding each record's ciphertext to its kind and position
+RECORD_AAD = struct.Struct(">BQ")
+
+CHECK_VALUE = "notes-vault-log"
+
+Span = Tuple[int, int]
+
+
+def atomic_write(path: str, data: bytes, suffix: str = ".tmp"):
+    """Write data to a temporary file and swap it into place."""
+    tmp_path = path + suffix
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def scan_records(data: bytes, start: int) -> Tuple[List[Tuple[int, int, int, int]], int]:
+    """Split raw log bytes into (kind, seq, offset, length) entries.
+    
+    Returns the entries and the offset where the last complete record ends,
+    so a record torn by a crash mid-append can be discarded.
+    """
+    entries = []
+    offset = start
+    total = len(data)
+    while offset + RECORD_HEADER.size <= total:
+        kind, seq, length = RECORD_HEADER.unpack_from(data, offset)
+        payload_offset = offset + RECORD_HEADER.size
+        if payload_offset + length > total:
+            break
+        entries.append((kind, seq, payload_offset, length))
+        offset = payload_offset + length
+    return entries, offset
+
+
+def pack_key_block(counter: int, params: Dict) -> bytes:
+    """Encode header parameters (key slots) into one fixed-size key block."""
+    encoded = json.dumps(params).encode()
+    if KEY_BLOCK.size + len(encoded) > KEY_BLOCK_SIZE:
+        raise ValueError("Too many key slots for the vault header")
+    block = KEY_BLOCK.pack(counter, zlib.crc32(encoded), len(encoded)) + encoded
+    return block.ljust(KEY_BLOCK_SIZE, b"\0")
+
+
+def active_key_block(data: Buffer) -> Tuple[int, int, Dict]:
+    """Find the newest intact key block: (index, counter, params)."""
+    best = None
+    for index in range(2):
+        start = FILE_HEADER.size + index * KEY_BLOCK_SIZE
+        if len(data) < start + KEY_BLOCK_SIZE:
+            break
+        counter, crc, length = KEY_BLOCK.unpack_from(data, start)
+        encoded = bytes(data[start + KEY_BLOCK.size:start + KEY_BLOCK.size + length])
+        if not length or zlib.crc32(encoded) != crc:
+            # Never written, or torn by a crash while being updated.
+            continue
+        if best is None or counter > best[1]:
+            best = (index, counter, json.loads(encoded))
+    if best is None:
+        raise ValueError("Vault header key blocks are corrupt")
+    return best
+
+
+def pack_header(magic: bytes, version: int, params: Dict) -> bytes:
+    """Build a vault file header carrying JSON parameters (key slots).
+    
+    The parameters go in the first key block; the second stays empty until
+    the first update_key_params.
+    """
+    return (FILE_HEADER.pack(magic, version) + pack_key_block(1, params) +
+            bytes(KEY_BLOCK_SIZE))
+
+
+def parse_header(data: Buffer) -> Tuple[bytes, int, Dict, int]:
+    """Parse a vault file header into (magic, version, params, header size).
+    
+    Version 1 headers carry no parameters.
+    """
+    if len(data) < FILE_HEADER.size:
+        raise ValueError("Vault file is truncated")
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    if version < 2:
+        return magic, version, {}, FILE_HEADER.size
+    
+    if version == 2:
+        (length,) = HEADER_PARAMS.unpack_from(data, FILE_HEADER.size)
+        start = FILE_HEADER.size + HEADER_PARAMS.size
+        params = json.loads(bytes(data[start:start + length]))
+        return magic, version, params, start + length
+    
+    _, _, params = active_key_block(data)
+    return magic, version, params, FILE_HEADER.size + 2 * KEY_BLOCK_SIZE
+
+
+def update_key_params(path: str, params: Dict) -> bytes:
+    """Replace the header parameters of a v3+ vault file in place.
+    
+    The new parameters are written to the inactive key block with a higher
+    counter, so a crash mid-write leaves the previous block in effect. Only
+    the fixed-size header is touched, whatever the size of the vault.
+    Returns the new header bytes.
+    """
+    header_size = FILE_HEADER.size + 2 * KEY_BLOCK_SIZE
+    with open(path, 'r+b') as f:
+        header = bytearray(f.read(header_size))
+        index, counter, _ = active_key_block(header)
+        target = 1 - index
+        block = pack_key_block(counter + 1, params)
+        f.seek(FILE_HEADER.size + target * KEY_BLOCK_SIZE)
+        f.write(block)
+        f.flush()
+        os.fsync(f.fileno())
+    start = FILE_HEADER.size + target * KEY_BLOCK_SIZE
+    header[start:start + KEY_BLOCK_SIZE] = block
+    return bytes(header)
+
+
+def read_header(path: str) -> Optional[Tuple[bytes, int, Dict, int]]:
+    """Read the header of a vault file; None for missing or pre-log vaults."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read(FILE_HEADER.size + HEADER_PARAMS.size + 0xFFFF)
+    if not data.startswith(b"NV"):
+        # Single-blob vaults from before the record log start with a Fernet token.
+        return None
+    return parse_header(data)
+
+
+class RecordLog:
+    """Append-only log of individually encrypted note records."""
+    
+    def __init__(self, path: str, encryption_manager,
+                 decryptor: Optional[ParallelDecryptor] = None):
+        self.path = path
+        self.encryption_manager = encryption_manager
+        self.decryptor = decryptor or ParallelDecryptor()
+        self.version = LOG_VERSION
+        self.header = b""
+        self.next_seq = 0
+        self.end_offset = 0
+        # note_id -> spans (offset, length) of the records holding its latest version
+        self.live: Dict[str, Tuple[Span, ...]] = {}
+        self.live_total = 0
+        # note_id -> sequence number of its body record, and body seq -> span
+        self.note_body: Dict[str, int] = {}
+        self.body_spans: Dict[int, Span] = {}
+        self.check_span: Span = (0, 0)
+        self.lock = threading.RLock()
+        self.compaction_lock = threading.Lock()
+        # Bumped whenever record offsets are rebuilt from scratch
+        self.layout_generation = 0
+        self.last_compaction_duration = None
+        self.compactions = 0
+    
+    def exists(self) -> bool:
+        """Check whether the log file exists."""
+        return os.path.exists(self.path)
+    
+    def has_body(self, body_ref: Optional[int]) -> bool:
+        """Check whether a body record is still stored in the log."""
+        return body_ref in self.body_spans
+    
+    def _encode_record(self, kind: int, plaintext: str) -> Tuple[int, bytes]:
+        """Encrypt a record payload and frame it with its header."""
+        seq = self.next_seq
+        self.next_seq += 1
+        token = self.encryption_manager.encrypt_data(plaintext, RECORD_AAD.pack(kind, seq))
+        return seq, RECORD_HEADER.pack(kind, seq, len(token)) + token
+    
+    def _decrypt_record(self, kind: int, seq: int, token: Buffer) -> str:
+        """Decrypt one record payload in the log's format version."""
+        if self.version < 2:
+            return self.encryption_manager.decrypt_legacy(token)
+        return self.encryption_manager.decrypt_data(token, RECORD_AAD.pack(kind, seq))
+    
+    def encode_put(self, note_id: str, meta: Dict, content: Optional[str],
+                   body_ref: Optional[int] = None) -> List[Tuple]:
+        """Encode the records storing a new version of a note.
+        
+        When content is None the note keeps its existing body record, so
+        metadata-only edits never re-encrypt the body.
+        """
+        records = []
+        if content is not None or body_ref not in self.body_spans:
+            body_ref, data = self._encode_record(KIND_BODY, content or "")
+            records.append((KIND_BODY, note_id, body_ref, data))
+        
+        payload = json.dumps({'id': note_id, 'note': meta, 'body': body_ref})
+        _, data = self._encode_record(KIND_META, payload)
+        records.append((KIND_META, note_id, body_ref, data))
+        return records
+    
+    def encode_delete(self, note_id: str) -> List[Tuple]:
+        """Encode the tombstone record for a deleted note."""
+        _, data = self._encode_record(KIND_DELETE, json.dumps({'id': note_id}))
+        return [(KIND_DELETE, note_id, None, data)]
+    
+    def _apply(self, kind: int, note_id: str, body_ref: Optional[int], span: Span,
+               pending_bodies: Dict[int, Span]):
+        """Update the live-record bookkeeping for one record."""
+        if kind == KIND_BODY:
+            pending_bodies[body_ref] = span
+        elif kind == KIND_META:
+            if body_ref in pending_bodies:
+                body_span = pending_bodies[body_ref]
+            elif body_ref in self.body_spans:
+                body_span = self.body_spans[body_ref]
+            else:
+                raise ValueError(f"Note {note_id} references a missing body")
+            self._drop_live(note_id)
+            self._set_live(note_id, (span, body_span))
+            self.note_body[note_id] = body_ref
+            self.body_spans[body_ref] = body_span
+        elif kind == KIND_PUT:
+            self._drop_live(note_id)
+            self._set_live(note_id, (span,))
+        elif kind == KIND_DELETE:
+            self._drop_live(note_id)
+    
+    def _set_live(self, note_id: str, spans: Tuple[Span, ...]):
+        """Record the spans holding the latest version of a note."""
+        self.live[note_id] = spans
+        self.live_total += sum(length for _, length in spans)
+    
+    def _drop_live(self, note_id: str):
+        """Forget the live spans of a deleted or superseded note."""
+        spans = self.live.pop(note_id, None)
+        if spans is not None:
+            self.live_total -= sum(length for _, length in spans)
+        body_ref = self.note_body.pop(note_id, None)
+        if body_ref is not None:
+            self.body_spans.pop(body_ref, None)
+    
+    def _reset(self):
+        """Clear all live-record bookkeeping."""
+        self.live = {}
+        self.live_total = 0
+        self.note_body = {}
+        self.body_spans = {}
+    
+    def rewrite(self, notes: List[Tuple[str, Dict, str]]) -> Dict[str, int]:
+        """Write a fresh log containing only the given (id, meta, content) notes.
+        
+        Returns the body reference of every written note.
+        """
+        with self.lock:
+            self.next_seq = 0
+            self._reset()
+            self.version = LOG_VERSION
+            self.header = pack_header(LOG_MAGIC, LOG_VERSION,
+                                      self.encryption_manager.header_params())
+            chunks = [self.header]
+            offset = len(self.header)
+            
+            _, record = self._encode_record(KIND_CHECK, json.dumps({'check': CHECK_VALUE}))
+            chunks.append(record)
+            self.check_span = (offset, len(record))
+            offset += len(record)
+            
+            pending_bodies: Dict[int, Span] = {}
+            for note_id, meta, content in notes:
+                for kind, record_note_id, body_ref, record in self.encode_put(note_id, meta, content):
+                    chunks.append(record)
+                    self._apply(kind, record_note_id, body_ref, (offset, len(record)), pending_bodies)
+                    offset += len(record)
+            
+            atomic_write(self.path, b"".join(chunks))
+            self.end_offset = offset
+            self.layout_generation += 1
+            return dict(self.note_body)
+    
+    def load(self) -> Dict[str, Dict]:
+        """Rebuild note dictionaries by replaying the log.
+        
+        Bodies are not decrypted: notes written as metadata/body pairs come
+        back with a ``body_ref`` instead of ``content``.
+        """
+        with self.lock:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+            
+            magic, version, _, header_size = parse_header(data)
+            if magic != LOG_MAGIC or version > LOG_VERSION:
+                raise ValueError(f"Unsupported vault format version: {version}")
+            self.version = version
+            self.header = data[:header_size]
+            # Records are decrypted straight out of this buffer without copying.
+            view = memoryview(data)
+            
+            entries, valid_end = scan_records(data, header_size)
+            entries, valid_end = self._drop_uncommitted(entries, valid_end)
+            if not entries or entries[0][0] != KIND_CHECK:
+                raise ValueError("Vault log is missing its check record")
+            
+            # Compaction may place bodies after the metadata that points at them.
+            bodies = {
+                seq: (offset - RECORD_HEADER.size, length + RECORD_HEADER.size)
+                for kind, seq, offset, length in entries if kind == KIND_BODY
+            }
+            
+            records = [
+                entry for entry in entries
+                if entry[0] not in (KIND_BODY, KIND_BEGIN, KIND_COMMIT)
+            ]
+            # Decrypt the check record alone first so a wrong password fails fast.
+            _, check_seq, check_offset, check_length = records[0]
+            check = json.loads(self._decrypt_record(
+                KIND_CHECK, check_seq, view[check_offset:check_offset + check_length]
+            ))
+            if check.get('check') != CHECK_VALUE:
+                raise ValueError("Vault log check record mismatch")
+            self.check_span = (check_offset - RECORD_HEADER.size, check_length + RECORD_HEADER.size)
+            
+            payloads = self.decryptor.decrypt_json(
+                self.encryption_manager,
+                [
+                    (view[offset:offset + length], RECORD_AAD.pack(kind, seq))
+                    for kind, seq, offset, length in records[1:]
+                ],
+                legacy=self.version < 2
+            )
+            
+            notes_data: Dict[str, Dict] = {}
+            self._reset()
+            self.next_seq = max(seq for _, seq, _, _ in entries) + 1
+            for (kind, seq, offset, length), payload in zip(records[1:], payloads):
+                span = (offset - RECORD_HEADER.size, length + RECORD_HEADER.size)
+                note_id = payload['id']
+                if kind == KIND_DELETE:
+                    notes_data.pop(note_id, None)
+                    self._apply(kind, note_id, None, span, bodies)
+                elif kind == KIND_PUT:
+                    notes_data[note_id] = payload['note']
+                    self._apply(kind, note_id, None, span, bodies)
+                elif kind == KIND_META:
+                    notes_data[note_id] = dict(payload['note'], body_ref=payload['body'])
+                    self._apply(kind, note_id, payload['body'], span, bodies)
+            
+            if valid_end < len(data):
+                # Drop a partially written record left behind by a crash.
+                with open(self.path, 'r+b') as f:
+                    f.truncate(valid_end)
+            self.end_offset = valid_end
+            self.layout_generation += 1
+            return notes_data
+    
+    @staticmethod
+    def _drop_uncommitted(entries: List[Tuple[int, int, int, int]],
+                          valid_end: int) -> Tuple[List[Tuple[int, int, int, int]], int]:
+        """Cut off a trailing batch whose commit record never made it to disk."""
+        for index in range(len(entries) - 1, -1, -1):
+            kind = entries[index][0]
+            if kind == KIND_COMMIT:
+                break
+            if kind == KIND_BEGIN:
+                return entries[:index], entries[index][2] - RECORD_HEADER.size
+        return entries, valid_end
+    
+    def _marker(self, kind: int) -> bytes:
+        """Frame an empty batch marker record."""
+        seq = self.next_seq
+        self.next_seq += 1
+        return RECORD_HEADER.pack(kind, seq, 0)
+    
+    def write(self, records: List[Tuple], atomic: bool = False):
+        """Append encoded records with a single write and fsync.
+        
+        With atomic=True the records are wrapped in begin/commit markers so
+        a crash mid-write discards the whole batch on the next replay.
+        """
+        with self.lock:
+            if atomic:
+                records = ([(KIND_BEGIN, None, None, self._marker(KIND_BEGIN))] + records +
+                           [(KIND_COMMIT, None, None, self._marker(KIND_COMMIT))])
+            offset = self.end_offset
+            chunks = []
+            spans = []
+            for kind, note_id, body_ref, record in records:
+                chunks.append(record)
+                spans.append((kind, note_id, body_ref, (offset, len(record))))
+                offset += len(record)
+            
+            with open(self.path, 'r+b') as f:
+                try:
+                    f.seek(self.end_offset)
+                    f.write(b"".join(chunks))
+                    f.flush()
+                    os.fsync(f.fileno())
+                except OSError:
+                    # Leave neither the bookkeeping nor a partial batch behind.
+                    f.truncate(self.end_offset)
+                    raise
+            
+            # Only records known to be on disk become live.
+            pending_bodies: Dict[int, Span] = {}
+            for kind, note_id, body_ref, span in spans:
+                self._apply(kind, note_id, body_ref, span, pending_bodies)
+            self.end_offset = offset
+    
+    def commit(self, changes: List[Tuple], atomic: bool = False) -> List[Optional[int]]:
+        """Persist (note_id, action, meta, content, body_ref) changes.
+        
+        Returns the body reference of each change (None for deletes).
+        """
+        with self.lock:
+            records = []
+            body_refs = []
+            for note_id, action, meta, content, body_ref in changes:
+                if action == "delete":
+                    records.extend(self.encode_delete(note_id))
+                    body_refs.append(None)
+                else:
+                    note_records = self.encode_put(note_id, meta, content, body_ref)
+                    records.extend(note_records)
+                    body_refs.append(note_records[-1][2])
+            self.write(records, atomic=atomic)
+            return body_refs
+    
+    def write_key_params(self, params: Dict):
+        """Replace the key slots in the header without touching any record."""
+        with self.lock:
+            self.header = update_key_params(self.path, params)
+    
+    def read_body(self, body_ref: int) -> str:
+        """Read and decrypt a single note body."""
+        with self.lock:
+            span = self.body_spans.get(body_ref)
+            if span is None:
+                raise KeyError(f"Note body {body_ref} is no longer stored")
+            offset, length = span
+            with open(self.path, 'rb') as f:
+                f.seek(offset + RECORD_HEADER.size)
+                token = f.read(length - RECORD_HEADER.size)
+        return self._decrypt_record(KIND_BODY, body_ref, token)
+    
+    def live_bytes(self) -> int:
+        """Bytes still needed to reproduce the current notes."""
+        with self.lock:
+            return len(self.header) + self.check_span[1] + self.live_total
+    
+    def dead_bytes(self) -> int:
+        """Bytes taken by superseded versions and tombstones."""
+        with self.lock:
+            return max(0, self.end_offset - self.live_bytes())
+    
+    def dead_ratio(self) -> float:
+        """Fraction of the log that compaction would reclaim."""
+        with self.lock:
+            if not self.end_offset:
+                return 0.0
+            return self.dead_bytes() / self.end_offset
+    
+    def stats(self) -> Dict:
+        """Return size and compaction statistics for the log."""
+        with self.lock:
+            return {
+                'file_bytes': self.end_offset,
+                'live_bytes': self.live_bytes(),
+                'dead_bytes': self.dead_bytes(),
+                'dead_ratio': self.dead_ratio(),
+                'compactions': self.compactions,
+                'last_compaction_duration': self.last_compaction_duration
+            }
+    
+    def compact(self):
+        """Compact the log, waiting for any compaction already running."""
+        with self.compaction_lock:
+            self._compact()
+    
+    def _compact(self):
+        """Copy live records into a fresh segment and swap it in atomically.
+        
+        Records are copied as ciphertext, so no re-encryption is needed. The
+        lock is only held to snapshot the live set and to splice in records
+        appended while the new segment was being written. Metadata records
+        are grouped ahead of bodies so unlock reads them from one region.
+        """
+        started = time.perf_counter()
+        with self.lock:
+            snapshot = dict(self.live)
+            check_span = self.check_span
+            snapshot_end = self.end_offset
+            generation = self.layout_generation
+        
+        # Old offset -> new offset for every copied record.
+        moved: Dict[int, int] = {}
+        chunks = [self.header]
+        offset = len(self.header)
+        ordered = [check_span]
+        ordered += sorted(spans[0] for spans in snapshot.values())
+        ordered += sorted(spans[1] for spans in snapshot.values() if len(spans) > 1)
+        with open(self.path, 'rb') as f:
+            for old_offset, length in ordered:
+                f.seek(old_offset)
+                chunks.append(f.read(length))
+                moved[old_offset] = offset
+                offset += length
+        segment_end = offset
+        
+        tmp_path = self.path + ".compact"
+        out = open(tmp_path, 'wb')
+        try:
+            out.write(b"".join(chunks))
+            
+            with self.lock:
+                if self.layout_generation != generation:
+                    # The log was rewritten or reloaded underneath us.
+                    return
+                
+                with open(self.path, 'rb') as f:
+                    f.seek(snapshot_end)
+                    tail = f.read(self.end_offset - snapshot_end)
+                out.write(tail)
+                # Pick up key slots changed while the segment was being written.
+                out.seek(0)
+                out.write(self.header)
+                out.flush()
+                os.fsync(out.fileno())
+                out.close()
+                os.replace(tmp_path, self.path)
+                
+                shift = segment_end - snapshot_end
+                
+                def relocate(span: Span) -> Span:
+                    old_offset, length = span
+                    if old_offset >= snapshot_end:
+                        return (old_offset + shift, length)
+                    return (moved[old_offset], length)
+                
+                self.live = {
+                    note_id: tuple(relocate(span) for span in spans)
+                    for note_id, spans in self.live.items()
+                }
+                self.body_spans = {
+                    body_ref: self.live[note_id][1]
+                    for note_id, body_ref in self.note_body.items()
+                }
+                self.check_span = relocate(self.check_span)
+                self.end_offset = segment_end + len(tail)
+                self.layout_generation += 1
+                self.last_compaction_duration = time.perf_counter() - started
+                self.compactions += 1
+        finally:
+            if not out.closed:
+                out.close()
+                os.remove(tmp_path)
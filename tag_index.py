@@ -0,0 +1,67 @@
+"""
+Tag index for the notes vault.
+
+Maps every tag to the set of notes carrying it, so facet counts are a
+dictionary lookup and tag filters are set algebra instead of a scan over
+every note. Tags are matched case-insensitively; the index keys are the
+lowercased, interned tag strings, shared by every note with that tag.
+
+Tag queries such as ``tag:python AND NOT tag:archived`` are parsed by
+query.py like any other search and answered from this index.
+"""
+
+import sys
+from typing import Dict, Iterable, Set, Tuple
+
+
+def normalize_tag(tag: str) -> str:
+    """Index key of a tag: stripped, lowercased and interned."""
+    return sys.intern(tag.strip().lower())
+
+
+class TagIndex:
+    """Tag -> note id sets, kept in step with the vault's notes."""
+    
+    def __init__(self):
+        # tag -> notes carrying it
+        self.notes_by_tag: Dict[str, Set[str]] = {}
+        # note_id -> its indexed tags
+        self.tags_by_note: Dict[str, Tuple[str, ...]] = {}
+    
+    def set_tags(self, note_id: str, tags: Iterable[str]):
+        """Index (or re-index) the tags of one note."""
+        self.remove_note(note_id)
+        keys = tuple(dict.fromkeys(normalize_tag(tag) for tag in tags if tag.strip()))
+        self.tags_by_note[note_id] = keys
+        for tag in keys:
+            self.notes_by_tag.setdefault(tag, set()).add(note_id)
+    
+    def remove_note(self, note_id: str):
+        """Drop a note from the index."""
+        for tag in self.tags_by_note.pop(note_id, ()):
+            notes = self.notes_by_tag[tag]
+            notes.discard(note_id)
+            if not notes:
+                del self.notes_by_tag[tag]
+    
+    def rebuild(self, notes: Dict):
+        """Index every note of a note_id -> Note mapping from scratch."""
+        self.__init__()
+        for note_id, note in notes.items():
+            self.set_tags(note_id, note.tags)
+    
+    def count(self, tag: str) -> int:
+        """Number of notes carrying a tag."""
+        return len(self.notes_by_tag.get(normalize_tag(tag), ()))
+    
+    def counts(self) -> Dict[str, int]:
+        """Number of notes per tag, most used first."""
+        return dict(sorted(
+            ((tag, len(notes)) for tag, notes in self.notes_by_tag.items()),
+            key=lambda item: (-item[1], item[0])
+        ))
+    
+    def notes_with(self, tag: str) -> Set[str]:
+        """Ids of the notes carrying a tag (do not modify)."""
+        return self.notes_by_tag.get(normalize_tag(tag), set())
+    
\ No newline at end of file
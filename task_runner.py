@@ -0,0 +1,193 @@
+"""
+Background tasks for the Tk GUI.
+
+Unlocking, saving and searching a large vault take long enough to freeze
+the window when run on the Tk main thread. A TaskRunner runs them on one
+worker thread instead (one, so vault operations never overlap each other)
+and hands results back to the main thread: Tk widgets may only be touched
+from the thread running mainloop, so finished tasks are queued and a poll
+scheduled with the toolkit's ``after`` delivers them.
+
+Every task has a kind ("unlock", "save", "search", ...). Submitting a task
+supersedes earlier tasks of the same kind: those not started yet are
+cancelled, and the results of those already running are dropped when
+they arrive, so a slow, stale search can never overwrite a newer one.
+"""
+
+import queue
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+POLL_INTERVAL_MS = 50
+
+
+class Task:
+    """A submitted piece of work and the callbacks for its outcome."""
+    
+    def __init__(self, token: int, kind: str, description: str,
+                 on_done: Optional[Callable[[Any], None]],
+                 on_error: Callable[[Exception], None]):
+        self.token = token
+        self.kind = kind
+        self.description = description
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future: Optional[Future] = None
+
+
+class TaskRunner:
+    """Runs work on a worker thread and delivers results through a scheduler.
+    
+    schedule(delay_ms, callback) must run callback on the UI thread after
+    delay_ms, as Tk's ``root.after`` does. on_busy_change is called (on the
+    UI thread) with the description of the oldest unfinished task, or None
+    once there is nothing left to do.
+    """
+    
+    def __init__(self, schedule: Callable[[int, Callable[[], None]], Any],
+                 on_busy_change: Optional[Callable[[Optional[str]], None]] = None,
+                 poll_interval_ms: int = POLL_INTERVAL_MS):
+        self.schedule = schedule
+        self.on_busy_change = on_busy_change
+        self.poll_interval_ms = poll_interval_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-task")
+        # (token, result, error) of finished tasks, filled by the worker
+        self.finished: queue.Queue = queue.Queue()
+        self.tasks: Dict[int, Task] = {}
+        # kind -> token of the newest task of that kind
+        self.latest: Dict[str, int] = {}
+        self.tokens = itertools.count(1)
+        self.polling = False
+        self.busy: Optional[str] = None
+        self.dropped = 0
+    
+    def submit(self, kind: str, work: Callable[[], Any],
+               on_done: Optional[Callable[[Any], None]],
+               on_error: Callable[[Exception], None],
+               description: str = "Working") -> int:
+        """Run work() on the worker, superseding earlier tasks of the same kind.
+        
+        on_done(result) or on_error(exception) is called on the UI thread
+        unless the task was superseded or cancelled first; every task must
+        say how its failure is reported. Returns the task's token.
+        """
+        self.cancel(kind)
+        token = next(self.tokens)
+        task = Task(token, kind, description, on_done, on_error)
+        self.tasks[token] = task
+        self.latest[kind] = token
+        task.future = self.executor.submit(self._run, token, work)
+        self._update_busy()
+        if not self.polling:
+            self.polling = True
+            self.schedule(self.poll_interval_ms, self.poll)
+        return token
+    
+    def _run(self, token: int, work: Callable[[], Any]):
+        """Worker side: run the work and queue its outcome."""
+        try:
+            self.finished.put((token, work(), None))
+        except Exception as e:
+            self.finished.put((token, None, e))
+    
+    def cancel(self, kind: str):
+        """Cancel the pending tasks of a kind; running ones finish but are ignored."""
+        self.latest.pop(kind, None)
+        for task in list(self.tasks.values()):
+            if task.kind == kind and task.future.cancel():
+                del self.tasks[task.token]
+                self.dropped += 1
+    
+    def is_current(self, token: int) -> bool:
+        """Whether a task is still the newest of its kind (safe from any thread)."""
+        task = self.tasks.get(token)
+        return task is not None and self.latest.get(task.kind) == token
+    
+    def pending(self) -> int:
+        """Number of submitted tasks whose outcome has not been delivered."""
+        return len(self.tasks)
+    
+    def poll(self):
+        """Deliver finished tasks; reschedules itself while tasks are pending."""
+        while True:
+            try:
+                token, result, error = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            current = self.is_current(token)
+            task = self.tasks.pop(token, None)
+            if task is None:
+                continue
+            if not current:
+                self.dropped += 1
+                continue
+            del self.latest[task.kind]
+            if error is not None:
+                task.on_error(error)
+            elif task.on_done is not None:
+                task.on_done(result)
+        
+        self._update_busy()
+        if self.tasks:
+            self.schedule(self.poll_interval_ms, self.poll)
+        else:
+            self.polling = False
+    
+    def _update_busy(self):
+        busy = None
+        for task in self.tasks.values():
+            if self.latest.get(task.kind) == task.token:
+                busy = task.description
+                break
+        if busy != self.busy:
+            self.busy = busy
+            if self.on_busy_change is not None:
+                self.on_busy_change(busy)
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the worker after the work already submitted."""
+        self.executor.shutdown(wait=wait)
+
+
+class Debouncer:
+    """Calls back once triggers have stopped arriving for delay_ms.
+    
+    schedule(delay_ms, callback) and cancel(handle) are Tk's ``root.after``
+    and ``root.after_cancel`` (or equivalents returning and taking a
+    handle). Each trigger restarts the wait, so a burst of keystrokes
+    results in a single call.
+    """
+    
+    def __init__(self, schedule: Callable[[int, Callable[[], None]], Any],
+                 cancel: Callable[[Any], None], delay_ms: int, callback: Callable[[], None]):
+        self.schedule = schedule
+        self.cancel_scheduled = cancel
+        self.delay_ms = delay_ms
+        self.callback = callback
+        self.handle = None
+        self.triggers = 0
+        self.calls = 0
+    
+    def trigger(self):
+        """(Re)start the wait before calling back."""
+        self.triggers += 1
+        self.cancel()
+        self.handle = self.schedule(self.delay_ms, self._fire)
+    
+    def cancel(self):
+        """Forget a pending call."""
+        if self.handle is not None:
+            self.cancel_scheduled(self.handle)
+            self.handle = None
+    
+    def flush(self):
+        """Call back now if a call is pending."""
+        if self.handle is not None:
+            self.cancel()
+            self._fire()
+    
+    def _fire(self):
+        self.handle = None
+        self.calls += 1
+        self.callback()
@@ -0,0 +1,88 @@
+"""
+Tests for the unlock agent over a real Unix socket: caching, forgetting
+and expiring keys, and clients refusing agents they cannot trust.
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import agent
+from agent import AgentClient, UnlockAgent
+
+KEY = bytes(range(32))
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+class AgentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, "agent", "agent.sock")
+        self.agent = UnlockAgent(self.socket_path, ttl=60)
+        self.agent.start()
+        self.client = AgentClient(self.socket_path)
+        self.vault = os.path.join(self.directory, "vault.enc")
+    
+    def tearDown(self):
+        self.agent.stop()
+        deadline = time.monotonic() + 5
+        while os.path.exists(self.socket_path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        shutil.rmtree(self.directory)
+    
+    def test_socket_directory_is_private(self):
+        info = os.lstat(os.path.dirname(self.socket_path))
+        self.assertEqual(info.st_mode & 0o777, 0o700)
+        self.assertEqual(info.st_uid, os.getuid())
+    
+    def test_put_get_forget(self):
+        self.assertTrue(self.client.ping())
+        self.assertIsNone(self.client.get_key(self.vault))
+        self.assertTrue(self.client.put_key(self.vault, KEY))
+        self.assertEqual(self.client.get_key(self.vault), KEY)
+        self.assertEqual(self.client.status()['vaults'], [agent.vault_id(self.vault)])
+        
+        self.assertTrue(self.client.forget(self.vault))
+        self.assertIsNone(self.client.get_key(self.vault))
+        
+        self.assertTrue(self.client.put_key(self.vault, KEY))
+        self.assertTrue(self.client.lock())
+        self.assertEqual(self.client.status()['vaults'], [])
+    
+    def test_idle_keys_expire(self):
+        self.agent.ttl = 0.2
+        self.assertTrue(self.client.put_key(self.vault, KEY))
+        self.assertEqual(self.client.get_key(self.vault), KEY)
+        time.sleep(0.4)
+        self.assertIsNone(self.client.get_key(self.vault))
+    
+    def test_refuses_directory_others_can_enter(self):
+        os.chmod(os.path.dirname(self.socket_path), 0o755)
+        self.assertFalse(self.client.put_key(self.vault, KEY))
+        self.assertEqual(self.agent.keys, {})
+    
+    def test_refuses_directory_owned_by_another_user(self):
+        with mock.patch("agent.os.getuid", return_value=os.getuid() + 1):
+            self.assertFalse(self.client.put_key(self.vault, KEY))
+        self.assertEqual(self.agent.keys, {})
+    
+    def test_refuses_symlinked_directory(self):
+        link = os.path.join(self.directory, "link")
+        os.symlink(os.path.dirname(self.socket_path), link)
+        client = AgentClient(os.path.join(link, "agent.sock"))
+        self.assertFalse(client.put_key(self.vault, KEY))
+        self.assertEqual(self.agent.keys, {})
+    
+    def test_refuses_agent_of_another_user(self):
+        with mock.patch("agent.peer_uid", return_value=os.getuid() + 1):
+            self.assertFalse(self.client.put_key(self.vault, KEY))
+        self.assertEqual(self.agent.keys, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
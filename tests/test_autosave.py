@@ -0,0 +1,99 @@
+"""
+Tests for editor autosave timing, with a fake clock and scheduler in
+place of time.monotonic and Tk's ``after``.
+"""
+
+import unittest
+
+from autosave import Autosaver
+
+
+class FakeTimers:
+    """A clock and a one-shot scheduler that only move when told to."""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.timers = {}
+        self.handles = 0
+    
+    def clock(self):
+        return self.now
+    
+    def schedule(self, delay_ms, callback):
+        self.handles += 1
+        self.timers[self.handles] = (self.now + delay_ms / 1000, callback)
+        return self.handles
+    
+    def cancel(self, handle):
+        del self.timers[handle]
+    
+    def advance(self, ms):
+        """Move the clock on, running timers at the moment they come due."""
+        end = self.now + ms / 1000
+        while self.timers:
+            handle, (due, callback) = min(self.timers.items(), key=lambda item: item[1][0])
+            if due > end:
+                break
+            del self.timers[handle]
+            self.now = due
+            callback()
+        self.now = end
+
+
+class AutosaverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timers = FakeTimers()
+        self.saved_at = []
+        self.saves_succeed = True
+        self.autosaver = Autosaver(self.timers.schedule, self.timers.cancel, self.save,
+                                   idle_ms=1000, max_latency_ms=5000, clock=self.timers.clock)
+    
+    def save(self):
+        self.saved_at.append(round(self.timers.now, 3))
+        return self.saves_succeed
+    
+    def type_for(self, ms, every_ms=250):
+        for _ in range(ms // every_ms):
+            self.autosaver.changed()
+            self.timers.advance(every_ms)
+    
+    def test_saves_once_edits_pause(self):
+        self.type_for(750)
+        self.assertEqual(self.saved_at, [])
+        self.assertTrue(self.autosaver.dirty)
+        self.timers.advance(1000)
+        self.assertEqual(self.saved_at, [1.5])
+        self.assertFalse(self.autosaver.dirty)
+        self.assertEqual(self.autosaver.stats(),
+                         {'edits': 3, 'saves': 1, 'saves_avoided': 2, 'dirty': False})
+    
+    def test_continuous_typing_saves_at_max_latency(self):
+        self.type_for(12000)
+        self.assertEqual(self.saved_at, [5.0, 10.0])
+        self.assertEqual(self.autosaver.stats()['saves'], 2)
+    
+    def test_flush_and_discard(self):
+        self.assertFalse(self.autosaver.flush())
+        self.autosaver.changed()
+        self.assertTrue(self.autosaver.flush())
+        self.assertEqual(self.timers.timers, {})
+        
+        self.autosaver.changed()
+        self.autosaver.discard()
+        self.timers.advance(10000)
+        self.assertEqual(len(self.saved_at), 1)
+        self.assertTrue(self.autosaver.flush(force=True))
+        self.assertEqual(len(self.saved_at), 2)
+    
+    def test_failed_saves_are_not_counted(self):
+        self.saves_succeed = False
+        self.autosaver.changed()
+        self.timers.advance(1000)
+        self.assertEqual(len(self.saved_at), 1)
+        self.assertEqual(self.autosaver.stats()['saves'], 0)
+        self.assertFalse(self.autosaver.dirty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for compacting the record log, alone and with writes arriving
+while it runs.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+def snapshot(vault: NotesVault):
+    """Everything a note holds, by id."""
+    return {
+        note_id: (note.title, note.content, note.tags, note.created_us, note.modified_us)
+        for note_id, note in vault.notes.items()
+    }
+
+
+class CompactionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self) -> NotesVault:
+        # Uncalibrated KDF parameters keep the tests fast.
+        return NotesVault(self.path, kdf_target_seconds=None)
+    
+    def reopen(self) -> NotesVault:
+        self.vault.lock_vault()
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        return self.vault
+    
+    def test_compaction_keeps_latest_versions(self):
+        note_id = self.vault.add_note(Note("note", "v0"))
+        for version in range(1, 30):
+            self.vault.update_note(note_id, Note("note", f"v{version}" * 100))
+        before = os.path.getsize(self.path)
+        expected = snapshot(self.vault)
+        
+        self.vault.compact()
+        self.assertLess(os.path.getsize(self.path), before)
+        self.assertEqual(self.vault.compaction_stats()['dead_bytes'], 0)
+        self.vault.body_cache.clear()
+        self.assertEqual(snapshot(self.vault), expected)
+        self.assertEqual(snapshot(self.reopen()), expected)
+    
+    def test_background_compaction_starts_at_threshold(self):
+        self.vault.compaction_min_bytes = 4096
+        note_id = self.vault.add_note(Note("note", "x" * 1000))
+        self.vault.update_note(note_id, Note("note", "y" * 1000))
+        self.assertIsNone(self.vault._compaction_thread)
+        
+        for version in range(10):
+            self.vault.update_note(note_id, Note("note", f"{version}" * 1000))
+        self.vault._compaction_thread.join(10)
+        self.assertGreaterEqual(self.vault.compaction_stats()['compactions'], 1)
+        self.assertLess(self.vault.store.dead_ratio(), self.vault.compaction_threshold)
+        self.assertEqual(self.reopen().notes[note_id].content, "9" * 1000)
+    
+    def test_compaction_splices_concurrent_writes(self):
+        ids = self.vault.add_notes([Note(f"note {i}", "old " * 50) for i in range(10)])
+        for note_id in ids:
+            self.vault.update_note(note_id, Note("superseded", "x" * 200))
+        
+        real_open = open
+        wrote = []
+        
+        def open_and_write(path, mode="r", *args, **kwargs):
+            # Append while the new segment is being written, outside the log lock.
+            if str(path).endswith(".compact") and not wrote:
+                wrote.append(True)
+                self.vault.update_note(ids[0], Note("during compaction", "spliced"))
+                self.vault.delete_note(ids[1])
+                self.vault.add_note(Note("added during compaction", "also spliced"))
+            return real_open(path, mode, *args, **kwargs)
+        
+        with mock.patch("storage.open", side_effect=open_and_write, create=True):
+            self.vault.compact()
+        self.assertTrue(wrote)
+        expected = snapshot(self.vault)
+        
+        self.vault.body_cache.clear()
+        self.assertEqual(snapshot(self.vault), expected)
+        vault = self.reopen()
+        self.assertEqual(snapshot(vault), expected)
+        self.assertEqual(vault.notes[ids[0]].content, "spliced")
+        self.assertNotIn(ids[1], vault.notes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the AES-GCM record encryption and the binary vault format.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cryptography.exceptions import InvalidTag
+
+import storage
+from encryption import EncryptionManager, NONCE_SIZE
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+class EncryptionManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.encryption_manager = EncryptionManager()
+        self.encryption_manager.set_key(os.urandom(32))
+    
+    def test_round_trip_from_a_buffer_slice(self):
+        blob = self.encryption_manager.encrypt_data("héllo", b"aad")
+        # Raw nonce and GCM tag, no base64.
+        self.assertEqual(len(blob), NONCE_SIZE + len("héllo".encode()) + 16)
+        view = memoryview(b"prefix" + blob)[len(b"prefix"):]
+        self.assertEqual(self.encryption_manager.decrypt_data(view, b"aad"), "héllo")
+    
+    def test_associated_data_must_match(self):
+        blob = self.encryption_manager.encrypt_data("secret", b"record 1")
+        with self.assertRaises(InvalidTag):
+            self.encryption_manager.decrypt_data(blob, b"record 2")
+    
+    def test_needs_a_key(self):
+        with self.assertRaises(ValueError):
+            EncryptionManager().encrypt_data("secret")
+
+
+class VaultFormatTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(vault.create_vault(PASSWORD))
+        vault.add_note(Note("first secret title", "first body"))
+        vault.add_note(Note("second secret title", "second body"))
+        vault.lock_vault()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_file_layout(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        magic, version, _, header_size = storage.parse_header(data)
+        self.assertEqual((magic, version), (storage.LOG_MAGIC, storage.LOG_VERSION))
+        self.assertNotIn(b"secret", data)
+        _, end = storage.scan_records(data, header_size)
+        self.assertEqual(end, len(data))
+    
+    def test_swapped_records_fail_authentication(self):
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            _, _, _, header_size = storage.parse_header(data)
+            entries, _ = storage.scan_records(data, header_size)
+            first, second = [entry for entry in entries if entry[0] == storage.KIND_META]
+            # Exchange the sequence numbers the two records are bound to.
+            for (kind, _, offset, length), (_, seq, _, _) in ((first, second), (second, first)):
+                f.seek(offset - storage.RECORD_HEADER.size)
+                f.write(storage.RECORD_HEADER.pack(kind, seq, length))
+        
+        vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertFalse(vault.unlock_vault(PASSWORD))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Tests for typo-tolerant search through the deletion index.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fuzzy_index import DeletionIndex, allowed_edits, edit_distance
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+class EditDistanceTestCase(unittest.TestCase):
+
+    def test_distances(self):
+        cases = [("budget", "budget", 0), ("budget", "budgte", 1), ("budget", "bugdet", 1),
+                 ("budget", "budge", 1), ("budget", "bdgets", 2), ("kitten", "sitting", 3)]
+        for a, b, distance in cases:
+            with self.subTest(a=a, b=b):
+                self.assertEqual(edit_distance(a, b, 3), distance)
+    
+    def test_stops_at_the_limit(self):
+        self.assertEqual(edit_distance("kitten", "sitting", 1), 2)
+        self.assertEqual(edit_distance("a", "abcdef", 2), 3)
+    
+    def test_allowed_edits_grow_with_length(self):
+        self.assertEqual([allowed_edits(term, 2) for term in ("cat", "cats", "budget", "meetings")],
+                         [1, 1, 1, 2])
+
+
+class DeletionIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = DeletionIndex()
+        for word in ("budget", "budgets", "bucket", "meeting", "greeting", "python"):
+            self.index.add(word)
+    
+    def brute_force(self, term: str, max_edits: int):
+        words = ("budget", "budgets", "bucket", "meeting", "greeting", "python")
+        return sorted((word, edit_distance(term, word, max_edits)) for word in words
+                      if edit_distance(term, word, max_edits) <= max_edits)
+    
+    def test_lookup_matches_brute_force(self):
+        for term, max_edits in (("budgte", 2), ("meetnig", 2), ("pyhton", 1), ("bucket", 1), ("zzz", 2)):
+            with self.subTest(term=term):
+                self.assertEqual(sorted(self.index.lookup(term, max_edits)),
+                                 self.brute_force(term, max_edits))
+    
+    def test_removed_words_are_not_found(self):
+        self.index.remove("budgets")
+        self.assertEqual(sorted(self.index.lookup("budgts", 2)), [("budget", 2)])
+        self.assertEqual(self.index.stats()['words'], 5)
+    
+    def test_edit_limit(self):
+        with self.assertRaises(ValueError):
+            self.index.lookup("budget", 3)
+
+
+class FuzzySearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vault = NotesVault(os.path.join(self.directory, "vault.enc"), kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+        self.budget = self.vault.add_note(Note("Budget", "quarterly meeting notes"))
+        self.recipe = self.vault.add_note(Note("Recipe", "tomato soup"))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def found(self, query: str, max_edits: int = 2):
+        return [note_id for note_id, _ in self.vault.search_notes(query, fuzzy=True, max_edits=max_edits)]
+    
+    def test_typos_still_match(self):
+        self.assertIsNone(self.vault.fuzzy_index_stats())
+        self.assertEqual(self.found("quartelry meetnig"), [self.budget])
+        self.assertEqual(self.found("tomatoe"), [self.recipe])
+        self.assertEqual(self.found("tomatoe", max_edits=0), [])
+        self.assertEqual(self.found("tomato meetnig"), [])
+        self.assertGreater(self.vault.fuzzy_index_stats()['words'], 0)
+    
+    def test_index_follows_changes(self):
+        self.found("soup")
+        self.vault.update_note(self.recipe, Note("Recipe", "lentil stew"))
+        self.assertEqual(self.found("lentl"), [self.recipe])
+        self.assertEqual(self.found("tomatoe"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
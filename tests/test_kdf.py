@@ -0,0 +1,85 @@
+"""
+Tests for KDF calibration and retuning a vault's key slot.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import kdf
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+@mock.patch.dict(kdf._calibrated, clear=True)
+class CalibrationTestCase(unittest.TestCase):
+
+    def calibrate(self, name: str, elapsed: float, target_seconds: float = 0.25):
+        with mock.patch("kdf.time_derivation", return_value=elapsed) as timed:
+            params = kdf.calibrate(name, target_seconds)
+        return params, timed.call_count
+    
+    def test_pbkdf2_scales_iterations_to_the_target(self):
+        params, _ = self.calibrate("pbkdf2-sha256", 0.01)
+        self.assertEqual(params, {'iterations': 500000})
+    
+    def test_pbkdf2_never_goes_below_the_minimum(self):
+        params, _ = self.calibrate("pbkdf2-sha256", 1.0)
+        self.assertEqual(params, {'iterations': kdf.PBKDF2KDF.MIN_ITERATIONS})
+    
+    def test_scrypt_doubles_n_within_bounds(self):
+        self.assertEqual(self.calibrate("scrypt", 0.1)[0]['n'], 2 ** 15)
+        self.assertEqual(self.calibrate("scrypt", 0.001, 0.5)[0]['n'], kdf.ScryptKDF.MAX_N)
+        self.assertEqual(self.calibrate("scrypt", 1.0, 0.75)[0]['n'], kdf.ScryptKDF.MIN_N)
+    
+    def test_calibration_is_measured_once(self):
+        first, calls = self.calibrate("pbkdf2-sha256", 0.01)
+        self.assertEqual(calls, 1)
+        first['iterations'] = 1
+        second, calls = self.calibrate("pbkdf2-sha256", 5.0)
+        self.assertEqual(calls, 0)
+        self.assertEqual(second, {'iterations': 500000})
+    
+    def test_unknown_kdf(self):
+        with self.assertRaises(ValueError):
+            kdf.get_kdf("md5")
+
+
+class RetuneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+        self.note_id = self.vault.add_note(Note("note", "body"))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def test_new_slots_record_their_kdf(self):
+        slot, = self.vault.kdf_info()
+        self.assertEqual((slot['kdf'], slot['iterations']),
+                         ("pbkdf2-sha256", kdf.PBKDF2KDF.MIN_ITERATIONS))
+        self.assertNotIn('wrapped', slot)
+    
+    def test_retune_to_scrypt(self):
+        self.assertFalse(self.vault.retune_kdf("wrong password", "scrypt"))
+        self.assertEqual(self.vault.kdf_info()[0]['kdf'], "pbkdf2-sha256")
+        
+        self.assertTrue(self.vault.retune_kdf(PASSWORD, "scrypt"))
+        slot, = self.vault.kdf_info()
+        self.assertEqual((slot['kdf'], slot['n']), ("scrypt", kdf.ScryptKDF.MIN_N))
+        self.vault.lock_vault()
+        
+        self.vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        self.assertEqual(self.vault.notes[self.note_id].content, "body")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests for the key slot envelope: passwords, recovery keys and the
+double-buffered key block in the vault header.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from storage import FILE_HEADER, KEY_BLOCK_SIZE
+
+PASSWORD = "correct horse"
+
+
+class KeySlotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        vault = self.open_vault()
+        self.assertTrue(vault.create_vault(PASSWORD))
+        self.note_id = vault.add_note(Note("secret", "the body"))
+        vault.lock_vault()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self, storage: str = "log") -> NotesVault:
+        # Uncalibrated KDF parameters keep the tests fast.
+        return NotesVault(self.path, storage=storage, kdf_target_seconds=None)
+    
+    def unlocks(self, password: str) -> bool:
+        vault = self.open_vault()
+        unlocked = vault.unlock_vault(password)
+        if unlocked:
+            self.assertEqual(vault.notes[self.note_id].content, "the body")
+            vault.lock_vault()
+        return unlocked
+    
+    def test_wrong_password_is_rejected(self):
+        vault = self.open_vault()
+        self.assertFalse(vault.unlock_vault("wrong password"))
+        self.assertFalse(vault.is_unlocked)
+        self.assertEqual(vault.notes, {})
+        with self.assertRaises(ValueError):
+            vault.get_all_notes()
+        self.assertTrue(self.unlocks(PASSWORD))
+    
+    def test_change_master_password(self):
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        self.assertFalse(vault.change_master_password("wrong password", "new password"))
+        self.assertTrue(vault.change_master_password(PASSWORD, "new password"))
+        vault.lock_vault()
+        
+        self.assertFalse(self.unlocks(PASSWORD))
+        self.assertTrue(self.unlocks("new password"))
+    
+    def test_password_change_leaves_records_untouched(self):
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        header_size = FILE_HEADER.size + 2 * KEY_BLOCK_SIZE
+        with open(self.path, "rb") as f:
+            records = f.read()[header_size:]
+        self.assertTrue(vault.change_master_password(PASSWORD, "new password"))
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read()[header_size:], records)
+        vault.lock_vault()
+    
+    def test_recovery_key(self):
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        recovery_key = vault.add_recovery_key()
+        self.assertTrue(recovery_key)
+        vault.lock_vault()
+        
+        self.assertTrue(self.unlocks(recovery_key))
+        self.assertTrue(self.unlocks(PASSWORD))
+        
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(recovery_key))
+        self.assertTrue(vault.remove_recovery_key())
+        vault.lock_vault()
+        self.assertFalse(self.unlocks(recovery_key))
+        self.assertTrue(self.unlocks(PASSWORD))
+    
+    def test_torn_key_block_write_keeps_previous_slots(self):
+        with open(self.path, "rb") as f:
+            before = f.read(FILE_HEADER.size + 2 * KEY_BLOCK_SIZE)
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        self.assertTrue(vault.change_master_password(PASSWORD, "new password"))
+        vault.lock_vault()
+        
+        # Corrupt the key block the password change wrote, as a crash mid-write would.
+        starts = [FILE_HEADER.size + index * KEY_BLOCK_SIZE for index in range(2)]
+        with open(self.path, "r+b") as f:
+            after = f.read(len(before))
+            changed = [start for start in starts
+                       if after[start:start + KEY_BLOCK_SIZE] != before[start:start + KEY_BLOCK_SIZE]]
+            self.assertEqual(len(changed), 1)
+            f.seek(changed[0] + 20)
+            f.write(b"garbage")
+        
+        self.assertTrue(self.unlocks(PASSWORD))
+        self.assertFalse(self.unlocks("new password"))
+    
+    def flip_byte(self, offset: int):
+        with open(self.path, "r+b") as f:
+            f.seek(offset)
+            byte = f.read(1)
+            f.seek(offset)
+            f.write(bytes([byte[0] ^ 0xFF]))
+    
+    def test_tampered_metadata_fails_unlock(self):
+        # The note's metadata record is the last one in the log.
+        self.flip_byte(os.path.getsize(self.path) - 5)
+        self.assertFalse(self.unlocks(PASSWORD))
+    
+    def test_tampered_body_fails_to_decrypt(self):
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        offset, length = vault.store.body_spans[vault.notes[self.note_id].body_ref]
+        vault.lock_vault()
+        self.flip_byte(offset + length - 5)
+        
+        # Bodies are decrypted lazily, so unlock succeeds but the body must not decrypt.
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        with self.assertRaises(Exception):
+            vault.notes[self.note_id].content
+        vault.lock_vault()
+    
+    def test_sharded_vault_password_change(self):
+        self.path = os.path.join(self.directory, "sharded.enc")
+        vault = self.open_vault("sharded")
+        self.assertTrue(vault.create_vault(PASSWORD))
+        self.note_id = vault.add_note(Note("secret", "the body"))
+        self.assertTrue(vault.change_master_password(PASSWORD, "new password"))
+        vault.lock_vault()
+        
+        self.assertFalse(self.unlocks(PASSWORD))
+        self.assertTrue(self.unlocks("new password"))
+
+
+if __name__ == "__main__":
+    unittest.main()
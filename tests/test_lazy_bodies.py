@@ -0,0 +1,77 @@
+"""
+Tests for lazily decrypted note bodies and the bounded body cache.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from cache import LRUCache
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_evicts_least_recently_used_by_weight(self):
+        cache = LRUCache(10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        self.assertEqual(cache.get("a"), "aaaa")
+        cache.put("c", "cccc")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "aaaa")
+        self.assertEqual(cache.weight, 8)
+    
+    def test_replacing_and_oversized_values(self):
+        cache = LRUCache(10)
+        cache.put("a", "aaaa")
+        cache.put("a", "aa")
+        self.assertEqual(cache.weight, 2)
+        cache.put("big", "x" * 11)
+        self.assertIsNone(cache.get("big"))
+        cache.discard("a")
+        self.assertEqual((len(cache), cache.weight), (0, 0))
+
+
+class LazyBodyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(vault.create_vault(PASSWORD))
+        self.ids = vault.add_notes([Note(f"note {i}", f"body {i}") for i in range(5)])
+        vault.lock_vault()
+        self.vault = NotesVault(self.path, kdf_target_seconds=None)
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def test_bodies_are_decrypted_on_first_use(self):
+        with mock.patch("storage.RecordLog.read_body", autospec=True,
+                        side_effect=lambda store, body_ref: f"read {body_ref}") as read_body:
+            self.assertTrue(self.vault.unlock_vault(PASSWORD))
+            self.assertEqual(self.vault.notes[self.ids[0]].title, "note 0")
+            read_body.assert_not_called()
+            
+            note = self.vault.notes[self.ids[2]]
+            self.assertEqual(note.content, f"read {note.body_ref}")
+            self.assertEqual(note.content, f"read {note.body_ref}")
+            self.assertEqual(read_body.call_count, 1)
+    
+    def test_cache_is_bounded(self):
+        self.vault = NotesVault(self.path, kdf_target_seconds=None, body_cache_size=len("body 0") * 2)
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        for i, note_id in enumerate(self.ids):
+            self.assertEqual(self.vault.notes[note_id].content, f"body {i}")
+        self.assertEqual(len(self.vault.body_cache), 2)
+        self.assertEqual(self.vault.body_cache.misses, len(self.ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
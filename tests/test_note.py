@@ -0,0 +1,49 @@
+"""
+Tests for the slotted Note: tags, sizes and serialization.
+"""
+
+import json
+import unittest
+
+from notes_manager import Note
+
+
+class NoteTestCase(unittest.TestCase):
+
+    def test_notes_have_no_attribute_dictionary(self):
+        note = Note("title", "body")
+        self.assertFalse(hasattr(note, "__dict__"))
+        with self.assertRaises(AttributeError):
+            note.color = "red"
+    
+    def test_tags_are_shared_interned_tuples(self):
+        first = Note.from_dict(json.loads('{"title": "a", "tags": ["project-x", "work"]}'))
+        second = Note.from_dict(json.loads('{"title": "b", "tags": ["project-x"]}'))
+        self.assertEqual(first.tags, ("project-x", "work"))
+        self.assertIs(first.tags[0], second.tags[0])
+        first.tags = ["changed"]
+        self.assertEqual(first.tags, ("changed",))
+    
+    def test_size_is_in_utf8_bytes(self):
+        self.assertEqual(Note("t", "héllo ✓").size, len("héllo ✓".encode("utf-8")))
+        self.assertEqual(Note.from_dict({'title': "t", 'size': 42}).size, 42)
+    
+    def test_dict_round_trip(self):
+        note = Note("title", "body", ["a", "b"])
+        note.created_at = "2025-01-02T03:04:05.000006"
+        note.modified_us = note.created_us + 1
+        data = note.to_dict()
+        self.assertEqual(data['tags'], ["a", "b"])
+        self.assertEqual(data['created_at'], "2025-01-02T03:04:05.000006")
+        
+        copy = Note.from_dict(json.loads(json.dumps(data)))
+        self.assertEqual(copy.to_dict(), data)
+    
+    def test_iso_timestamps_from_older_vaults(self):
+        note = Note.from_dict({'title': "t", 'content': "", 'created_at': "2020-05-06T07:08:09"})
+        self.assertEqual(note.created_at, "2020-05-06T07:08:09")
+        self.assertIsNone(note.modified_us)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Tests for decrypting unlock payloads on thread and process pools.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from encryption import EncryptionManager
+from notes_manager import NotesVault, Note
+from parallel_unlock import ParallelDecryptor, split_chunks
+
+PASSWORD = "correct horse"
+
+
+class ParallelDecryptorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.encryption_manager = EncryptionManager()
+        self.encryption_manager.set_key(os.urandom(32))
+        self.records = [{'id': i, 'text': "x" * (i * 7)} for i in range(40)]
+        self.payloads = [
+            (self.encryption_manager.encrypt_data(json.dumps(record), b"aad %d" % i), b"aad %d" % i)
+            for i, record in enumerate(self.records)
+        ]
+    
+    def test_split_chunks_keeps_order(self):
+        chunks = split_chunks(self.payloads, 6)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(chunks))
+        self.assertEqual([payload for chunk in chunks for payload in chunk], self.payloads)
+    
+    def test_small_work_stays_on_the_caller(self):
+        decryptor = ParallelDecryptor(workers=4, executor="unknown")
+        self.assertFalse(decryptor.should_parallelize(self.payloads))
+        self.assertEqual(decryptor.decrypt_json(self.encryption_manager, self.payloads), self.records)
+    
+    def decrypt_in_parallel(self, executor: str):
+        decryptor = ParallelDecryptor(workers=2, executor=executor, min_parallel_bytes=0)
+        self.assertTrue(decryptor.should_parallelize(self.payloads))
+        return decryptor.decrypt_json(self.encryption_manager, self.payloads)
+    
+    def test_thread_pool(self):
+        self.assertEqual(self.decrypt_in_parallel("thread"), self.records)
+    
+    def test_process_pool_from_a_worker_thread(self):
+        # As the GUI does: the pool is started off the main thread.
+        results = []
+        worker = threading.Thread(target=lambda: results.append(self.decrypt_in_parallel("process")))
+        worker.start()
+        worker.join(60)
+        self.assertEqual(results, [self.records])
+    
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            self.decrypt_in_parallel("fibers")
+
+
+class ParallelUnlockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_vaults_unlock_in_parallel(self):
+        for storage in ("log", "sharded"):
+            with self.subTest(storage=storage):
+                path = os.path.join(self.directory, f"{storage}.enc")
+                vault = NotesVault(path, storage=storage, kdf_target_seconds=None)
+                self.assertTrue(vault.create_vault(PASSWORD))
+                vault.add_notes([Note(f"note {i}", f"body {i}", [f"t{i % 3}"]) for i in range(50)])
+                expected = {note_id: (note.title, note.tags) for note_id, note in vault.notes.items()}
+                vault.lock_vault()
+                
+                vault = NotesVault(path, storage=storage, kdf_target_seconds=None,
+                                   unlock_workers=2, unlock_executor="thread",
+                                   parallel_unlock_bytes=0)
+                self.assertTrue(vault.unlock_vault(PASSWORD))
+                self.assertEqual({note_id: (note.title, note.tags)
+                                  for note_id, note in vault.notes.items()}, expected)
+                vault.lock_vault()
+
+
+if __name__ == "__main__":
+    unittest.main()
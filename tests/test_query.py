@@ -0,0 +1,155 @@
+"""
+Tests for the structured query language: parsing, date bounds and
+results against a vault.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from query import (And, Not, Or, Tag, Text, DateRange, is_structured,
+                   parse_date_bounds, parse_query, parse_tag_query)
+from time_index import datetime_to_us
+
+DAY = 24 * 3600 * 1000000
+
+
+class ParseTestCase(unittest.TestCase):
+
+    def test_plain_text_is_one_substring(self):
+        self.assertFalse(is_structured("c++ and more"))
+        node = parse_query("c++ and more")
+        self.assertIsInstance(node, Text)
+        self.assertEqual(node.text, "c++ and more")
+    
+    def test_precedence(self):
+        # NOT binds tightest, then AND (also implicit), then OR.
+        node = parse_query("a OR b c AND NOT d")
+        self.assertIsInstance(node, Or)
+        first, second = node.children
+        self.assertIsInstance(first, Text)
+        self.assertIsInstance(second, And)
+        self.assertEqual(len(second.children), 3)
+        self.assertIsInstance(second.children[2], Not)
+    
+    def test_parentheses(self):
+        node = parse_query("(a OR b) AND tag:x")
+        self.assertIsInstance(node, And)
+        self.assertIsInstance(node.children[0], Or)
+        self.assertIsInstance(node.children[1], Tag)
+    
+    def test_fields_and_phrases(self):
+        node = parse_query('title:"weekly sync" tag:"two words" content:budget "quick fox"')
+        title, tag, content, phrase = node.children
+        self.assertEqual((title.field, title.text, title.quoted), ("title", "weekly sync", True))
+        self.assertEqual(tag.tag, "two words")
+        self.assertEqual((content.field, content.text), ("content", "budget"))
+        self.assertEqual((phrase.field, phrase.text, phrase.quoted), (None, "quick fox", True))
+    
+    def test_operators_are_upper_case(self):
+        node = parse_query("tag:a and tag:b")
+        self.assertIsInstance(node, And)
+        self.assertEqual([str(child) for child in node.children], ["tag:a", "and", "tag:b"])
+    
+    def test_malformed_queries(self):
+        for query in ("(tag:a", "tag:a AND", "AND tag:a", "tag:a OR", "tag:a )", "NOT"):
+            with self.subTest(query=query):
+                with self.assertRaises(ValueError):
+                    parse_query(query)
+    
+    def test_tag_queries_only_take_tags(self):
+        self.assertIsInstance(parse_tag_query("NOT tag:a"), Not)
+        for query in ("", "python", "tag:a and tag:b", "tag:a OR title:b"):
+            with self.subTest(query=query):
+                with self.assertRaises(ValueError):
+                    parse_tag_query(query)
+
+
+class DateBoundsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime_to_us(datetime.datetime(2025, 6, 15, 12, 0))
+        self.day = datetime_to_us(datetime.datetime(2025, 1, 1))
+    
+    def test_dates_cover_the_whole_day(self):
+        self.assertEqual(parse_date_bounds("2025-01-01", self.now), (self.day, self.day + DAY))
+        self.assertEqual(parse_date_bounds(">2025-01-01", self.now), (self.day + DAY, None))
+        self.assertEqual(parse_date_bounds(">=2025-01-01", self.now), (self.day, None))
+        self.assertEqual(parse_date_bounds("<2025-01-01", self.now), (None, self.day))
+        self.assertEqual(parse_date_bounds("<=2025-01-01", self.now), (None, self.day + DAY))
+    
+    def test_ages_count_back_from_now(self):
+        cutoff = self.now - 7 * DAY
+        self.assertEqual(parse_date_bounds("<7d", self.now), (cutoff + 1, None))
+        self.assertEqual(parse_date_bounds("7d", self.now), (cutoff, None))
+        self.assertEqual(parse_date_bounds(">7d", self.now), (None, cutoff))
+    
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            parse_date_bounds("2025-13-01", self.now)
+        with self.assertRaises(ValueError):
+            DateRange("created", "yesterday")
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vault = NotesVault(os.path.join(self.directory, "vault.enc"), kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault("password"))
+        notes = {
+            "standup": Note("Standup", "talked about the backend budget", ["work", "meeting"]),
+            "review": Note("Design review", "backend and frontend", ["work"]),
+            "recipe": Note("Tomato soup", "quick brown fox soup", ["home"]),
+            "old": Note("Old meeting", "archived minutes", ["work", "archived"]),
+        }
+        self.ids = {}
+        for key, note in notes.items():
+            self.ids[key] = self.vault.add_note(note)
+        # Back-date one note so date filters have something to separate;
+        # saving it stamps the modification time with now.
+        old = self.vault.notes[self.ids["old"]]
+        old.created_us = datetime_to_us(datetime.datetime(2020, 1, 1))
+        self.vault.update_note(self.ids["old"], old)
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def search(self, query: str):
+        return {key for key, note_id in self.ids.items()
+                if note_id in {found for found, _ in self.vault.search_notes(query)}}
+    
+    def test_queries(self):
+        cases = {
+            "backend": {"standup", "review"},
+            "ckend": {"standup", "review"},
+            "tag:work AND NOT tag:archived": {"standup", "review"},
+            "tag:work backend": {"standup", "review"},
+            "title:meeting": {"old"},
+            '"brown fox"': {"recipe"},
+            '"fox brown"': set(),
+            "tag:home OR title:design": {"recipe", "review"},
+            "created:<2021-01-01": {"old"},
+            "created:<7d tag:work": {"standup", "review"},
+            "created:>30d": {"old"},
+            "modified:<7d tag:archived": {"old"},
+            "NOT tag:work": {"recipe"},
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), expected)
+    
+    def test_tag_search_matches_query_search(self):
+        for query in ("tag:work AND NOT tag:archived", "tag:home OR tag:meeting", "NOT tag:work"):
+            with self.subTest(query=query):
+                tagged = {note_id for note_id, _ in self.vault.search_tags(query)}
+                searched = {note_id for note_id, _ in self.vault.search_notes(query)}
+                self.assertEqual(tagged, searched)
+
+
+if __name__ == "__main__":
+    unittest.main()
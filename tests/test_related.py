@@ -0,0 +1,99 @@
+"""
+Tests for related notes (TF-IDF cosine) and near-duplicate detection
+(MinHash with LSH banding).
+"""
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from related import RelatedIndex
+
+PASSWORD = "correct horse"
+
+
+def counts(text: str):
+    frequencies = {}
+    for word in text.split():
+        frequencies[word] = frequencies.get(word, 0.0) + 1.0
+    return frequencies
+
+
+class RelatedIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        texts = {
+            "python": "python packaging wheels pip install",
+            "pip": "pip install python wheels",
+            "soup": "tomato soup recipe basil",
+            "stew": "lentil stew recipe basil",
+            "other": "quarterly budget meeting",
+        }
+        self.index = RelatedIndex()
+        self.index.build({note_id: counts(text) for note_id, text in texts.items()})
+    
+    def cosine(self, first: str, second: str) -> float:
+        a, b = self.index.rows[first], self.index.rows[second]
+        return sum(weight * b.get(word, 0.0) for word, weight in a.items())
+    
+    def test_rows_are_unit_length(self):
+        for row in self.index.rows.values():
+            self.assertAlmostEqual(math.sqrt(sum(weight * weight for weight in row.values())), 1.0)
+    
+    def test_related_matches_pairwise_cosine(self):
+        related = self.index.related("soup", 10)
+        self.assertEqual(related[0][0], "stew")
+        self.assertNotIn("soup", [note_id for note_id, _ in related])
+        for note_id, similarity in related:
+            self.assertAlmostEqual(similarity, self.cosine("soup", note_id))
+        self.assertEqual(len(self.index.related("soup", 0)), 0)
+        self.assertEqual(self.index.related("missing", 5), [])
+    
+    def test_updates_and_removal(self):
+        self.index.set_note("other", counts("tomato soup basil"))
+        self.assertEqual(self.index.related("soup", 1)[0][0], "other")
+        self.index.remove_note("other")
+        self.assertNotIn("other", [note_id for note_id, _ in self.index.related("soup", 10)])
+    
+    def test_duplicates(self):
+        words = " ".join(f"word{i}" for i in range(40))
+        self.index.set_note("copy", counts("python packaging wheels pip install"))
+        self.index.set_note("long", counts(words))
+        self.index.set_note("long edited", counts(words + " extra"))
+        found = {(first, second): similarity for first, second, similarity in self.index.duplicates(0.9)}
+        self.assertEqual(set(found), {("copy", "python"), ("long", "long edited")})
+        self.assertEqual(found[("copy", "python")], 1.0)
+        self.assertAlmostEqual(found[("long", "long edited")], 40 / 41)
+
+
+class VaultRelatedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vault = NotesVault(os.path.join(self.directory, "vault.enc"), kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def test_related_notes_and_duplicates(self):
+        soup = self.vault.add_note(Note("Tomato soup", "tomato soup with basil and garlic"))
+        stew = self.vault.add_note(Note("Lentil stew", "lentil stew with basil and garlic"))
+        copy = self.vault.add_note(Note("Tomato soup", "tomato soup with basil and garlic"))
+        budget = self.vault.add_note(Note("Budget", "quarterly numbers"))
+        
+        related = [note_id for note_id, _, _ in self.vault.related_notes(soup, k=2)]
+        self.assertEqual(related, [copy, stew])
+        self.assertEqual([(a, b) for a, b, _ in self.vault.find_duplicates()], [tuple(sorted((soup, copy)))])
+        
+        self.vault.delete_note(copy)
+        self.assertEqual(self.vault.find_duplicates(), [])
+        self.assertNotIn(budget, [note_id for note_id, _, _ in self.vault.related_notes(soup)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Tests for the inverted search index and its encrypted copy next to the vault.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from search_index import SearchIndex
+
+PASSWORD = "correct horse"
+
+
+class SearchIndexTestCase(unittest.TestCase):
+
+    def test_postings_follow_changes(self):
+        index = SearchIndex()
+        index.index_note("a", "Backend sync", ["work"], "budget talk", 1)
+        index.index_note("b", "Recipe", [], "backend soup", 1)
+        self.assertEqual(index.postings["backend"], {0, 1})
+        self.assertTrue(index.is_current("a", 1))
+        self.assertFalse(index.is_current("a", 2))
+        
+        index.index_note("a", "Frontend sync", ["work"], "", 2)
+        self.assertEqual(index.postings["backend"], {1})
+        self.assertNotIn("budget", index.postings)
+        index.remove_note("b")
+        self.assertNotIn("backend", index.postings)
+        self.assertEqual(len(index), 1)
+    
+    def test_serialized_round_trip(self):
+        index = SearchIndex()
+        index.index_note("a", "Title", ["tag"], "some words here", 5)
+        index.index_note("b", "Other", [], "more words", None)
+        loaded = SearchIndex.from_dict(index.to_dict())
+        self.assertEqual(loaded.postings, index.postings)
+        self.assertEqual(loaded.stamps, index.stamps)
+        self.assertEqual(loaded.doc_numbers, index.doc_numbers)
+
+
+class TrigramTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        notes = {
+            "a": ("Backend sync", "budget talk about the backend"),
+            "b": ("Recipe", "tomato soup, backed up"),
+            "c": ("Ideas", "a back-end rewrite"),
+        }
+        for note_id, (title, content) in notes.items():
+            self.index.index_note(note_id, title, [], content, 1)
+    
+    def test_trigram_lookup_matches_a_scan(self):
+        for fragment in ("ckend", "back", "ack", "end", "to", "b", "xyz", "budgets"):
+            with self.subTest(fragment=fragment):
+                self.assertEqual(sorted(self.index.words_containing(fragment)),
+                                 sorted(self.index.scan_words(fragment)))
+    
+    def test_trigrams_follow_removal(self):
+        self.index.remove_note("a")
+        self.assertNotIn("bud", self.index.trigrams)
+        self.assertEqual(self.index.words_containing("ckend"), [])
+    
+    def test_candidates_need_every_fragment(self):
+        self.assertEqual(self.index.candidates("ck"), ["a", "b", "c"])
+        self.assertEqual(self.index.candidates("ckend budg"), ["a"])
+        self.assertEqual(self.index.candidates("zzz"), [])
+        self.assertIsNone(self.index.candidates("--"))
+
+
+class RankingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        notes = {
+            "body": ("Notes", [], "python snippets and more python"),
+            "title": ("Python tips", [], "assorted snippets"),
+            "tag": ("Snippets", ["python"], "assorted"),
+            "rare": ("Misc", [], "python haskell"),
+            "none": ("Other", [], "nothing relevant"),
+        }
+        for note_id, (title, tags, content) in notes.items():
+            self.index.index_note(note_id, title, tags, content, 1)
+    
+    def ranked_ids(self, query: str, k: int = 10, within=None):
+        return [note_id for note_id, _ in self.index.ranked(query, k, within)]
+    
+    def test_fields_are_weighted(self):
+        ranked = self.ranked_ids("python")
+        self.assertEqual(ranked[0], "title")
+        self.assertLess(ranked.index("tag"), ranked.index("body"))
+        self.assertNotIn("none", ranked)
+    
+    def test_rare_words_weigh_more(self):
+        self.assertEqual(self.ranked_ids("python haskell")[0], "rare")
+    
+    def test_top_k_within(self):
+        self.assertEqual(len(self.ranked_ids("python", k=2)), 2)
+        self.assertEqual(self.ranked_ids("python", within=["body", "none"]), ["body"])
+        self.assertEqual(self.ranked_ids("python", k=0), [])
+    
+    def test_scores_are_ordered(self):
+        scores = [score for _, score in self.index.ranked("python snippets", 10)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertTrue(all(score > 0 for score in scores))
+
+
+class SavedIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+        self.note_id = self.vault.add_note(Note("Standup", "backend budget"))
+    
+    def tearDown(self):
+        if self.vault.is_unlocked:
+            self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self) -> NotesVault:
+        return NotesVault(self.path, kdf_target_seconds=None)
+    
+    def unlocked(self) -> NotesVault:
+        vault = self.open_vault()
+        self.assertTrue(vault.unlock_vault(PASSWORD))
+        return vault
+    
+    def found(self, vault: NotesVault, query: str):
+        return [note_id for note_id, _ in vault.search_notes(query)]
+    
+    def test_commits_do_not_write_the_index(self):
+        self.vault.update_note(self.note_id, Note("Standup", "frontend budget"))
+        self.assertFalse(os.path.exists(self.vault.index_path))
+        self.vault.lock_vault()
+        self.assertTrue(os.path.exists(self.vault.index_path))
+    
+    def test_saved_index_is_reused(self):
+        self.vault.lock_vault()
+        vault = self.unlocked()
+        self.assertEqual(vault._stale_index, set())
+        self.assertEqual(self.found(vault, "backend"), [self.note_id])
+        vault.lock_vault()
+    
+    def test_out_of_date_entries_are_rebuilt(self):
+        self.vault.save_search_index()
+        # Changes after the last save, then a crash before the next one.
+        other_id = self.vault.add_note(Note("Retro", "frontend"))
+        self.vault.update_note(self.note_id, Note("Standup", "database"))
+        
+        vault = self.unlocked()
+        self.assertEqual(vault._stale_index, {self.note_id, other_id})
+        self.assertEqual(self.found(vault, "backend"), [])
+        self.assertEqual(self.found(vault, "database"), [self.note_id])
+        self.assertEqual(self.found(vault, "frontend"), [other_id])
+        vault.lock_vault()
+    
+    def test_substring_search(self):
+        other_id = self.vault.add_note(Note("Retro", "a back-end rewrite"))
+        self.assertEqual(self.found(self.vault, "ckend"), [self.note_id])
+        self.assertEqual(self.found(self.vault, "kend budg"), [self.note_id])
+        self.assertEqual(self.found(self.vault, "back"), [self.note_id, other_id])
+        self.assertEqual(self.found(self.vault, "-end"), [other_id])
+    
+    def test_ranked_search(self):
+        other_id = self.vault.add_note(Note("Budget", "numbers"))
+        ranked = self.vault.search_ranked("budget")
+        self.assertEqual([note_id for note_id, _, _ in ranked], [other_id, self.note_id])
+        self.assertEqual(ranked[0][1].title, "Budget")
+    
+    def test_unreadable_index_is_rebuilt(self):
+        self.vault.lock_vault()
+        with open(self.path + ".idx", "wb") as f:
+            f.write(b"not an index")
+        vault = self.unlocked()
+        self.assertEqual(self.found(vault, "budget"), [self.note_id])
+        vault.lock_vault()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for as-you-type search sessions: refinement, caching and
+invalidation when the vault changes.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+class SearchSessionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vault = NotesVault(os.path.join(self.directory, "vault.enc"), kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+        self.ids = {
+            title: self.vault.add_note(Note(title, body, tags))
+            for title, body, tags in (("Backend", "budget", ["work"]), ("Backup", "disks", []),
+                                      ("Bake", "bread", ["home"]), ("Other", "nothing", ["work"]))
+        }
+        self.session = self.vault.search_session()
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def search(self, query: str):
+        return [note_id for note_id, _ in self.session.search(query)]
+    
+    def test_typing_refines_the_last_results(self):
+        starting_with_ba = [self.ids[title] for title in ("Backend", "Backup", "Bake")]
+        with mock.patch.object(self.vault, "search_notes", wraps=self.vault.search_notes) as search_notes:
+            self.assertEqual(self.search("ba"), starting_with_ba)
+            self.assertEqual(self.search("back"), starting_with_ba[:2])
+            self.assertEqual(self.search("backe"), starting_with_ba[:1])
+        # Each refinement only searches the previous results.
+        self.assertEqual([call.args[1:] for call in search_notes.call_args_list],
+                         [(), (starting_with_ba,), (starting_with_ba[:2],)])
+        self.assertEqual(self.session.stats()['refinements'], 2)
+        self.assertEqual(self.session.stats()['full_searches'], 1)
+    
+    def test_backspace_hits_the_cache(self):
+        self.search("ba")
+        self.search("bak")
+        with mock.patch.object(self.vault, "search_notes") as search_notes:
+            self.assertEqual(len(self.search("ba")), 3)
+        search_notes.assert_not_called()
+        self.assertEqual(self.session.stats()['cache_hits'], 1)
+    
+    def test_structured_queries_search_in_full(self):
+        self.search("tag:work")
+        self.assertEqual(self.search("tag:work backend"), [self.ids["Backend"]])
+        self.assertEqual(self.session.stats()['refinements'], 0)
+    
+    def test_changes_invalidate_results(self):
+        self.assertEqual(self.search("bread"), [self.ids["Bake"]])
+        self.vault.update_note(self.ids["Other"], Note("Other", "bread too"))
+        self.assertEqual(self.search("bread"), [self.ids["Bake"], self.ids["Other"]])
+        # Refining after the change must not start from stale results.
+        self.assertEqual(self.search("bread t"), [self.ids["Other"]])
+        self.vault.delete_note(self.ids["Bake"])
+        self.assertEqual(self.search("bread"), [self.ids["Other"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
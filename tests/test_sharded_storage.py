@@ -0,0 +1,99 @@
+"""
+Tests for sharded vault storage: shard placement, partial saves, the
+manifest and rebalancing.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from notes_manager import NotesVault, Note
+from sharded_storage import shard_for
+
+PASSWORD = "correct horse"
+
+
+def snapshot(vault: NotesVault):
+    """Everything a note holds, by id."""
+    return {
+        note_id: (note.title, note.content, note.tags, note.created_us, note.modified_us)
+        for note_id, note in vault.notes.items()
+    }
+
+
+class ShardedStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+        self.ids = self.vault.add_notes([Note(f"note {i}", f"body {i}", ["t"]) for i in range(40)])
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self) -> NotesVault:
+        return NotesVault(self.path, storage="sharded", shard_count=8, kdf_target_seconds=None)
+    
+    def reopen(self) -> NotesVault:
+        self.vault.lock_vault()
+        # Opening a sharded vault does not depend on the configured mode.
+        self.vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        return self.vault
+    
+    def shard_files(self):
+        return sorted(os.listdir(self.path + ".shards"))
+    
+    def test_shard_placement_is_stable(self):
+        for note_id in self.ids:
+            index = shard_for(note_id, 8)
+            self.assertEqual(shard_for(note_id, 8), index)
+            self.assertIn(note_id, self.vault.store.shards[index])
+        self.assertGreater(len({shard_for(note_id, 8) for note_id in self.ids}), 1)
+    
+    def test_save_rewrites_only_touched_shards(self):
+        before = set(self.shard_files())
+        self.vault.update_note(self.ids[0], Note("changed", "new body"))
+        self.assertEqual(self.vault.store.stats()['last_save_shards'], 1)
+        after = set(self.shard_files())
+        self.assertEqual(len(after), 8)
+        self.assertEqual(len(before - after), 1)
+    
+    def test_round_trip(self):
+        self.vault.update_note(self.ids[0], Note("changed", "new body"))
+        self.vault.delete_notes(self.ids[30:])
+        expected = snapshot(self.vault)
+        vault = self.reopen()
+        self.assertEqual(vault.store.shard_count, 8)
+        self.assertEqual(snapshot(vault), expected)
+    
+    def test_failed_save_keeps_the_manifest(self):
+        expected = snapshot(self.vault)
+        with mock.patch("sharded_storage.atomic_write", side_effect=OSError(28, "No space left on device")):
+            with self.assertRaises(OSError):
+                self.vault.update_note(self.ids[0], Note("lost", "never saved"))
+        self.assertEqual(snapshot(self.reopen()), expected)
+    
+    def test_rebalance(self):
+        expected = snapshot(self.vault)
+        self.vault.rebalance_shards(3)
+        self.assertEqual(len(self.shard_files()), 3)
+        vault = self.reopen()
+        self.assertEqual(vault.store.shard_count, 3)
+        self.assertEqual(snapshot(vault), expected)
+    
+    def test_rebalance_needs_sharded_storage(self):
+        vault = NotesVault(os.path.join(self.directory, "log.enc"), kdf_target_seconds=None)
+        self.assertTrue(vault.create_vault(PASSWORD))
+        with self.assertRaises(ValueError):
+            vault.rebalance_shards(3)
+        vault.lock_vault()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for the append-only record log: round trips and recovery from a
+torn tail.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import storage
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+def snapshot(vault: NotesVault):
+    """Everything a note holds, by id."""
+    return {
+        note_id: (note.title, note.content, note.tags, note.created_us, note.modified_us)
+        for note_id, note in vault.notes.items()
+    }
+
+
+class RecordLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self) -> NotesVault:
+        # Uncalibrated KDF parameters keep the tests fast.
+        return NotesVault(self.path, kdf_target_seconds=None)
+    
+    def reopen(self) -> NotesVault:
+        self.vault.lock_vault()
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        return self.vault
+    
+    def test_round_trip(self):
+        first = self.vault.add_note(Note("First", "body one", ["a", "b"]))
+        second = self.vault.add_note(Note("Second", "body two"))
+        third = self.vault.add_note(Note("Third", "héllo wörld ✓", ["c"]))
+        self.vault.update_note(first, Note("First, edited", "new body", ["a"]))
+        self.vault.delete_note(second)
+        expected = snapshot(self.vault)
+        
+        vault = self.reopen()
+        self.assertEqual(snapshot(vault), expected)
+        self.assertEqual(set(vault.notes), {first, third})
+    
+    def test_truncated_tail_is_dropped(self):
+        self.vault.add_note(Note("kept", "survives the crash"))
+        expected = snapshot(self.vault)
+        size = os.path.getsize(self.path)
+        # A record header whose record never made it to disk.
+        with open(self.path, "ab") as f:
+            f.write(storage.RECORD_HEADER.pack(storage.KIND_PUT, 99, 1000)[:-3])
+        
+        vault = self.reopen()
+        self.assertEqual(snapshot(vault), expected)
+        self.assertEqual(os.path.getsize(self.path), size)
+        
+        vault.add_note(Note("after", "written after recovery"))
+        expected = snapshot(vault)
+        self.assertEqual(snapshot(self.reopen()), expected)
+    
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the tag index and the vault's tag lookups.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from tag_index import TagIndex
+
+
+class TagIndexTestCase(unittest.TestCase):
+
+    def test_tags_are_case_insensitive(self):
+        index = TagIndex()
+        index.set_tags("a", ["Python", "python ", "Work"])
+        index.set_tags("b", ["PYTHON", " "])
+        self.assertEqual(index.tags_by_note["a"], ("python", "work"))
+        self.assertEqual(index.notes_with("Python"), {"a", "b"})
+        self.assertEqual(index.count("WORK"), 1)
+        self.assertEqual(index.counts(), {"python": 2, "work": 1})
+    
+    def test_retagging_and_removal(self):
+        index = TagIndex()
+        index.set_tags("a", ["x", "y"])
+        index.set_tags("b", ["y"])
+        index.set_tags("a", ["z"])
+        self.assertEqual(index.counts(), {"y": 1, "z": 1})
+        index.remove_note("b")
+        index.remove_note("missing")
+        self.assertEqual(index.counts(), {"z": 1})
+        self.assertNotIn("y", index.notes_by_tag)
+    
+    def test_counts_order(self):
+        index = TagIndex()
+        index.set_tags("a", ["b", "a"])
+        index.set_tags("b", ["c"])
+        index.set_tags("c", ["c"])
+        self.assertEqual(list(index.counts()), ["c", "a", "b"])
+
+
+class VaultTagsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = NotesVault(self.path, kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault("password"))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def test_index_follows_changes_and_unlock(self):
+        first = self.vault.add_note(Note("one", "", ["Work", "idea"]))
+        second = self.vault.add_note(Note("two", "", ["work"]))
+        self.vault.update_note(first, Note("one", "", ["idea"]))
+        self.vault.delete_note(second)
+        self.assertEqual(self.vault.tag_counts(), {"idea": 1})
+        
+        self.vault.lock_vault()
+        self.assertTrue(self.vault.unlock_vault("password"))
+        self.assertEqual(self.vault.tag_counts(), {"idea": 1})
+    
+    def test_notes_with_tag(self):
+        ids = [self.vault.add_note(Note(str(i), "", tags)) for i, tags in
+               enumerate([['say "hi"'], ["other"], ['Say "HI"', "other"]])]
+        self.assertEqual([note_id for note_id, _ in self.vault.notes_with_tag('say "hi"')],
+                         [ids[0], ids[2]])
+        self.assertEqual(self.vault.notes_with_tag("missing"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Tests for the GUI's background task runner, driven by a fake scheduler
+instead of Tk's ``after``.
+"""
+
+import threading
+import unittest
+
+from task_runner import Debouncer, TaskRunner
+
+
+class FakeScheduler:
+    """Records scheduled callbacks instead of running them."""
+    
+    def __init__(self):
+        self.calls = []
+        self.cancelled = set()
+    
+    def __call__(self, delay_ms, callback):
+        self.calls.append((delay_ms, callback))
+        return len(self.calls)
+    
+    def cancel(self, handle):
+        self.cancelled.add(handle)
+    
+    def run_pending(self):
+        """Run the callbacks scheduled and not cancelled so far."""
+        for handle, (_, callback) in enumerate(list(self.calls), 1):
+            if handle not in self.cancelled:
+                self.cancelled.add(handle)
+                callback()
+
+
+class TaskRunnerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = FakeScheduler()
+        self.busy = []
+        self.runner = TaskRunner(self.schedule, on_busy_change=self.busy.append)
+        self.results = []
+        self.errors = []
+    
+    def tearDown(self):
+        self.runner.shutdown()
+    
+    def submit(self, kind, work, description="Working"):
+        return self.runner.submit(kind, work, self.results.append, self.errors.append, description)
+    
+    def deliver(self):
+        """Wait for the worker to go idle, then run a poll."""
+        self.runner.executor.submit(lambda: None).result()
+        self.runner.poll()
+    
+    def test_results_are_delivered_on_poll(self):
+        self.submit("save", lambda: "saved", "Saving")
+        self.assertEqual(self.busy, ["Saving"])
+        self.assertEqual(len(self.schedule.calls), 1)
+        self.assertEqual(self.results, [])
+        
+        self.deliver()
+        self.assertEqual(self.results, ["saved"])
+        self.assertEqual(self.busy, ["Saving", None])
+        self.assertEqual(self.runner.pending(), 0)
+        self.assertFalse(self.runner.polling)
+    
+    def test_errors_go_to_on_error(self):
+        def fail():
+            raise OSError("disk full")
+        self.submit("save", fail)
+        self.deliver()
+        self.assertEqual(self.results, [])
+        self.assertEqual([str(error) for error in self.errors], ["disk full"])
+    
+    def test_newer_tasks_supersede_older_ones(self):
+        release = threading.Event()
+        started = threading.Event()
+        
+        def slow():
+            started.set()
+            release.wait(5)
+            return "first"
+        
+        self.submit("search", slow)
+        started.wait(5)
+        self.submit("search", lambda: "second")
+        third = self.submit("search", lambda: "third")
+        self.submit("save", lambda: "saved")
+        self.assertTrue(self.runner.is_current(third))
+        
+        release.set()
+        self.deliver()
+        # The running search finished but was stale; the queued one never ran.
+        self.assertEqual(self.results, ["third", "saved"])
+        self.assertEqual(self.runner.dropped, 2)
+        self.assertEqual(self.errors, [])
+    
+    def test_cancel_drops_running_results(self):
+        release = threading.Event()
+        self.submit("unlock", lambda: release.wait(5), "Unlocking")
+        self.runner.cancel("unlock")
+        self.assertEqual(self.busy, ["Unlocking"])
+        release.set()
+        self.deliver()
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.busy, ["Unlocking", None])
+    
+    def test_poll_reschedules_while_tasks_are_pending(self):
+        release = threading.Event()
+        self.submit("search", lambda: release.wait(5))
+        self.runner.poll()
+        self.assertEqual(len(self.schedule.calls), 2)
+        self.assertTrue(self.runner.polling)
+        release.set()
+        self.deliver()
+        self.assertEqual(len(self.schedule.calls), 2)
+        self.assertFalse(self.runner.polling)
+
+
+class DebouncerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = FakeScheduler()
+        self.fired = []
+        self.debouncer = Debouncer(self.schedule, self.schedule.cancel, 250,
+                                   lambda: self.fired.append(True))
+    
+    def test_a_burst_results_in_one_call(self):
+        for _ in range(5):
+            self.debouncer.trigger()
+        self.assertEqual([delay for delay, _ in self.schedule.calls], [250] * 5)
+        self.assertEqual(self.schedule.cancelled, {1, 2, 3, 4})
+        self.schedule.run_pending()
+        self.assertEqual(self.fired, [True])
+        self.assertEqual((self.debouncer.triggers, self.debouncer.calls), (5, 1))
+        self.assertIsNone(self.debouncer.handle)
+    
+    def test_cancel_forgets_the_pending_call(self):
+        self.debouncer.trigger()
+        self.debouncer.cancel()
+        self.schedule.run_pending()
+        self.assertEqual(self.fired, [])
+    
+    def test_flush_calls_back_only_when_pending(self):
+        self.debouncer.flush()
+        self.assertEqual(self.fired, [])
+        self.debouncer.trigger()
+        self.debouncer.flush()
+        self.assertEqual(self.fired, [True])
+        self.schedule.run_pending()
+        self.assertEqual(self.fired, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
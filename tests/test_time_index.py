@@ -0,0 +1,106 @@
+"""
+Tests for epoch-microsecond timestamps and the sorted time index.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from notes_manager import NotesVault, Note
+from time_index import TimeIndex, datetime_to_us, iso_to_us, us_to_iso
+
+PASSWORD = "correct horse"
+
+
+class TimestampTestCase(unittest.TestCase):
+
+    def test_iso_round_trip(self):
+        for value in ("2025-03-01T12:30:45.123456", "1999-12-31T23:59:59", "1965-06-01T00:00:00.000001"):
+            with self.subTest(value=value):
+                self.assertEqual(us_to_iso(iso_to_us(value)),
+                                 datetime.datetime.fromisoformat(value).isoformat())
+        self.assertIsNone(iso_to_us(None))
+        self.assertIsNone(us_to_iso(None))
+    
+    def test_microseconds_are_kept(self):
+        moment = datetime.datetime(2025, 3, 1, 12, 0, 0, 250)
+        self.assertEqual(datetime_to_us(moment) % 1000000, 250)
+
+
+class TimeIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TimeIndex()
+        for note_id, created, modified in (("a", 10, 50), ("b", 20, 20), ("c", 30, None), ("d", 20, 40)):
+            self.index.set_times(note_id, created, modified)
+    
+    def test_ranges_are_half_open(self):
+        self.assertEqual(self.index.between("created", 20, 30), ["b", "d"])
+        self.assertEqual(self.index.between("created", None, 20), ["a"])
+        self.assertEqual(self.index.between("created", 25, None), ["c"])
+        self.assertEqual(self.index.between("created", 40, 10), [])
+        self.assertEqual(self.index.count("modified", 20, 50), 2)
+    
+    def test_latest(self):
+        self.assertEqual(self.index.latest("modified"), ["a", "d", "b"])
+        self.assertEqual(self.index.latest("created", 2), ["c", "d"])
+        self.assertEqual(self.index.latest("created", 0), [])
+    
+    def test_reindexing_moves_a_note(self):
+        self.index.set_times("a", 10, 5)
+        self.assertEqual(self.index.latest("modified"), ["d", "b", "a"])
+        self.index.remove_note("d")
+        self.index.remove_note("missing")
+        self.assertEqual(self.index.between("created", None, None), ["a", "b", "c"])
+        self.assertEqual(len(self.index), 3)
+    
+    def test_rebuild_matches_incremental_updates(self):
+        notes = {}
+        for note_id, (created, modified) in self.index.stamps.items():
+            note = Note(note_id, "")
+            note.created_us, note.modified_us = created, modified
+            notes[note_id] = note
+        rebuilt = TimeIndex()
+        rebuilt.rebuild(notes)
+        for field in ("created", "modified"):
+            self.assertEqual(list(rebuilt.times[field]), list(self.index.times[field]))
+            self.assertEqual(rebuilt.ids[field], self.index.ids[field])
+
+
+class VaultTimesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.vault = NotesVault(os.path.join(self.directory, "vault.enc"), kdf_target_seconds=None)
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def test_recent_notes_and_ranges(self):
+        ids = [self.vault.add_note(Note(f"note {i}", "")) for i in range(3)]
+        self.vault.update_note(ids[0], Note("note 0", "edited"))
+        self.assertEqual([note_id for note_id, _ in self.vault.recent_notes()], [ids[0], ids[2], ids[1]])
+        self.assertEqual([note_id for note_id, _ in self.vault.recent_notes(1, by="created")], [ids[2]])
+        
+        start = self.vault.notes[ids[1]].created_at
+        self.assertEqual([note_id for note_id, _ in self.vault.notes_between(start, None, by="created")],
+                         ids[1:])
+        with self.assertRaises(ValueError):
+            self.vault.recent_notes(by="accessed")
+    
+    def test_timestamps_survive_reopening(self):
+        note_id = self.vault.add_note(Note("note", "body"))
+        stamps = (self.vault.notes[note_id].created_us, self.vault.notes[note_id].modified_us)
+        self.vault.lock_vault()
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        note = self.vault.notes[note_id]
+        self.assertEqual((note.created_us, note.modified_us), stamps)
+        self.assertEqual(note.to_dict()['created_at'], us_to_iso(stamps[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Tests for transactions: batched writes, torn batches, rollbacks and
+failed writes.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from unittest import mock
+
+from notes_manager import NotesVault, Note
+
+PASSWORD = "correct horse"
+
+
+def snapshot(vault: NotesVault):
+    """Everything a note holds, by id."""
+    return {
+        note_id: (note.title, note.content, note.tags, note.created_us, note.modified_us)
+        for note_id, note in vault.notes.items()
+    }
+
+
+class TransactionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "vault.enc")
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.create_vault(PASSWORD))
+    
+    def tearDown(self):
+        self.vault.lock_vault()
+        shutil.rmtree(self.directory)
+    
+    def open_vault(self) -> NotesVault:
+        # Uncalibrated KDF parameters keep the tests fast.
+        return NotesVault(self.path, kdf_target_seconds=None)
+    
+    def reopen(self) -> NotesVault:
+        self.vault.lock_vault()
+        self.vault = self.open_vault()
+        self.assertTrue(self.vault.unlock_vault(PASSWORD))
+        return self.vault
+    
+    def test_batches_round_trip(self):
+        ids = self.vault.add_notes([Note(f"note {i}", f"body {i}") for i in range(20)])
+        self.vault.update_notes({ids[0]: Note("updated", "changed")})
+        self.vault.delete_notes(ids[10:])
+        expected = snapshot(self.vault)
+        
+        self.assertEqual(snapshot(self.reopen()), expected)
+    
+    def test_uncommitted_batch_is_discarded(self):
+        self.vault.add_note(Note("before", "committed"))
+        expected = snapshot(self.vault)
+        size = os.path.getsize(self.path)
+        with self.vault.transaction():
+            self.vault.add_note(Note("torn", "never committed"))
+            self.vault.add_note(Note("torn too", "never committed"))
+        # Lose the end of the commit marker.
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 2)
+        
+        self.assertEqual(snapshot(self.reopen()), expected)
+        self.assertEqual(os.path.getsize(self.path), size)
+    
+    def test_failed_write_rolls_back(self):
+        first = self.vault.add_note(Note("A", "body a"))
+        second = self.vault.add_note(Note("B", "body b"))
+        expected = snapshot(self.vault)
+        size = os.path.getsize(self.path)
+        
+        with mock.patch("storage.os.fsync", side_effect=OSError(28, "No space left on device")):
+            with self.assertRaises(OSError):
+                self.vault.update_notes({first: Note("A2", "new a"), second: Note("B2", "new b")})
+        
+        # Bodies are read back from the log, not the cache.
+        self.vault.body_cache.clear()
+        self.assertEqual(snapshot(self.vault), expected)
+        self.assertEqual(os.path.getsize(self.path), size)
+        
+        self.vault.update_note(first, Note("A3", "third"))
+        expected = snapshot(self.vault)
+        self.assertEqual(snapshot(self.reopen()), expected)
+    
+    def test_exception_rolls_back(self):
+        kept = self.vault.add_note(Note("kept", "before"))
+        expected = snapshot(self.vault)
+        size = os.path.getsize(self.path)
+        
+        with self.assertRaises(RuntimeError):
+            with self.vault.transaction():
+                self.vault.update_note(kept, Note("changed", "inside"))
+                self.vault.add_note(Note("added", "inside"))
+                raise RuntimeError("abort")
+        
+        self.assertEqual(snapshot(self.vault), expected)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual([note_id for note_id, _ in self.vault.search_notes("inside")], [])
+        self.assertEqual(snapshot(self.reopen()), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Tests for the virtualized notes list: only the rows that changed are
+rewritten, and only the visible window is ever labelled.
+"""
+
+import unittest
+
+try:
+    import virtual_list
+except ImportError:  # tkinter is not always installed
+    virtual_list = None
+
+
+class FakeListbox:
+    """Keeps Listbox rows in a list and counts the writes."""
+    
+    def __init__(self):
+        self.rows = []
+        self.writes = 0
+        self.selection = None
+    
+    def cget(self, option):
+        return 'normal'
+    
+    def delete(self, first, last=None):
+        if last == 'end':
+            del self.rows[first:]
+        else:
+            del self.rows[first]
+    
+    def insert(self, position, text):
+        self.rows.insert(position, text)
+        self.writes += 1
+    
+    def selection_clear(self, first, last):
+        self.selection = None
+    
+    def selection_set(self, row):
+        self.selection = row
+
+
+class FakeScrollbar:
+    
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+@unittest.skipIf(virtual_list is None, "needs tkinter")
+class ChangedRowsTestCase(unittest.TestCase):
+
+    def test_only_differences_are_reported(self):
+        self.assertEqual(virtual_list.changed_rows(["a", "b", "c"], ["a", "x", "c"]), [(1, "x")])
+        self.assertEqual(virtual_list.changed_rows(["a"], ["a", "b"]), [(1, "b")])
+        self.assertEqual(virtual_list.changed_rows(["a", "b"], ["a"]), [])
+        self.assertEqual(virtual_list.changed_rows([], ["a"]), [(0, "a")])
+
+
+@unittest.skipIf(virtual_list is None, "needs tkinter")
+class RenderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.labelled = []
+        # Build the list without widgets; render() only needs these.
+        self.view = virtual_list.VirtualList.__new__(virtual_list.VirtualList)
+        self.view.label = self.label
+        self.view.on_select = None
+        self.view.items = []
+        self.view.top = 0
+        self.view.rows = []
+        self.view.visible_rows = 3
+        self.view.selected = None
+        self.view.listbox = FakeListbox()
+        self.view.scrollbar = FakeScrollbar()
+    
+    def label(self, item):
+        self.labelled.append(item)
+        return f"note {item}"
+    
+    def test_only_the_window_is_labelled(self):
+        self.view.set_items(range(1000))
+        self.assertEqual(self.view.listbox.rows, ["note 0", "note 1", "note 2"])
+        self.assertEqual(self.labelled, [0, 1, 2])
+        self.assertEqual(self.view.scrollbar.position, (0.0, 0.003))
+    
+    def test_scrolling_rewrites_changed_rows(self):
+        self.view.set_items(range(10))
+        self.view.scroll(1)
+        self.assertEqual(self.view.listbox.rows, ["note 1", "note 2", "note 3"])
+        self.view.scroll(100)
+        self.assertEqual(self.view.top, 7)
+        self.assertEqual(self.view.listbox.rows, ["note 7", "note 8", "note 9"])
+        
+        writes = self.view.listbox.writes
+        self.view.render()
+        self.assertEqual(self.view.listbox.writes, writes)
+    
+    def test_selection_follows_the_window(self):
+        self.view.set_items(range(10))
+        self.view.move_selection(4)
+        self.assertEqual(self.view.selected_item(), 4)
+        self.assertEqual(self.view.top, 2)
+        self.assertEqual(self.view.listbox.selection, 2)
+        self.view.set_items(range(2))
+        self.assertIsNone(self.view.selected_item())
+        self.assertEqual(self.view.listbox.rows, ["note 0", "note 1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+Timestamps and the sorted timestamp index of the notes vault.
+
+Note timestamps are integer microseconds since the Unix epoch; ISO-8601
+strings (local time, as ``datetime.isoformat()`` writes them) only appear
+at the API edge. The index keeps every note's created and modified times
+in sorted arrays, so a time range or the N most recent notes are found by
+binary search in O(log n + k) instead of a pass over the vault.
+"""
+
+import time
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+TIME_FIELDS = ("created", "modified")
+
+
+def now_us() -> int:
+    """Current time in epoch microseconds."""
+    return time.time_ns() // 1000
+
+
+def datetime_to_us(value: datetime.datetime) -> int:
+    """Epoch microseconds of a datetime (naive datetimes are local time)."""
+    return int(value.replace(microsecond=0).timestamp()) * 1000000 + value.microsecond
+
+
+def iso_to_us(value: Optional[str]) -> Optional[int]:
+    """Epoch microseconds of an ISO-8601 timestamp, or None."""
+    return datetime_to_us(datetime.datetime.fromisoformat(value)) if value else None
+
+
+def us_to_iso(value: Optional[int]) -> Optional[str]:
+    """ISO-8601 local time of epoch microseconds, or None."""
+    if value is None:
+        return None
+    seconds, micros = divmod(value, 1000000)
+    return datetime.datetime.fromtimestamp(seconds).replace(microsecond=micros).isoformat()
+
+
+class TimeIndex:
+    """Created and modified times of every note, kept sorted."""
+    
+    def __init__(self):
+        # field -> sorted epoch microseconds, and the note ids in the same order
+        self.times: Dict[str, array] = {field: array('q') for field in TIME_FIELDS}
+        self.ids: Dict[str, List[str]] = {field: [] for field in TIME_FIELDS}
+        # note_id -> (created, modified) as indexed
+        self.stamps: Dict[str, Tuple[Optional[int], Optional[int]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.stamps)
+    
+    def set_times(self, note_id: str, created: Optional[int], modified: Optional[int]):
+        """Index (or re-index) the timestamps of one note."""
+        self.remove_note(note_id)
+        self.stamps[note_id] = (created, modified)
+        for field, value in zip(TIME_FIELDS, (created, modified)):
+            if value is None:
+                continue
+            times = self.times[field]
+            # Equal times keep insertion order, so the newest write sorts last.
+            position = bisect_left(times, value + 1)
+            times.insert(position, value)
+            self.ids[field].insert(position, note_id)
+    
+    def remove_note(self, note_id: str):
+        """Drop a note from the index."""
+        stamps = self.stamps.pop(note_id, None)
+        if stamps is None:
+            return
+        for field, value in zip(TIME_FIELDS, stamps):
+            if value is None:
+                continue
+            times, ids = self.times[field], self.ids[field]
+            position = bisect_left(times, value)
+            while ids[position] != note_id:
+                position += 1
+            del times[position]
+            del ids[position]
+    
+    def rebuild(self, notes: Dict):
+        """Index every note of a note_id -> Note mapping, sorting once."""
+        self.__init__()
+        for note_id, note in notes.items():
+            self.stamps[note_id] = (note.created_us, note.modified_us)
+        for index, field in enumerate(TIME_FIELDS):
+            # A stable sort keeps equal times in vault order.
+            entries = sorted(
+                ((stamps[index], note_id) for note_id, stamps in self.stamps.items()
+                 if stamps[index] is not None),
+                key=lambda entry: entry[0]
+            )
+            self.times[field] = array('q', (value for value, _ in entries))
+            self.ids[field] = [note_id for _, note_id in entries]
+    
+    def _bounds(self, field: str, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        """Positions of the [low, high) range; None leaves a side open."""
+        times = self.times[field]
+        start = 0 if low is None else bisect_left(times, low)
+        end = len(times) if high is None else bisect_left(times, high)
+        return start, max(start, end)
+    
+    def count(self, field: str, low: Optional[int], high: Optional[int]) -> int:
+        """Number of notes with the field in [low, high)."""
+        start, end = self._bounds(field, low, high)
+        return end - start
+    
+    def between(self, field: str, low: Optional[int], high: Optional[int]) -> List[str]:
+        """Ids of the notes with the field in [low, high), oldest first."""
+        start, end = self._bounds(field, low, high)
+        return self.ids[field][start:end]
+    
+    def latest(self, field: str, count: Optional[int] = None) -> List[str]:
+        """Ids of the count most recent notes by the field (all if None), newest first."""
+        ids = self.ids[field]
+        start = 0 if count is None else max(0, len(ids) - count)
+        return ids[start:][::-1]
@@ -0,0 +1,160 @@
+"""
+A virtualized list widget for the Tk GUI.
+
+A plain Listbox holds one Tk item per note, so filling it with a large
+vault costs a Tk call per note on every refresh and keystroke. VirtualList
+keeps the items in a backing sequence instead and gives its Listbox only
+the rows that fit on screen. Scrolling moves a window over the sequence,
+and when the window or the items change, only rows whose text differs
+are rewritten.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# Rows moved by one mouse wheel notch
+WHEEL_ROWS = 3
+
+
+def changed_rows(old: Sequence[str], new: Sequence[str]) -> List[Tuple[int, str]]:
+    """(position, text) of the rows of new that differ from old."""
+    return [(i, text) for i, text in enumerate(new) if i >= len(old) or old[i] != text]
+
+
+class VirtualList:
+    """A scrollable list showing a window of a backing sequence.
+    
+    label(item) gives the text shown for an item; on_select(item) is
+    called when the user picks one. Items are only looked up and
+    labelled while visible, so the backing sequence may be long.
+    """
+    
+    def __init__(self, parent, label: Callable[[Any], str],
+                 on_select: Optional[Callable[[Any], None]] = None):
+        self.label = label
+        self.on_select = on_select
+        self.items: Sequence = []
+        self.top = 0
+        self.rows: List[str] = []
+        self.visible_rows = 20
+        self.selected: Optional[int] = None
+        
+        self.frame = ttk.Frame(parent)
+        self.listbox = tk.Listbox(self.frame, exportselection=False, activestyle='none')
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.line_height = tkfont.Font(font=self.listbox.cget('font')).metrics('linespace') + 1
+        
+        self.listbox.bind('<Configure>', self.on_resize)
+        self.listbox.bind('<<ListboxSelect>>', self.on_listbox_select)
+        self.listbox.bind('<MouseWheel>', self.on_wheel)
+        self.listbox.bind('<Button-4>', lambda e: self.scroll(-WHEEL_ROWS))
+        self.listbox.bind('<Button-5>', lambda e: self.scroll(WHEEL_ROWS))
+        self.listbox.bind('<Up>', lambda e: self.move_selection(-1))
+        self.listbox.bind('<Down>', lambda e: self.move_selection(1))
+        self.listbox.bind('<Prior>', lambda e: self.move_selection(-self.visible_rows))
+        self.listbox.bind('<Next>', lambda e: self.move_selection(self.visible_rows))
+    
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+    
+    def config(self, **kwargs):
+        """Configure the underlying Listbox (e.g. state)."""
+        self.listbox.config(**kwargs)
+    
+    def set_items(self, items: Sequence):
+        """Show a new backing sequence from the top, without a selection."""
+        self.items = items
+        self.top = 0
+        self.selected = None
+        self.render()
+    
+    def selected_item(self) -> Any:
+        """The selected item, or None."""
+        if self.selected is None or self.selected >= len(self.items):
+            return None
+        return self.items[self.selected]
+    
+    def _clamp(self, top: int) -> int:
+        return max(0, min(top, len(self.items) - self.visible_rows))
+    
+    def render(self):
+        """Bring the Listbox rows in line with the visible window."""
+        self.top = self._clamp(self.top)
+        window = self.items[self.top:self.top + self.visible_rows]
+        rows = [self.label(item) for item in window]
+        
+        # Tk refuses to change a disabled Listbox; allow it for the update.
+        state = self.listbox.cget('state')
+        if state == tk.DISABLED:
+            self.listbox.config(state=tk.NORMAL)
+        if len(self.rows) > len(rows):
+            self.listbox.delete(len(rows), tk.END)
+        for position, text in changed_rows(self.rows, rows):
+            if position < len(self.rows):
+                self.listbox.delete(position)
+            self.listbox.insert(position, text)
+        self.rows = rows
+        
+        self.listbox.selection_clear(0, tk.END)
+        if self.selected is not None and self.top <= self.selected < self.top + len(rows):
+            self.listbox.selection_set(self.selected - self.top)
+        if state == tk.DISABLED:
+            self.listbox.config(state=tk.DISABLED)
+        
+        if self.items:
+            self.scrollbar.set(self.top / len(self.items),
+                               min(1.0, (self.top + self.visible_rows) / len(self.items)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll(self, rows: int):
+        """Move the window by a number of rows."""
+        top = self._clamp(self.top + rows)
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+    
+    def on_scrollbar(self, action: str, amount: str, unit: Optional[str] = None):
+        if action == tk.MOVETO:
+            self.top = self._clamp(int(float(amount) * len(self.items)))
+            self.render()
+        elif action == tk.SCROLL:
+            self.scroll(int(amount) * (self.visible_rows if unit == tk.PAGES else 1))
+    
+    def on_wheel(self, event):
+        return self.scroll(-WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS)
+    
+    def on_resize(self, event):
+        visible_rows = max(1, event.height // self.line_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.render()
+    
+    def on_listbox_select(self, event=None):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        self.selected = self.top + selection[0]
+        item = self.selected_item()
+        if item is not None and self.on_select is not None:
+            self.on_select(item)
+    
+    def move_selection(self, rows: int):
+        """Select the item rows away from the current one, scrolling it into view."""
+        if not self.items:
+            return "break"
+        current = self.top if self.selected is None else self.selected
+        self.selected = max(0, min(len(self.items) - 1, current + rows))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible_rows:
+            self.top = self.selected - self.visible_rows + 1
+        self.render()
+        if self.on_select is not None:
+            self.on_select(self.items[self.selected])
+        return "break"